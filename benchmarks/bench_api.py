@@ -0,0 +1,114 @@
+"""Запросов в секунду: HTML-ленты против JSON API на тех же данных.
+
+    python benchmarks/bench_api.py [--posts 2000] [--requests 300]
+
+Данные пишутся во временную тестовую базу. Запросы идут через
+тестовый клиент Django от вошедшего пользователя, чтобы HTML не
+отдавался из кэша целых страниц; кэш карточек при этом прогрет, как
+на живом сайте. Отдельно сравниваются orjson и json на одной странице.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Каждый прогон идёт на новой временной базе: общий кэш на диске
+# хранил бы поколения лент и страницы прошлых прогонов.
+os.environ.setdefault('YATUBE_CACHE', 'locmem')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+from django.urls import reverse  # noqa: E402
+
+AUTHORS = 20
+
+
+def populate(posts):
+    from posts.models import Group, Post, User
+    authors = [User.objects.create(username=f'author{number}')
+               for number in range(AUTHORS)]
+    group = Group.objects.create(title='Бенчмарк', slug='bench',
+                                 description='')
+    Post.objects.bulk_create(
+        (Post(author=authors[number % AUTHORS], text='Текст поста ' * 20,
+              group=group if number % 3 == 0 else None)
+         for number in range(posts)),
+        batch_size=500
+    )
+    return User.objects.create_user(username='reader')
+
+
+def rate(client, url, count):
+    client.get(url)
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    return count / (time.perf_counter() - started)
+
+
+def encoders(count):
+    from posts import api
+    from posts.models import Post
+    rows = list(Post.objects.values(*api.POST_FIELDS.values())[:100])
+    results = {}
+    if api.orjson is not None:
+        started = time.perf_counter()
+        for _ in range(count):
+            api.orjson.dumps(rows)
+        results['orjson'] = count / (time.perf_counter() - started)
+    started = time.perf_counter()
+    for _ in range(count):
+        json.dumps(rows, ensure_ascii=False, separators=(',', ':'),
+                   default=api._default)
+    results['json'] = count / (time.perf_counter() - started)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = ['*']
+    database = connection.creation.create_test_db(verbosity=0)
+    try:
+        client = Client()
+        client.force_login(populate(args.posts))
+        pages = (
+            ('index', reverse('posts:index'), reverse('posts:api_index')),
+            ('group', reverse('posts:group', args=['bench']),
+             reverse('posts:api_group', args=['bench'])),
+            ('profile', reverse('posts:profile', args=['author1']),
+             reverse('posts:api_profile', args=['author1'])),
+        )
+        print(f'{"лента":<10} {"HTML req/s":>11} {"API req/s":>10} '
+              f'{"API, fields":>12} {"ускорение":>10}')
+        for name, html_url, api_url in pages:
+            html = rate(client, html_url, args.requests)
+            full = rate(client, api_url, args.requests)
+            narrow = rate(client, api_url + '?fields=id,text',
+                          args.requests)
+            print(f'{name:<10} {html:>11.0f} {full:>10.0f} {narrow:>12.0f} '
+                  f'{full / html:>9.1f}x')
+        print()
+        for encoder, value in encoders(args.requests).items():
+            print(f'{encoder:<10} {value:>10.0f} страниц по 100 постов/с')
+    finally:
+        connection.creation.destroy_test_db(database, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
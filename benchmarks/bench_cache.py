@@ -0,0 +1,112 @@
+"""Сравнение кэш-бэкендов: LocMemCache, FileBasedCache и SQLiteCache.
+
+    python benchmarks/bench_cache.py [--ops 20000] [--workers 4]
+
+Однопроцессные замеры показывают цену get/set/get_many одной карточки
+поста (~2 КБ html). Многопроцессный замер запускает воркеры, которые
+читают ключи, записанные родителем: LocMemCache в нём всегда промахивается,
+потому что память у каждого процесса своя.
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.cache.backends.filebased import FileBasedCache  # noqa: E402
+from django.core.cache.backends.locmem import LocMemCache  # noqa: E402
+
+from yatube.cache import SQLiteCache  # noqa: E402
+
+CARD = '<div class="card">' + 'x' * 2000 + '</div>'
+PAGE = 10
+
+
+def make_backends(directory):
+    params = {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}
+    return {
+        'locmem': lambda: LocMemCache('bench', params),
+        'filebased': lambda: FileBasedCache(
+            os.path.join(directory, 'files'), params),
+        'sqlite': lambda: SQLiteCache(
+            os.path.join(directory, 'cache.sqlite3'), params),
+    }
+
+
+def timed(operation, count):
+    started = time.perf_counter()
+    operation()
+    return count / (time.perf_counter() - started)
+
+
+def single_process(cache, ops):
+    keys = [f'post_card:{number}' for number in range(ops)]
+    results = {}
+    results['set'] = timed(
+        lambda: [cache.set(key, CARD) for key in keys], ops)
+    results['get'] = timed(
+        lambda: [cache.get(key) for key in keys], ops)
+    pages = [keys[start:start + PAGE] for start in range(0, ops, PAGE)]
+    results['get_many/page'] = timed(
+        lambda: [cache.get_many(page) for page in pages], len(pages))
+    return results
+
+
+def worker(directory, name, keys, queue):
+    cache = make_backends(directory)[name]()
+    started = time.perf_counter()
+    hits = sum(cache.get(key) is not None for key in keys)
+    queue.put((hits, len(keys) / (time.perf_counter() - started)))
+
+
+def multi_process(directory, name, ops, workers):
+    cache = make_backends(directory)[name]()
+    keys = [f'shared:{number}' for number in range(ops // workers)]
+    cache.set_many({key: CARD for key in keys})
+    queue = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker,
+                                         args=(directory, name, keys,
+                                               queue))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    hits = sum(hits for hits, _ in results)
+    return hits / (len(keys) * workers), sum(rate for _, rate in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    # Как у воркеров gunicorn, содержимое кэша родителя детям не достаётся.
+    multiprocessing.set_start_method('spawn')
+    directory = tempfile.mkdtemp()
+    try:
+        print(f'{"backend":<10} {"set/s":>10} {"get/s":>10} '
+              f'{"page/s":>10} {"shared hit":>11} {"mp get/s":>10}')
+        for name, factory in make_backends(directory).items():
+            single = single_process(factory(), args.ops)
+            hit_rate, rate = multi_process(directory, name, args.ops,
+                                           args.workers)
+            print(f'{name:<10} {single["set"]:>10.0f} {single["get"]:>10.0f} '
+                  f'{single["get_many/page"]:>10.0f} {hit_rate:>10.0%} '
+                  f'{rate:>10.0f}')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
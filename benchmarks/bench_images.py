@@ -0,0 +1,101 @@
+"""Байты изображений на страницу ленты: одна миниатюра против srcset.
+
+    python benchmarks/bench_images.py [--posts 10] [--size 2400x1600]
+
+«До» — прежняя миниатюра sorl: JPEG 960x339 с качеством по умолчанию
+(THUMBNAIL_QUALITY = 95), одинаковая для всех экранов. «После» — вариант,
+который браузер выберет из srcset при sizes="100vw" для данной ширины
+окна и плотности пикселей, в WebP и в JPEG для браузеров без WebP.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Каждый прогон идёт на новой временной базе: общий кэш на диске
+# хранил бы поколения лент и страницы прошлых прогонов.
+os.environ.setdefault('YATUBE_CACHE', 'locmem')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from PIL import Image, ImageFilter  # noqa: E402
+
+PAGE = 10
+VIEWPORTS = (
+    ('телефон 360px, 1x', 360),
+    ('телефон 375px, 2x', 750),
+    ('планшет 768px, 1x', 768),
+    ('десктоп', 960),
+)
+
+
+def photo(size, seed):
+    """Похожая на фотографию картинка: шум, размытый до пятен, и градиент."""
+    noise = Image.effect_noise(size, 60 + seed % 40).filter(
+        ImageFilter.GaussianBlur(3))
+    gradient = Image.linear_gradient('L').resize(size)
+    return Image.merge('RGB', (noise, gradient, noise.rotate(180)))
+
+
+def pick(variants, pixels):
+    for width, file in variants:
+        if width >= pixels:
+            return file
+    return variants[-1][1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=PAGE)
+    parser.add_argument('--size', default='2400x1600')
+    args = parser.parse_args()
+    size = tuple(int(side) for side in args.size.split('x'))
+    directory = tempfile.mkdtemp()
+    settings.MEDIA_ROOT = directory
+    from django.core.files.storage import default_storage
+    from posts.thumbnails import CARD_SIZE, _crop_to_card, render_variants
+    try:
+        before = 0
+        after = {name: {'webp': 0, 'jpeg': 0} for name, _ in VIEWPORTS}
+        spent = 0.0
+        for number in range(args.posts):
+            source = BytesIO()
+            photo(size, number).save(source, 'JPEG', quality=90)
+            source.seek(0)
+            old = _crop_to_card(Image.open(source)).resize(CARD_SIZE,
+                                                           Image.LANCZOS)
+            buffer = BytesIO()
+            old.save(buffer, 'JPEG', quality=95)
+            before += len(buffer.getvalue())
+            source.seek(0)
+            started = time.perf_counter()
+            manifest = render_variants(source, f'bench/{number}')
+            spent += time.perf_counter() - started
+            for name, pixels in VIEWPORTS:
+                for image_format in ('webp', 'jpeg'):
+                    after[name][image_format] += default_storage.size(
+                        pick(manifest[image_format], pixels))
+        scale = PAGE / args.posts
+        print(f'Обработка: {spent / args.posts * 1000:.0f} мс на изображение')
+        print(f'{"окно":<20} {"до, КБ":>8} {"WebP, КБ":>9} {"JPEG, КБ":>9} '
+              f'{"экономия":>9}')
+        for name, _ in VIEWPORTS:
+            webp = after[name]['webp'] * scale / 1024
+            jpeg = after[name]['jpeg'] * scale / 1024
+            old = before * scale / 1024
+            print(f'{name:<20} {old:>8.0f} {webp:>9.0f} {jpeg:>9.0f} '
+                  f'{1 - webp / old:>9.0%}')
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+"""Нагрузочный прогон всех маршрутов posts, about и users.
+
+    python benchmarks/bench_views.py [--scale small] [--requests 30]
+        [--server client|wsgi|both] [--save-baseline]
+
+Набор данных из datagen.py загружается через import_yatube во временную
+базу. Каждый маршрут из posts/urls.py, about/urls.py и users/urls.py
+запрашивают гость и вошедший читатель с самой большой лентой подписок:
+через тестовый клиент Django и через настоящий WSGI-сервер (wsgiref)
+в соседнем потоке. По каждому маршруту печатаются p50/p95/p99 задержки,
+число запросов к базе и пик выделенной памяти. Память меряется
+отдельным проходом: tracemalloc заметно замедляет запросы.
+
+Результаты сравниваются с benchmarks/baselines.json. В базовой линии
+хранятся только числа, не зависящие от машины: код ответа и число
+запросов к базе. Их изменение в худшую сторону — регрессия, и скрипт
+завершается с кодом 1; уменьшение числа запросов печатается как
+напоминание обновить базовую линию. Задержки и память выводятся
+для сведения и ни с чем не сравниваются. --save-baseline записывает
+текущие значения как новую базовую линию; её перезаписывают в том же
+коммите, который меняет число запросов.
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Каждый прогон идёт на новой временной базе: общий кэш на диске
+# хранил бы поколения лент и страницы прошлых прогонов.
+os.environ.setdefault('YATUBE_CACHE', 'locmem')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import (setup_test_environment,  # noqa: E402
+                               teardown_test_environment)
+from django.urls import reverse  # noqa: E402
+
+from benchmarks import datagen  # noqa: E402
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines.json')
+SCALES = {
+    'small': {'users': 200, 'groups': 10, 'posts': 3000,
+              'comments': 6000, 'follows': 2000},
+    'medium': {'users': 2000, 'groups': 30, 'posts': 30000,
+               'comments': 60000, 'follows': 20000},
+    'large': {'users': 20000, 'groups': 100, 'posts': 300000,
+              'comments': 600000, 'follows': 200000},
+}
+URLCONFS = (('posts.urls', 'posts'), ('about.urls', 'about'),
+            ('users.urls', None))
+# Служебные адреса для предпросмотра обработчиков ошибок: им нужен
+# аргумент exception, и сами по себе они не открываются.
+SKIPPED = {'posts:404', 'posts:500'}
+ALLOCATION_REQUESTS = 5
+# Поля результата, которые попадают в базовую линию.
+BASELINE_FIELDS = ('status', 'queries')
+
+
+def prepare_database(directory, scale):
+    from posts.importing import Importer
+    # Основная база профиля тоже уходит во временный каталог: соединение,
+    # открытое до create_test_db, иначе создаст db.sqlite3 в корне проекта.
+    connection.close()
+    connection.settings_dict['NAME'] = os.path.join(directory, 'main.sqlite3')
+    connection.settings_dict['TEST']['NAME'] = os.path.join(
+        directory, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+    path = os.path.join(directory, 'dataset.jsonl')
+    datagen.write(path, **SCALES[scale])
+    importer = Importer(workers=0)
+    importer.run(path)
+    importer.finalize()
+
+
+def route_arguments():
+    """Значения параметров адресов: самый активный автор и его пост."""
+    from posts.models import Follow, Group, Post
+    post = Post.objects.annotate(
+        author_posts=Count('author__posts')
+    ).order_by('-author_posts', '-comment_count').select_related(
+        'author').first()
+    reader = Follow.objects.values('user').annotate(
+        count=Count('id')).order_by('-count').first()['user']
+    return reader, {'username': post.author.username, 'post_id': post.id,
+                    'slug': Group.objects.order_by('id').first().slug}
+
+
+def routes(arguments):
+    """Пары (имя маршрута, адрес) для всех маршрутов приложений."""
+    from importlib import import_module
+    found = []
+    for module, namespace in URLCONFS:
+        for pattern in import_module(module).urlpatterns:
+            name = f'{namespace}:{pattern.name}' if namespace else pattern.name
+            if name in SKIPPED:
+                continue
+            kwargs = {key: arguments[key]
+                      for key in pattern.pattern.converters}
+            found.append((name, reverse(name, kwargs=kwargs)))
+    return found
+
+
+class QueryCounter:
+    """Считает запросы к базе через execute_wrapper.
+
+    CaptureQueriesContext для этого не годится: он сравнивает длины
+    connection.queries_log, а это deque на 9000 записей. Когда журнал
+    заполнен, длина больше не растёт, и все следующие запросы
+    считались бы нулевыми.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ClientRunner:
+    def __init__(self, user=None):
+        self.client = Client()
+        if user is not None:
+            self.client.force_login(user)
+
+    def get(self, url):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response.status_code, counter.count
+
+
+class CountingApplication:
+    """WSGI-обёртка, считающая запросы к базе последнего запроса."""
+
+    def __init__(self, application):
+        self.application = application
+        self.queries = 0
+
+    def __call__(self, environ, start_response):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.application(environ, start_response)
+            try:
+                body = b''.join(response)
+            finally:
+                response.close()
+        self.queries = counter.count
+        return [body]
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ServerRunner:
+    def __init__(self, server, application, user=None):
+        self.address = server.server_address
+        self.application = application
+        self.headers = {}
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            cookie = client.cookies[settings.SESSION_COOKIE_NAME]
+            self.headers['Cookie'] = f'{cookie.key}={cookie.value}'
+
+    def get(self, url):
+        client = http.client.HTTPConnection(*self.address)
+        try:
+            client.request('GET', url, headers=self.headers)
+            response = client.getresponse()
+            response.read()
+        finally:
+            client.close()
+        return response.status, self.application.queries
+
+
+def measure(runner, url, count):
+    runner.get(url)
+    timings, queries = [], 0
+    for _ in range(count):
+        started = time.perf_counter()
+        status, query_count = runner.get(url)
+        timings.append(time.perf_counter() - started)
+        queries = max(queries, query_count)
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {'status': status, 'p50': cuts[49], 'p95': cuts[94],
+            'p99': cuts[98], 'queries': queries}
+
+
+def allocations(runner, url):
+    """Наибольший пик памяти за запрос, в байтах."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(ALLOCATION_REQUESTS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            runner.get(url)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+        return max(peaks)
+    finally:
+        tracemalloc.stop()
+
+
+def run(server, runners, paths, count):
+    results = {}
+    for visitor, runner in runners.items():
+        for name, url in paths:
+            result = measure(runner, url, count)
+            if server == 'client':
+                result['alloc'] = allocations(runner, url)
+            results[f'{server} {visitor} {name}'] = result
+    return results
+
+
+def client_results(reader, paths, count):
+    return run('client', {'guest': ClientRunner(),
+                          'reader': ClientRunner(reader)}, paths, count)
+
+
+def server_results(reader, paths, count):
+    application = CountingApplication(get_wsgi_application())
+    server = make_server('127.0.0.1', 0, application,
+                         handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        return run('wsgi', {
+            'guest': ServerRunner(server, application),
+            'reader': ServerRunner(server, application, reader),
+        }, paths, count)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def report(results):
+    print(f'{"маршрут":<52} {"код":>4} {"p50, мс":>8} {"p95, мс":>8} '
+          f'{"p99, мс":>8} {"SQL":>4} {"память, КБ":>11}')
+    for key, result in results.items():
+        alloc = result.get('alloc')
+        alloc = f'{alloc / 1024:>11.0f}' if alloc is not None else ' ' * 11
+        print(f'{key:<52} {result["status"]:>4} {result["p50"] * 1000:>8.1f} '
+              f'{result["p95"] * 1000:>8.1f} {result["p99"] * 1000:>8.1f} '
+              f'{result["queries"]:>4} {alloc}')
+
+
+def differences(results, baseline):
+    """Пары (регрессии, устаревшие записи) относительно базовой линии."""
+    found, stale = [], []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            stale.append(f'{key}: нет в базовой линии')
+            continue
+        if result['status'] != base['status']:
+            found.append(f'{key}: код ответа {base["status"]} -> '
+                         f'{result["status"]}')
+        if result['queries'] > base['queries']:
+            found.append(f'{key}: SQL {base["queries"]} -> '
+                         f'{result["queries"]}')
+        elif result['queries'] < base['queries']:
+            stale.append(f'{key}: SQL {base["queries"]} -> '
+                         f'{result["queries"]}')
+    return found, stale
+
+
+def compare(results, args):
+    if args.save_baseline:
+        with open(BASELINES, 'w', encoding='utf-8') as output:
+            json.dump({'scale': args.scale, 'results': {
+                key: {name: result[name] for name in BASELINE_FIELDS}
+                for key, result in results.items()
+            }}, output, ensure_ascii=False, indent=1, sort_keys=True)
+            output.write('\n')
+        print(f'\nБазовая линия записана в {BASELINES}')
+        return 0
+    if not os.path.exists(BASELINES):
+        return 0
+    with open(BASELINES, encoding='utf-8') as source:
+        baseline = json.load(source)
+    if baseline['scale'] != args.scale:
+        print(f'\nБазовая линия снята на --scale {baseline["scale"]}, '
+              f'сравнение пропущено')
+        return 0
+    found, stale = differences(results, baseline['results'])
+    for line in stale:
+        print(f'Обновите базовую линию: {line}')
+    for line in found:
+        print(f'РЕГРЕССИЯ {line}')
+    return 1 if found else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--server', choices=('client', 'wsgi', 'both'),
+                        default='both')
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['*']
+    setup_test_environment()
+    directory = tempfile.mkdtemp()
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    try:
+        prepare_database(directory, args.scale)
+        from posts.models import User
+        reader_id, arguments = route_arguments()
+        reader = User.objects.get(pk=reader_id)
+        paths = routes(arguments)
+        results = {}
+        if args.server in ('client', 'both'):
+            results.update(client_results(reader, paths, args.requests))
+        if args.server in ('wsgi', 'both'):
+            results.update(server_results(reader, paths, args.requests))
+        report(results)
+        status = compare(results, args)
+    finally:
+        teardown_test_environment()
+        connections.close_all()
+        shutil.rmtree(directory, ignore_errors=True)
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+"""Конкурентные писатели: new_post и add_comment под профилями базы.
+
+    python benchmarks/bench_writes.py [--writers 8] [--requests 50]
+        [--profiles sqlite-plain sqlite postgresql]
+
+Каждый писатель — отдельный процесс, как воркер gunicorn, со своим
+пользователем и соединением. Все стартуют одновременно и по очереди
+публикуют пост и комментируют один общий пост, так что запись идёт
+в одни и те же строки и таблицы. По каждому профилю печатаются
+успешные записи в секунду, p50/p95/p99 задержки и число ошибок базы
+(«database is locked», тайм-ауты запросов).
+
+Профили:
+
+- sqlite-plain — стандартный бэкенд Django: журнал отката, BEGIN
+  без блокировки записи, ожидание занятой базы 5 с;
+- sqlite — профиль из настроек: WAL, synchronous=NORMAL, busy_timeout,
+  BEGIN IMMEDIATE (yatube/sqlite3/base.py);
+- postgresql — профиль из настроек с параметрами подключения
+  YATUBE_DB_*; замер идёт в отдельной тестовой базе test_<имя>.
+
+Каждый профиль замеряется в отдельном процессе, потому что профиль
+выбирается переменной YATUBE_DB при загрузке настроек.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+# Каждый прогон идёт на новой временной базе: общий кэш на диске
+# хранил бы поколения лент и страницы прошлых прогонов.
+os.environ.setdefault('YATUBE_CACHE', 'locmem')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import DatabaseError, connection, connections  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+PROFILES = {
+    'sqlite-plain': 'sqlite',
+    'sqlite': 'sqlite',
+    'postgresql': 'postgresql',
+}
+
+
+def prepare_database(profile, directory, writers):
+    """Создаёт пустую базу, писателей и общий пост для комментариев."""
+    if profile == 'sqlite-plain':
+        # Соединение по настройкам профиля sqlite уже могло открыться.
+        connection.close()
+        del connections['default']
+        connections.databases['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'bench.sqlite3'),
+        }
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(
+            directory, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0)
+    from posts.models import Post, User
+    users = [User.objects.create_user(username=f'writer{number}')
+             for number in range(writers)]
+    post = Post.objects.create(author=users[0], text='Общий пост')
+    return users, post
+
+
+def writer(user, post, requests, barrier, queue):
+    client = Client()
+    client.force_login(user)
+    urls = (reverse('posts:new_post'),
+            reverse('posts:add_comment', kwargs={
+                'username': post.author.username, 'post_id': post.id}))
+    timings, errors = [], 0
+    barrier.wait()
+    started = time.monotonic()
+    for number in range(requests):
+        begun = time.perf_counter()
+        try:
+            response = client.post(urls[number % 2],
+                                   {'text': f'{user.username} {number}'})
+        except DatabaseError:
+            errors += 1
+            continue
+        if response.status_code != 302:
+            errors += 1
+            continue
+        timings.append(time.perf_counter() - begun)
+    queue.put((started, time.monotonic(), timings, errors))
+    connection.close()
+
+
+def measure(profile, writers, requests):
+    """Замер одного профиля; вызывается в дочернем процессе."""
+    # Ошибки базы считаются, а не печатаются трассировками.
+    logging.disable(logging.CRITICAL)
+    settings.DEBUG = False
+    directory = tempfile.mkdtemp()
+    settings.MEDIA_ROOT = os.path.join(directory, 'media')
+    old_name = connection.settings_dict['NAME']
+    try:
+        users, post = prepare_database(profile, directory, writers)
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(writers)
+        queue = context.Queue()
+        processes = [context.Process(target=writer,
+                                     args=(user, post, requests, barrier,
+                                           queue))
+                     for user in users]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        if connection.vendor != 'sqlite':
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        shutil.rmtree(directory, ignore_errors=True)
+    elapsed = (max(end for _, end, _, _ in results)
+               - min(start for start, _, _, _ in results))
+    timings = sorted(timing for _, _, found, _ in results for timing in found)
+    cuts = (statistics.quantiles(timings, n=100, method='inclusive')
+            if len(timings) > 1 else [0] * 99)
+    return {'writes': len(timings) / elapsed, 'p50': cuts[49],
+            'p95': cuts[94], 'p99': cuts[98],
+            'errors': sum(errors for _, _, _, errors in results)}
+
+
+def run_profile(profile, args):
+    """Запускает замер профиля в процессе с нужной YATUBE_DB."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--measure', profile,
+         '--writers', str(args.writers), '--requests', str(args.requests)],
+        env={**os.environ, 'YATUBE_DB': PROFILES[profile]},
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if completed.returncode:
+        lines = completed.stderr.strip().splitlines() or ['нет вывода']
+        return None, lines[-1]
+    return json.loads(completed.stdout.splitlines()[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--profiles', nargs='+', choices=PROFILES,
+                        default=list(PROFILES))
+    parser.add_argument('--measure', choices=PROFILES,
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.writers, args.requests)))
+        return
+    print(f'{"профиль":<14} {"записей/с":>10} {"p50, мс":>8} '
+          f'{"p95, мс":>8} {"p99, мс":>8} {"ошибок":>7}')
+    for profile in args.profiles:
+        result, failure = run_profile(profile, args)
+        if result is None:
+            print(f'{profile:<14} пропущен: {failure}')
+            continue
+        print(f'{profile:<14} {result["writes"]:>10.1f} '
+              f'{result["p50"] * 1000:>8.1f} {result["p95"] * 1000:>8.1f} '
+              f'{result["p99"] * 1000:>8.1f} {result["errors"]:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Генератор данных для нагрузочных замеров в формате import_yatube.
+
+    python benchmarks/datagen.py dataset.jsonl [--users 1000] [--posts 20000]
+
+Распределения скошены, как на живом сайте: число постов и подписчиков
+у автора и комментариев у поста подчиняются закону Ципфа, так что
+несколько авторов пишут и собирают большую часть всего. Одинаковый
+--seed даёт один и тот же набор.
+"""
+import argparse
+import itertools
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+WORDS = ('котик', 'город', 'море', 'закат', 'дорога', 'книга', 'утро',
+         'горы', 'дождь', 'музыка', 'поезд', 'лес', 'друзья', 'кофе')
+START = datetime(2019, 1, 1, tzinfo=timezone.utc)
+# Показатель закона Ципфа: чем больше, тем сильнее перекос.
+SKEW = 1.1
+
+
+def zipf_weights(count, skew=SKEW):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(itertools.accumulate(1 / rank ** skew
+                                     for rank in range(1, count + 1)))
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def records(users=1000, groups=20, posts=20000, comments=50000,
+            follows=10000, seed=1):
+    """Записи набора: пользователи, группы, посты, комментарии, подписки."""
+    rng = random.Random(seed)
+    for user_id in range(1, users + 1):
+        yield {'type': 'user', 'id': user_id, 'username': f'user{user_id}'}
+    for group_id in range(1, groups + 1):
+        yield {'type': 'group', 'id': group_id, 'title': f'Группа {group_id}',
+               'slug': f'group{group_id}', 'description': _text(rng, 8)}
+    authors = zipf_weights(users)
+    group_weights = zipf_weights(groups)
+    step = timedelta(days=365) / max(posts, 1)
+    for post_id in range(1, posts + 1):
+        group = rng.choices(range(1, groups + 1), cum_weights=group_weights)
+        yield {'type': 'post', 'id': post_id, 'text': _text(rng, 30),
+               'author': rng.choices(range(1, users + 1),
+                                     cum_weights=authors)[0],
+               'group': group[0] if rng.random() < 0.6 else None,
+               'pub_date': (START + step * post_id).isoformat()}
+    popular = zipf_weights(posts)
+    for comment_id in range(1, comments + 1):
+        # Ранг 1 — самый свежий пост: обсуждают в основном новое.
+        post_id = posts + 1 - rng.choices(range(1, posts + 1),
+                                          cum_weights=popular)[0]
+        yield {'type': 'comment', 'id': comment_id, 'post': post_id,
+               'author': rng.randint(1, users), 'text': _text(rng, 10),
+               'created': (START + step * post_id
+                           + timedelta(minutes=comment_id % 600)).isoformat()}
+    seen = set()
+    for _ in range(follows):
+        user = rng.randint(1, users)
+        author = rng.choices(range(1, users + 1), cum_weights=authors)[0]
+        if user != author and (user, author) not in seen:
+            seen.add((user, author))
+            yield {'type': 'follow', 'user': user, 'author': author}
+
+
+def write(path, **options):
+    with open(path, 'w', encoding='utf-8') as output:
+        for record in records(**options):
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    for option, default in (('users', 1000), ('groups', 20),
+                            ('posts', 20000), ('comments', 50000),
+                            ('follows', 10000), ('seed', 1)):
+        parser.add_argument(f'--{option}', type=int, default=default)
+    args = vars(parser.parse_args())
+    write(args.pop('path'), **args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Read-only JSON API для лент, поста и комментариев.
+
+Те же выборки, что у HTML-представлений, но через values(): строки
+сразу становятся словарями, модели не создаются, шаблоны не рисуются.
+Параметры запроса:
+
+    ?fields=id,text,author  — только нужные поля (по умолчанию все);
+    ?cursor=...             — курсор next_cursor/previous_cursor из ответа;
+    ?limit=20               — размер страницы, не больше API_MAX_LIMIT.
+
+Ответ кодируется orjson, если он установлен, иначе стандартным json
+без пробелов между токенами.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_safe
+
+from . import conditional
+from .groups import get_or_404
+from .models import Comment, Post, User
+from .pagination import CursorPaginator
+from .timeline import filled_page, timeline
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+API_MAX_LIMIT = 100
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+# Имя поля в ответе -> путь для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'comment_count': 'comment_count',
+    'image': 'image',
+    'thumbnail': 'thumbnail',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+CONVERTERS = {
+    'image': lambda name: IMAGE_STORAGE.url(name) if name else None,
+    'thumbnail': lambda name: default_storage.url(name) if name else None,
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _default(value):
+    # Те же строки, что у orjson: ISO 8601 со смещением.
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'),
+                      default=_default).encode()
+
+
+def _response(data, status=200):
+    return HttpResponse(dumps(data), status=status,
+                        content_type='application/json')
+
+
+def api_view(view):
+    """Только GET/HEAD; ошибки отдаются JSON-ом, а не HTML-страницей."""
+    @require_safe
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return _response({'error': str(error)}, status=400)
+        except Http404:
+            return _response({'error': 'Не найдено'}, status=404)
+    return wrapped
+
+
+def _fields(request, fields):
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(fields)
+    names = list(dict.fromkeys(
+        name.strip() for name in requested.split(',') if name.strip()))
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}; '
+                         f'доступны: {", ".join(fields)}')
+    return names
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', settings.PAGE_SIZE))
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    return min(max(limit, 1), API_MAX_LIMIT)
+
+
+def _lookups(names, fields, *required):
+    return list(dict.fromkeys(
+        [fields[name] for name in names] + list(required)))
+
+
+def _serialize(rows, names, fields):
+    converters = [(name, fields[name], CONVERTERS.get(name))
+                  for name in names]
+    return [
+        {name: convert(row[lookup]) if convert else row[lookup]
+         for name, lookup, convert in converters}
+        for row in rows
+    ]
+
+
+def _page(request, queryset, fields, names, **options):
+    paginator = CursorPaginator(queryset, _limit(request), **options)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return _page_response(page, fields, names)
+
+
+def _page_response(page, fields, names):
+    return _response({
+        'results': _serialize(page.object_list, names, fields),
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    })
+
+
+def _feed(request, posts):
+    names = _fields(request, POST_FIELDS)
+    rows = posts.values(*_lookups(names, POST_FIELDS, 'pub_date', 'id'))
+    return _page(request, rows, POST_FIELDS, names)
+
+
+@api_view
+@conditional.conditional(conditional.index)
+def index(request):
+    return _feed(request, Post.objects.for_feed())
+
+
+@api_view
+@conditional.conditional(conditional.group_posts)
+def group_posts(request, slug):
+    group = get_or_404(slug)
+    return _feed(request, Post.objects.for_feed().filter(group_id=group.id))
+
+
+@api_view
+@conditional.conditional(conditional.profile)
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'id', flat=True).first()
+    if author_id is None:
+        raise Http404
+    return _feed(request,
+                 Post.objects.for_feed().filter(author_id=author_id))
+
+
+@conditional.conditional(conditional.follow_index)
+def _follow_index(request):
+    names = _fields(request, POST_FIELDS)
+    lookups = _lookups(names, POST_FIELDS, 'id')
+
+    def posts(entries):
+        found = {row['id']: row for row in Post.objects.filter(
+            id__in=[entry['post_id'] for entry in entries]
+        ).values(*lookups)}
+        return [found[entry['post_id']] for entry in entries
+                if entry['post_id'] in found]
+
+    entries = timeline(request.user.id).values('post_id', 'pub_date')
+    paginator = CursorPaginator(entries, _limit(request),
+                                tiebreak='post_id', transform=posts)
+    page = filled_page(request.user.id, lambda: paginator.get_page(
+        request.GET.get('cursor')))
+    return _page_response(page, POST_FIELDS, names)
+
+
+@api_view
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return _response({'error': 'Требуется вход'}, status=403)
+    return _follow_index(request)
+
+
+@api_view
+def post_view(request, post_id):
+    names = _fields(request, POST_FIELDS)
+    row = Post.objects.for_feed().filter(id=post_id).values(
+        *_lookups(names, POST_FIELDS)).first()
+    if row is None:
+        raise Http404
+    return _response(_serialize([row], names, POST_FIELDS)[0])
+
+
+@api_view
+def comments(request, post_id):
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    names = _fields(request, COMMENT_FIELDS)
+    rows = Comment.objects.filter(post_id=post_id).values(
+        *_lookups(names, COMMENT_FIELDS, 'created', 'id'))
+    return _page(request, rows, COMMENT_FIELDS, names, field='created')
@@ -0,0 +1,83 @@
+import time
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+
+VERSION_KEY = 'feed_version:{}'
+# Время последнего сдвига поколения: для заголовка Last-Modified.
+MODIFIED_KEY = 'feed_modified:{}'
+CARDS = 'cards'
+
+
+def feed_key(name, pk=None):
+    return name if pk is None else f'{name}:{pk}'
+
+
+def _initial_version():
+    # Счётчик начинается с текущего времени: если ключ версии вытеснен
+    # из кэша, новая версия не совпадёт ни с одной из прежних.
+    return time.time_ns()
+
+
+def _version(feed):
+    return cache.get_or_set(VERSION_KEY.format(feed), _initial_version, None)
+
+
+def feed_version(feed):
+    """Текущее поколение ленты; входит в ключи её кэшированных фрагментов.
+
+    К поколению самой ленты добавляется общее поколение карточек, которое
+    сдвигается при редких правках, затрагивающих карточки во всех лентах:
+    переименовании автора или группы.
+    """
+    return f'{_version(feed)}.{_version(CARDS)}'
+
+
+def bump_feed_versions(*feeds):
+    """Сдвигает поколения лент: их старые фрагменты больше не читаются."""
+    for feed in feeds:
+        key = VERSION_KEY.format(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+    now = time.time()
+    cache.set_many({MODIFIED_KEY.format(feed): now for feed in feeds}, None)
+
+
+def feed_validators(*feeds):
+    """Поколения и время последнего изменения лент одним get_many.
+
+    Возвращает (строка поколений, datetime изменения). Включает общее
+    поколение карточек, как и feed_version.
+    """
+    feeds = feeds + (CARDS,)
+    defaults = {}
+    for feed in feeds:
+        defaults[VERSION_KEY.format(feed)] = _initial_version
+        defaults[MODIFIED_KEY.format(feed)] = time.time
+    found = cache.get_many(defaults)
+    for key in defaults.keys() - found.keys():
+        # Ключ вытеснен или ещё не создавался: заводим его, как
+        # get_or_set, но не затираем значение, записанное параллельно.
+        value = defaults[key]()
+        cache.add(key, value, None)
+        found[key] = cache.get(key, value)
+    versions = '.'.join(str(found[VERSION_KEY.format(feed)])
+                        for feed in feeds)
+    modified = max(found[MODIFIED_KEY.format(feed)] for feed in feeds)
+    return versions, datetime.fromtimestamp(modified, timezone.utc)
+
+
+def last_modified(*feeds):
+    """Время последнего сдвига поколения любой из лент; 0, если не было."""
+    found = cache.get_many([MODIFIED_KEY.format(feed) for feed in feeds])
+    return max(found.values(), default=0)
+
+
+def post_feeds(author_id, *group_ids):
+    """Ленты, в которых показывается пост автора из данных групп."""
+    feeds = [feed_key('index'), feed_key('profile', author_id)]
+    feeds.extend(feed_key('group', group_id)
+                 for group_id in set(group_ids) if group_id is not None)
+    return feeds
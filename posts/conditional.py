@@ -0,0 +1,127 @@
+"""Условные GET-запросы для лент и страницы поста.
+
+Валидаторы страницы собираются из поколений её лент (posts.caching)
+и пары дешёвых выборок по первичному ключу, без шаблонов и без
+выборки постов. Если клиент прислал совпадающий If-None-Match или
+If-Modified-Since, condition отвечает 304 до вызова представления.
+
+В ETag входит id пользователя: меню, кнопки и форма комментария
+у каждого свои. Last-Modified отдаётся только анонимам, потому что
+время изменения лент не учитывает смену пользователя.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .caching import feed_key, feed_validators
+from .groups import get_by_slug
+from .models import Follow, Post, User
+
+STATS = ('stats__post_count', 'stats__comment_count',
+         'stats__follower_count', 'stats__following_count')
+
+
+def _etag(request, versions, *parts):
+    return '-'.join(str(part) for part in (
+        settings.RELEASE, request.user.id, versions, *parts
+    ))
+
+
+def _validators(request, compute, args, kwargs):
+    if not hasattr(request, '_validators'):
+        request._validators = compute(request, *args, **kwargs)
+    return request._validators
+
+
+def conditional(compute):
+    """Отвечает 304 по валидаторам из compute(request, *args, **kwargs).
+
+    compute возвращает (etag, last_modified) или None, если страницы
+    нет: тогда представление само ответит 404.
+    """
+    def etag(request, *args, **kwargs):
+        validators = _validators(request, compute, args, kwargs)
+        return validators and validators[0]
+
+    def last_modified(request, *args, **kwargs):
+        validators = _validators(request, compute, args, kwargs)
+        if validators and not request.user.is_authenticated:
+            return validators[1]
+        return None
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            # Браузер хранит страницу, но каждый раз сверяет валидаторы.
+            patch_cache_control(response, no_cache=True,
+                                private=request.user.is_authenticated)
+            return response
+        return condition(etag_func=etag,
+                         last_modified_func=last_modified)(wrapped)
+    return decorator
+
+
+def index(request):
+    versions, modified = feed_validators(feed_key('index'))
+    return _etag(request, versions), modified
+
+
+def trending(request):
+    # Правка поста сдвигает поколение index: карточки в популярном тоже.
+    versions, modified = feed_validators(feed_key('trending'),
+                                         feed_key('index'))
+    return _etag(request, versions), modified
+
+
+def groups(request):
+    # Посты и комментарии сдвигают index, а с ними и счётчики каталога.
+    versions, modified = feed_validators(feed_key('groups'),
+                                         feed_key('index'))
+    return _etag(request, versions), modified
+
+
+def group_posts(request, slug):
+    group = get_by_slug(slug)
+    if group is None:
+        return None
+    versions, modified = feed_validators(feed_key('group', group.id))
+    return _etag(request, versions), modified
+
+
+def _following(request):
+    # То же условие, что в представлении profile.
+    return (request.user.id is not None
+            and Follow.objects.filter(
+                author__following__user=request.user).exists())
+
+
+def profile(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'id', *STATS).first()
+    if author is None:
+        return None
+    versions, modified = feed_validators(feed_key('profile', author[0]))
+    etag = _etag(request, versions, *author[1:], _following(request))
+    return etag, modified
+
+
+def post_view(request, username, post_id):
+    # Правка поста и комментарии к нему сдвигают поколение ленты автора.
+    post = Post.objects.filter(
+        id=post_id, author__username=username
+    ).values_list('author_id', *(f'author__{field}' for field in STATS)
+                  ).first()
+    if post is None:
+        return None
+    versions, modified = feed_validators(feed_key('profile', post[0]))
+    return _etag(request, versions, *post[1:]), modified
+
+
+def follow_index(request):
+    versions, modified = feed_validators(
+        feed_key('index'), feed_key('follow', request.user.id)
+    )
+    return _etag(request, versions), modified
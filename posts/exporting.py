@@ -0,0 +1,151 @@
+"""Выгрузка данных пользователя: профиль, посты, комментарии, подписки.
+
+Строки читаются из базы через values_list().iterator(chunk_size=...)
+и сразу уходят клиенту, так что в памяти не больше одного пакета строк,
+сколько бы постов ни было у автора.
+
+Записи в формате входа import_yatube, но выгрузка не самодостаточна:
+в ней только строки самого пользователя. Группы постов, посты под
+чужими комментариями и другие участники подписок представлены одними
+id, без своих записей. Поэтому выгрузка загружается обратно только
+в базу, где эти строки уже есть (например, чтобы вернуть удалённые
+посты на том же сайте), а в пустую базу её строки со ссылками
+не пройдут проверку внешних ключей.
+
+ZIP собирается на лету. zipfile умеет писать в поток без seek
+(размеры файлов уходят в дескрипторы после данных), а каждый
+записанный кусок отдаётся наружу и забывается.
+"""
+import time
+import zipfile
+
+from .api import dumps
+from .models import Comment, Follow, Post, User
+
+CHUNK_SIZE = 500
+# Размер кусков, которыми ответ уходит клиенту.
+BUFFER_SIZE = 64 * 1024
+IMAGE_STORAGE = Post._meta.get_field('image').storage
+
+# Имя поля в записи -> поле для values_list().
+PROFILE_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'email': 'email',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'date_joined': 'date_joined',
+}
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author_id',
+    'group': 'group_id',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author_id',
+    'text': 'text',
+    'created': 'created',
+}
+FOLLOW_FIELDS = {
+    'user': 'user_id',
+    'author': 'author_id',
+}
+
+
+def _records(kind, queryset, fields):
+    rows = queryset.order_by('pk').values_list(*fields.values())
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        yield {'type': kind, **dict(zip(fields, row))}
+
+
+def sections(user):
+    """Пары (раздел, записи) в порядке, пригодном для import_yatube."""
+    return (
+        ('profile', _records('user', User.objects.filter(pk=user.pk),
+                             PROFILE_FIELDS)),
+        ('posts', _records('post', Post.objects.filter(author=user),
+                           POST_FIELDS)),
+        ('comments', _records('comment', Comment.objects.filter(author=user),
+                              COMMENT_FIELDS)),
+        ('followers', _records('follow', Follow.objects.filter(author=user),
+                               FOLLOW_FIELDS)),
+        ('following', _records('follow', Follow.objects.filter(user=user),
+                               FOLLOW_FIELDS)),
+    )
+
+
+def image_names(user):
+    """Различные файлы изображений автора; повторы убирает база."""
+    return Post.objects.filter(author=user).exclude(image='').exclude(
+        image__isnull=True
+    ).order_by('image').values_list('image', flat=True).distinct().iterator(
+        chunk_size=CHUNK_SIZE)
+
+
+def ndjson(user):
+    """Все записи пользователя строками JSON, кусками по BUFFER_SIZE."""
+    buffer = bytearray()
+    for _, records in sections(user):
+        for record in records:
+            buffer += dumps(record) + b'\n'
+            if len(buffer) >= BUFFER_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+class _Stream:
+    """Файл для zipfile без seek: копит записанное до следующего pop."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.offset = 0
+
+    def write(self, data):
+        self.buffer += data
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def archive(user):
+    """ZIP с разделами *.ndjson и изображениями в images/."""
+    stream = _Stream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as output:
+        for section, records in sections(user):
+            # force_zip64: размер раздела заранее не известен.
+            with output.open(f'{section}.ndjson', 'w',
+                             force_zip64=True) as member:
+                for record in records:
+                    member.write(dumps(record) + b'\n')
+                    if len(stream.buffer) >= BUFFER_SIZE:
+                        yield stream.pop()
+        for name in image_names(user):
+            if not IMAGE_STORAGE.exists(name):
+                continue
+            # JPEG и PNG уже сжаты: кладём как есть.
+            info = zipfile.ZipInfo(f'images/{name}', time.gmtime()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with IMAGE_STORAGE.open(name) as source, \
+                    output.open(info, 'w', force_zip64=True) as member:
+                for chunk in source.chunks(BUFFER_SIZE):
+                    member.write(chunk)
+                    if stream.buffer:
+                        yield stream.pop()
+    yield stream.pop()
@@ -1,6 +1,8 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm, Textarea
 
 from .models import Comment, Post
+from .uploads import sanitize
 
 
 class PostForm(ModelForm):
@@ -13,6 +15,22 @@ class PostForm(ModelForm):
             'image': 'Изображение'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return sanitize(image)
+        return image
+
+    def clean(self):
+        # Файл, отвергнутый ImageUploadHandler, приходит пустым; вместо
+        # общего «файл пуст» показываем настоящую причину отказа.
+        image = self.files.get(self.add_prefix('image'))
+        error = getattr(image, 'error', None)
+        if error is not None:
+            self.errors.pop('image', None)
+            self.add_error('image', error)
+        return super().clean()
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,50 @@
+"""Сообщества по slug: словарь процесса поверх общего кэша.
+
+Каждая страница и запрос API группы начинаются с поиска Group по slug.
+Найденная группа хранится в общем кэше и в словаре процесса под
+поколением ленты groups, которое сдвигает сигнал сохранения или
+удаления группы (в том числе из админки). Сверка поколения — одно
+чтение кэша; прежние записи после сдвига просто не читаются.
+"""
+import threading
+
+from django.core.cache import cache
+from django.http import Http404
+
+from .caching import feed_key, feed_validators
+from .models import Group
+
+GROUPS = feed_key('groups')
+GROUP_KEY = 'group:{}:{}'
+# Столько slug держит словарь процесса; при переполнении он очищается.
+LOCAL_SIZE = 1024
+
+_local = {}
+_lock = threading.Lock()
+
+
+def get_by_slug(slug):
+    """Сообщество по slug или None."""
+    generation, _ = feed_validators(GROUPS)
+    entry = _local.get(slug)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    key = GROUP_KEY.format(generation, slug)
+    group = cache.get(key)
+    if group is None:
+        group = Group.objects.filter(slug=slug).first()
+        if group is None:
+            return None
+        cache.set(key, group)
+    with _lock:
+        if len(_local) >= LOCAL_SIZE:
+            _local.clear()
+        _local[slug] = (generation, group)
+    return group
+
+
+def get_or_404(slug):
+    group = get_by_slug(slug)
+    if group is None:
+        raise Http404('Сообщество не найдено')
+    return group
@@ -0,0 +1,390 @@
+"""Массовая загрузка пользователей, групп, постов, комментариев и подписок.
+
+Источник — файлы JSONL, где тип записи лежит в поле "type", или CSV,
+где тип берётся из имени файла: users.csv, groups.csv, posts.csv,
+comments.csv, follows.csv. Записи сохраняются под исходными id, так что
+ссылки между ними (author, group, post, user) переносятся как есть.
+Порядок загрузки: пользователи и группы, посты, комментарии, подписки.
+
+Записи пишутся пакетными INSERT, каждый пакет в своей транзакции.
+После коммита пакета номер строки сохраняется в файл контрольной точки,
+и прерванная загрузка продолжается с него. Повтор пакета безопасен:
+строки с уже занятым ключом пропускаются. Изображения постов
+перекодируются и кладутся в хранилище параллельно, в отдельных процессах.
+
+bulk_create обходит сигналы, поэтому производные данные — счётчики,
+ленты подписок, поисковый индекс, ссылки на файлы, задания миниатюр —
+пересчитываются один раз в конце, в finalize.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import media, search, stats
+from .caching import CARDS, bump_feed_versions, feed_key
+from .models import Comment, Follow, Group, Post, ThumbnailJob, User
+from .timeline import backfill
+from .uploads import sanitize
+
+BATCH_SIZE = 1000
+# Не чаще этого (в секундах) importer сообщает о ходе загрузки.
+PROGRESS_INTERVAL = 5
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+
+def _datetime(value):
+    if not value:
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'неверная дата {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def _optional_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+def _user(record):
+    return User(
+        id=int(record['id']),
+        username=record['username'],
+        email=record.get('email') or '',
+        first_name=record.get('first_name') or '',
+        last_name=record.get('last_name') or '',
+        password=record.get('password') or make_password(None),
+        date_joined=_datetime(record.get('date_joined')),
+    )
+
+
+def _group(record):
+    return Group(id=int(record['id']), title=record['title'],
+                 slug=record['slug'],
+                 description=record.get('description') or '')
+
+
+def _post(record):
+    return Post(id=int(record['id']), text=record['text'],
+                pub_date=_datetime(record.get('pub_date')),
+                author_id=int(record['author']),
+                group_id=_optional_id(record.get('group')))
+
+
+def _comment(record):
+    return Comment(id=_optional_id(record.get('id')),
+                   post_id=int(record['post']),
+                   author_id=int(record['author']), text=record['text'],
+                   created=_datetime(record.get('created')))
+
+
+def _follow(record):
+    follow = Follow(user_id=int(record['user']),
+                    author_id=int(record['author']))
+    if follow.user_id == follow.author_id:
+        raise ValueError('подписка на самого себя')
+    return follow
+
+
+BUILDERS = {
+    'user': (User, _user),
+    'group': (Group, _group),
+    'post': (Post, _post),
+    'comment': (Comment, _comment),
+    'follow': (Follow, _follow),
+}
+
+
+def _bulk_insert(model, objects):
+    """Пакетный INSERT, пропускающий строки с уже занятым ключом.
+
+    bulk_create вызывает pre_save полей, и auto_now_add заменил бы даты
+    из источника текущим временем. Вставка raw, как при загрузке
+    фикстур, пишет значения полей как есть и не трогает общие для всего
+    процесса объекты полей.
+    """
+    meta = model._meta
+    for batch, fields in (
+            ([obj for obj in objects if obj.pk is not None],
+             meta.concrete_fields),
+            ([obj for obj in objects if obj.pk is None],
+             [field for field in meta.concrete_fields
+              if field is not meta.pk])):
+        if not batch:
+            continue
+        size = max(connection.ops.bulk_batch_size(fields, batch), 1)
+        for start in range(0, len(batch), size):
+            model._base_manager._insert(batch[start:start + size], fields,
+                                        raw=True, ignore_conflicts=True)
+
+
+def _key(obj):
+    if isinstance(obj, Follow):
+        return obj.user_id, obj.author_id
+    return obj.pk
+
+
+def _existing(model, objects):
+    """Ключи объектов пакета, строки которых уже есть в базе."""
+    if model is Follow:
+        rows = Follow.objects.filter(
+            user_id__in={obj.user_id for obj in objects},
+            author_id__in={obj.author_id for obj in objects}
+        ).values_list('user_id', 'author_id')
+        return set(rows) & {_key(obj) for obj in objects}
+    return set(model._base_manager.filter(
+        pk__in=[obj.pk for obj in objects if obj.pk is not None]
+    ).values_list('pk', flat=True))
+
+
+def _insert_new(model, objects):
+    """Вставляет пакет; возвращает объекты, строки которых добавились.
+
+    Строка с занятым ключом (повтор пакета после сбоя, дубль в источнике,
+    чужое имя пользователя) пропускается базой молча, поэтому вставленные
+    определяются по ключам, которых не было до вставки и стало после.
+    Комментарии без id конфликтовать не могут.
+    """
+    before = _existing(model, objects)
+    _bulk_insert(model, objects)
+    added = _existing(model, objects) - before
+    inserted = []
+    for obj in objects:
+        key = _key(obj)
+        if key is None:
+            inserted.append(obj)
+        elif key in added:
+            # Из дублей внутри пакета вставляется первый.
+            added.discard(key)
+            inserted.append(obj)
+    return inserted
+
+
+def kind_from_name(path):
+    """Тип записей CSV-файла по его имени: posts.csv -> post."""
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    return stem[:-1] if stem.endswith('s') else stem
+
+
+def read_rows(path):
+    """Пары (номер строки, запись) из JSONL или CSV.
+
+    Строки JSONL отдаются неразобранными: пропуск уже загруженной части
+    файла не тратит времени на json.loads.
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.csv'):
+            yield from enumerate(csv.DictReader(source), 1)
+            return
+        for number, line in enumerate(source, 1):
+            if line.strip():
+                yield number, line
+
+
+def store_image(path):
+    """Перекодирует и сохраняет изображение; возвращает (имя, ошибка).
+
+    Выполняется в процессе-воркере, к базе не обращается.
+    """
+    field = Post._meta.get_field('image')
+    try:
+        with open(path, 'rb') as source:
+            content = sanitize(File(source, name=os.path.basename(path)))
+            with content:
+                name = field.storage.save(
+                    field.generate_filename(None, content.name), content)
+    except ValidationError as error:
+        return None, '; '.join(error.messages)
+    except OSError as error:
+        return None, str(error)
+    return name, None
+
+
+class Checkpoint:
+    """Номер последней закоммиченной строки файла в path.checkpoint."""
+
+    def __init__(self, path):
+        self.path = path + CHECKPOINT_SUFFIX
+
+    def load(self):
+        try:
+            with open(self.path) as source:
+                return json.load(source)['line']
+        except FileNotFoundError:
+            return 0
+
+    def save(self, line):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as output:
+            json.dump({'line': line}, output)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+    """Загрузка файлов пакетами с контрольными точками.
+
+    progress(path, line, counts) вызывается не чаще PROGRESS_INTERVAL,
+    error(path, line, message) — на каждую отвергнутую запись.
+    """
+
+    def __init__(self, image_root='', workers=None, batch_size=BATCH_SIZE,
+                 progress=None, error=None):
+        self.image_root = image_root
+        self.workers = os.cpu_count() if workers is None else workers
+        self.batch_size = batch_size
+        self.progress = progress or (lambda *args: None)
+        self.error = error or (lambda *args: None)
+        self.counts = Counter()
+        self.authors = set()
+        self._executor = None
+        self._reported = 0
+
+    def _map(self, function, items):
+        if not self.workers:
+            return map(function, items)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers)
+        return self._executor.map(
+            function, items,
+            chunksize=max(1, len(items) // (self.workers * 4))
+        )
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _build(self, path, kind, rows):
+        pairs = []
+        for number, record in rows:
+            try:
+                pairs.append((number, record, BUILDERS[kind][1](record)))
+            except (KeyError, TypeError, ValueError) as error:
+                self.error(path, number, f'{kind}: {error!r}')
+        return pairs
+
+    def _attach_images(self, path, pairs):
+        images = [(number, post, os.path.join(self.image_root,
+                                              record['image']))
+                  for number, record, post in pairs if record.get('image')]
+        stored = self._map(store_image, [image for *_, image in images])
+        for (number, post, _), (name, error) in zip(images, stored):
+            if error is None:
+                post.image = name
+            else:
+                self.error(path, number, f'image: {error}')
+
+    def _insert(self, path, model, pairs):
+        try:
+            with transaction.atomic():
+                return _insert_new(model, [obj for *_, obj in pairs])
+        except IntegrityError:
+            pass
+        # Пакет целиком не прошёл: ищем виноватые строки по одной.
+        inserted = []
+        for number, _, obj in pairs:
+            try:
+                with transaction.atomic():
+                    inserted.extend(_insert_new(model, [obj]))
+            except IntegrityError as error:
+                self.error(path, number, f'{model.__name__}: {error}')
+        return inserted
+
+    def _flush(self, path, kind, rows):
+        if kind not in BUILDERS:
+            for number, _ in rows:
+                self.error(path, number, f'неизвестный тип {kind!r}')
+            return
+        model = BUILDERS[kind][0]
+        pairs = self._build(path, kind, rows)
+        if kind == 'post':
+            self._attach_images(path, pairs)
+        inserted = self._insert(path, model, pairs)
+        if kind == 'post':
+            self.authors.update(post.author_id for post in inserted)
+        if kind == 'follow':
+            for follow in inserted:
+                backfill(follow.user_id, follow.author_id)
+        self.counts[kind] += len(inserted)
+
+    def _report(self, path, line, force=False):
+        now = time.monotonic()
+        if force or now - self._reported >= PROGRESS_INTERVAL:
+            self._reported = now
+            self.progress(path, line, self.counts)
+
+    def run(self, path, kind=None, resume=True):
+        """Загружает файл, продолжая с контрольной точки, если она есть."""
+        checkpoint = Checkpoint(path)
+        start = checkpoint.load() if resume else 0
+        batch, batch_kind, last = [], None, start
+        for number, row in read_rows(path):
+            if number <= start:
+                continue
+            if isinstance(row, str):
+                try:
+                    row = json.loads(row)
+                except ValueError as error:
+                    self.error(path, number, f'json: {error}')
+                    continue
+            row_kind = kind or row.get('type') or kind_from_name(path)
+            if batch and (row_kind != batch_kind
+                          or len(batch) >= self.batch_size):
+                self._flush(path, batch_kind, batch)
+                checkpoint.save(last)
+                self._report(path, last)
+                batch = []
+            batch_kind = row_kind
+            batch.append((number, row))
+            last = number
+        if batch:
+            self._flush(path, batch_kind, batch)
+        checkpoint.clear()
+        self._report(path, last, force=True)
+
+    def finalize(self):
+        """Пересчитывает то, что при обычной записи делают сигналы."""
+        models = [model for model, _ in BUILDERS.values()]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        stats.rebuild_post_counts()
+        stats.rebuild_user_stats()
+        stats.rebuild_group_stats()
+        # Подписки, загруженные раньше постов своих авторов.
+        authors = sorted(self.authors)
+        for start in range(0, len(authors), BATCH_SIZE):
+            follows = Follow.objects.filter(
+                author_id__in=authors[start:start + BATCH_SIZE]
+            ).values_list('user_id', 'author_id')
+            for user_id, author_id in follows:
+                backfill(user_id, author_id)
+        search.rebuild()
+        media.rebuild_ref_counts()
+        posts = Post.objects.filter(thumbnail='').exclude(
+            image='').exclude(image__isnull=True)
+        ThumbnailJob.objects.bulk_create(
+            (ThumbnailJob(post_id=post_id, image=image)
+             for post_id, image in posts.values_list(
+                 'id', 'image').iterator(chunk_size=BATCH_SIZE)),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        # Поколение карточек входит в ключи всех лент, целых страниц
+        # и ETag: сдвиг устаревает их разом, не трогая остальной кэш.
+        bump_feed_versions(CARDS, feed_key('groups'))
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts.media import GRACE, collect_garbage
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает ссылки на изображения и удаляет файлы '
+            'и варианты, на которые не ссылается ни один пост')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=int(GRACE.total_seconds()),
+            help='Не трогать файлы моложе стольких секунд'
+        )
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, что будет удалено')
+
+    def handle(self, *args, **options):
+        removed = collect_garbage(timedelta(seconds=options['grace']),
+                                  dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+        action = 'К удалению' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {len(removed)}'))
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporting
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Выгружает профиль, посты, комментарии, подписки и изображения '
+            'пользователя в ZIP или NDJSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=('zip', 'ndjson'),
+                            default='zip')
+        parser.add_argument('--output',
+                            help='Файл выгрузки, «-» — стандартный вывод '
+                                 '(по умолчанию yatube-<username>.<format>)')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден')
+        stream = (exporting.ndjson if options['format'] == 'ndjson'
+                  else exporting.archive)(user)
+        path = (options['output']
+                or f'yatube-{user.username}.{options["format"]}')
+        if path == '-':
+            for chunk in stream:
+                sys.stdout.buffer.write(chunk)
+            return
+        with open(path, 'wb') as output:
+            for chunk in stream:
+                output.write(chunk)
+        self.stdout.write(self.style.SUCCESS(f'Выгрузка записана в {path}'))
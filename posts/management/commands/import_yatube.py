@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from posts.importing import BATCH_SIZE, BUILDERS, Importer
+
+
+class Command(BaseCommand):
+    help = ('Загружает пользователей, группы, посты, комментарии и подписки '
+            'из JSONL или CSV пакетами, с контрольными точками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', metavar='path',
+                            help='Файлы .jsonl или .csv в порядке загрузки')
+        parser.add_argument('--kind', choices=sorted(BUILDERS),
+                            help='Тип записей, если его нет ни в записи, '
+                                 'ни в имени файла')
+        parser.add_argument('--images', default='',
+                            help='Каталог, от которого отсчитываются пути '
+                                 'изображений в записях постов')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Процессов для изображений (по умолчанию '
+                                 'по числу ядер, 0 — без отдельных '
+                                 'процессов)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--no-resume', action='store_true',
+                            help='Начать файлы сначала, не глядя '
+                                 'на контрольные точки')
+        parser.add_argument('--skip-finalize', action='store_true',
+                            help='Не пересчитывать счётчики, ленты и индекс: '
+                                 'для загрузки частями')
+
+    def progress(self, path, line, counts):
+        loaded = ', '.join(f'{kind}: {count}'
+                           for kind, count in sorted(counts.items()))
+        self.stdout.write(f'{path}: строка {line} ({loaded})')
+
+    def error(self, path, line, message):
+        self.stderr.write(f'{path}:{line}: {message}')
+
+    def handle(self, *args, **options):
+        importer = Importer(image_root=options['images'],
+                            workers=options['workers'],
+                            batch_size=options['batch_size'],
+                            progress=self.progress, error=self.error)
+        try:
+            for path in options['paths']:
+                importer.run(path, kind=options['kind'],
+                             resume=not options['no_resume'])
+        finally:
+            importer.close()
+        if not options['skip_finalize']:
+            self.stdout.write('Пересчёт счётчиков, лент и индексов')
+            importer.finalize()
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено записей: {sum(importer.counts.values())}'))
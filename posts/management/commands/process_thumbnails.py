@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import process_pending
+
+
+class Command(BaseCommand):
+    help = ('Готовит миниатюры, которые не успели сделать потоки '
+            'веб-сервера; с --loop работает как отдельный обработчик')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а ждать новых заданий')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Пауза между проверками очереди, с')
+        parser.add_argument('--limit', type=int, default=100,
+                            help='Заданий за один проход')
+
+    def handle(self, *args, **options):
+        while True:
+            done = process_pending(options['limit'])
+            if done:
+                self.stdout.write(f'Готово миниатюр: {done}')
+            if not options['loop']:
+                break
+            if done < options['limit']:
+                time.sleep(options['interval'])
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Заново строит поисковый индекс постов и комментариев: '
+            'после миграции или массовой загрузки')
+
+    def handle(self, *args, **options):
+        search.rebuild()
+        backend = 'FTS5' if search.use_fts() else 'SearchPosting'
+        self.stdout.write(self.style.SUCCESS(f'Индекс перестроен ({backend})'))
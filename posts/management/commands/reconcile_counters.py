@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts.stats import (rebuild_group_stats, rebuild_post_counts,
+                         rebuild_user_stats)
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики записей, комментариев, подписок '
+            'и сообществ после массовой загрузки или расхождения данных')
+
+    def handle(self, *args, **options):
+        rebuild_post_counts()
+        rebuild_user_stats()
+        rebuild_group_stats()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
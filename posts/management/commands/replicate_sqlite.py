@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from yatube.db_router import replicate
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в реплики вместо настоящей '
+            'репликации; с --loop повторяет копирование')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а копировать '
+                                 'с паузой --interval')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Пауза между копиями, с')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('Реплики не настроены: YATUBE_DB_REPLICAS')
+        if connection.vendor != 'sqlite':
+            raise CommandError('Реплики PostgreSQL наполняет потоковая '
+                               'репликация самого сервера')
+        while True:
+            replicate()
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.trending import update
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает популярное по новым постам и комментариям; '
+            'с --loop работает как отдельный обработчик')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Не завершаться, а пересчитывать '
+                                 'с паузой --interval')
+        parser.add_argument('--interval', type=float, default=60.0,
+                            help='Пауза между проходами, с')
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать всё окно заново')
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            scored = update(full=full)
+            if scored:
+                self.stdout.write(f'Пересчитано постов: {scored}')
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['interval'])
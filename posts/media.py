@@ -0,0 +1,114 @@
+"""Счётчики ссылок на файлы изображений и сборка мусора.
+
+Изображения постов лежат в ContentAddressedStorage: один файл на
+одинаковое содержимое. Сигналы постов увеличивают и уменьшают
+MediaBlob.ref_count; collect_garbage удаляет файлы, на которые никто
+не ссылается, и варианты изображений, которых нет ни в одном манифесте.
+"""
+import json
+import posixpath
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import MediaBlob, Post
+
+IMAGE_DIRECTORY = Post._meta.get_field('image').upload_to.rstrip('/')
+VARIANT_DIRECTORY = 'variants'
+# Файл моложе этого не удаляется: его пост мог ещё не закоммититься.
+GRACE = timedelta(hours=1)
+
+
+def retain(name):
+    if not name:
+        return
+    updated = MediaBlob.objects.filter(name=name).update(
+        ref_count=F('ref_count') + 1, updated=timezone.now()
+    )
+    if not updated:
+        blob, created = MediaBlob.objects.get_or_create(
+            name=name, defaults={'ref_count': 1}
+        )
+        if not created:
+            retain(name)
+
+
+def release(name):
+    if name:
+        MediaBlob.objects.filter(name=name, ref_count__gt=0).update(
+            ref_count=F('ref_count') - 1, updated=timezone.now()
+        )
+
+
+def rebuild_ref_counts():
+    """Пересчитывает счётчики по таблице постов."""
+    counts = dict(
+        Post.objects.exclude(image='').exclude(image__isnull=True)
+        .values_list('image').annotate(count=Count('id')).order_by()
+    )
+    for blob in MediaBlob.objects.all().iterator():
+        count = counts.pop(blob.name, 0)
+        if blob.ref_count != count:
+            MediaBlob.objects.filter(pk=blob.pk).update(
+                ref_count=count, updated=timezone.now()
+            )
+    MediaBlob.objects.bulk_create(
+        [MediaBlob(name=name, ref_count=count)
+         for name, count in counts.items()],
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+def _walk(storage, directory):
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield posixpath.join(directory, name)
+    for name in directories:
+        yield from _walk(storage, posixpath.join(directory, name))
+
+
+def _expired(storage, name, deadline):
+    return storage.get_modified_time(name) < deadline
+
+
+def _referenced_variants():
+    referenced = set()
+    manifests = Post.objects.exclude(image_variants='').values_list(
+        'thumbnail', 'image_variants'
+    )
+    for thumbnail, manifest in manifests.iterator():
+        referenced.add(thumbnail)
+        for variants in json.loads(manifest).values():
+            referenced.update(name for _, name in variants)
+    return referenced
+
+
+def collect_garbage(grace=GRACE, dry_run=False):
+    """Удаляет сиротские изображения и варианты; возвращает их имена."""
+    rebuild_ref_counts()
+    storage = Post._meta.get_field('image').storage
+    deadline = timezone.now() - grace
+    live = set(MediaBlob.objects.filter(ref_count__gt=0).values_list(
+        'name', flat=True))
+    orphans = []
+    if storage.exists(IMAGE_DIRECTORY):
+        orphans += [
+            (storage, name) for name in _walk(storage, IMAGE_DIRECTORY)
+            if name not in live and _expired(storage, name, deadline)
+        ]
+    if default_storage.exists(VARIANT_DIRECTORY):
+        referenced = _referenced_variants()
+        orphans += [
+            (default_storage, name)
+            for name in _walk(default_storage, VARIANT_DIRECTORY)
+            if name not in referenced
+            and _expired(default_storage, name, deadline)
+        ]
+    if not dry_run:
+        for orphan_storage, name in orphans:
+            orphan_storage.delete(name)
+        MediaBlob.objects.filter(ref_count=0,
+                                 updated__lt=deadline).delete()
+    return [name for _, name in orphans]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:22
+
+from django.db import migrations, models
+
+
+def queue_variants(apps, schema_editor):
+    # Посты с миниатюрой прежнего вида получают варианты при следующем
+    # запуске process_thumbnails.
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    posts = Post.objects.exclude(image='').exclude(image__isnull=True)
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(post_id=post_id, image=image)
+         for post_id, image in posts.values_list('id', 'image').iterator()),
+        batch_size=1000, ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_auto_20261018_0220'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False, help_text='JSON: {формат: [[ширина, файл], ...]}', verbose_name='Варианты изображения'),
+        ),
+        migrations.RunPython(queue_variants, migrations.RunPython.noop),
+    ]
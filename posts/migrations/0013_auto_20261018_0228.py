@@ -0,0 +1,48 @@
+# Generated by Django 2.2.6 on 2026-10-18 02:28
+
+from django.db import migrations, models
+from django.db.models import Count
+import yatube.storage
+
+
+def count_references(apps, schema_editor):
+    # Уже загруженные файлы остаются под прежними именами, но тоже
+    # получают счётчики: иначе collect_media счёл бы их сиротами.
+    Post = apps.get_model('posts', 'Post')
+    MediaBlob = apps.get_model('posts', 'MediaBlob')
+    counts = Post.objects.exclude(image='').exclude(
+        image__isnull=True
+    ).values_list('image').annotate(count=Count('id')).order_by()
+    MediaBlob.objects.bulk_create(
+        (MediaBlob(name=name, ref_count=count) for name, count in counts),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите изображение', null=True, storage=yatube.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Изображение'),
+        ),
+        migrations.RunPython(count_references,
+                             migrations.RunPython.noop),
+    ]
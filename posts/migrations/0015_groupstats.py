@@ -0,0 +1,51 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db.models import Count, Max
+
+
+def count_group_posts(apps, schema_editor):
+    # Уже существующие сообщества сразу попадают в каталог.
+    Group = apps.get_model('posts', 'Group')
+    GroupStats = apps.get_model('posts', 'GroupStats')
+    rows = Group.objects.annotate(
+        post_count=Count('posts', distinct=True),
+        last_post=Max('posts__pub_date'),
+        last_comment=Max('posts__comments__created')
+    ).values_list('id', 'post_count', 'last_post', 'last_comment')
+    now = django.utils.timezone.now()
+    GroupStats.objects.bulk_create(
+        (GroupStats(group_id=group_id, post_count=post_count,
+                    last_activity=max(filter(None, dates), default=now))
+         for group_id, post_count, *dates in rows),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_trendingentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='posts.Group', verbose_name='Сообщество')),
+                ('post_count', models.PositiveIntegerField(default=0, verbose_name='Записей')),
+                ('last_activity', models.DateTimeField(default=django.utils.timezone.now, help_text='Новый пост или комментарий в сообществе', verbose_name='Последняя активность')),
+            ],
+            options={
+                'verbose_name': 'Статистика сообщества',
+                'verbose_name_plural': 'Статистика сообществ',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupstats',
+            index=models.Index(fields=['-last_activity', '-group'], name='group_stats_activity_idx'),
+        ),
+        migrations.RunPython(count_group_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_groupstats'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchposting',
+            name='search_term_post_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', 'post'], name='search_term_post_idx', opclasses=['varchar_pattern_ops', '']),
+        ),
+    ]
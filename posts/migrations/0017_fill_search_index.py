@@ -0,0 +1,21 @@
+from django.db import DEFAULT_DB_ALIAS, migrations
+
+
+def fill_search_index(apps, schema_editor):
+    # Посты, которые были до появления индекса, иначе не находились бы
+    # до ручного rebuild_search_index. Реплики получают индекс копией.
+    if schema_editor.connection.alias != DEFAULT_DB_ALIAS:
+        return
+    from posts import search
+    search.rebuild(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_search_pattern_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
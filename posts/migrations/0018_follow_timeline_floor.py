@@ -0,0 +1,18 @@
+# Generated by Django 2.2.6 on 2026-10-18 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_fill_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='follow',
+            name='timeline_floor',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Граница ленты'),
+        ),
+    ]
@@ -1,5 +1,11 @@
+import json
+
 from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils import timezone
+
+from yatube.storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -27,6 +33,16 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты вместе с автором и группой.
+
+        Карточка поста не делает дополнительных запросов: автор и группа
+        подтягиваются JOIN-ом, а число комментариев хранится в самом посте.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст публикации',
@@ -48,18 +64,79 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         verbose_name='Изображение',
         help_text='Загрузите изображение'
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Комментариев'
+    )
+    thumbnail = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        verbose_name='Миниатюра',
+        help_text='Заполняется фоновой обработкой изображения'
+    )
+    image_variants = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения',
+        help_text='JSON: {формат: [[ширина, файл], ...]}'
+    )
+
+    objects = PostQuerySet.as_manager()
+
+    # Столбцы, которые сигналы и обработчик миниатюр ведут своими
+    # UPDATE. Сохранение существующего поста их не пишет: загруженные
+    # вместе с формой или в админке значения могли устареть.
+    MAINTAINED_FIELDS = ('comment_count', 'thumbnail', 'image_variants')
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_url(self):
+        return default_storage.url(self.thumbnail) if self.thumbnail else ''
+
+    @property
+    def variants(self):
+        return json.loads(self.image_variants) if self.image_variants else {}
+
+    @property
+    def srcsets(self):
+        """srcset для каждого формата: «url 320w, url 640w, ...»."""
+        return {
+            name: ', '.join(f'{default_storage.url(file)} {width}w'
+                            for width, file in variants)
+            for name, variants in self.variants.items()
+        }
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -82,6 +159,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+            # Новые комментарии для пересчёта популярного.
+            models.Index(fields=['created'], name='comment_created_idx'),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -98,6 +181,11 @@ class Follow(models.Model):
                                on_delete=models.CASCADE,
                                related_name='following',
                                verbose_name='Автор')
+    # Дата самого старого поста автора, дописанного в ленту подписчика;
+    # None — в ленте вся история автора (posts/timeline.py).
+    timeline_floor = models.DateTimeField(null=True, blank=True,
+                                          editable=False,
+                                          verbose_name='Граница ленты')
 
     def __str__(self):
         return (self.author, self.user)
@@ -108,3 +196,206 @@ class Follow(models.Model):
                                     name='unigue_subscriber')
         ]
         ordering = ['-user']
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE,
+        primary_key=True, related_name='stats',
+        verbose_name='Пользователь'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0, verbose_name='Записей'
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0, verbose_name='Комментариев'
+    )
+    follower_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписчиков'
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class GroupStats(models.Model):
+    """Счётчики сообщества для каталога /groups/, ведутся сигналами."""
+    group = models.OneToOneField(
+        Group, on_delete=models.CASCADE,
+        primary_key=True, related_name='stats',
+        verbose_name='Сообщество'
+    )
+    post_count = models.PositiveIntegerField(
+        default=0, verbose_name='Записей'
+    )
+    last_activity = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Последняя активность',
+        help_text='Новый пост или комментарий в сообществе'
+    )
+
+    class Meta:
+        verbose_name = 'Статистика сообщества'
+        verbose_name_plural = 'Статистика сообществ'
+        indexes = [
+            models.Index(fields=['-last_activity', '-group'],
+                         name='group_stats_activity_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.group)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='timeline', db_index=False,
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Публикация'
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_pub_date_idx'),
+            models.Index(fields=['user', 'author', '-pub_date'],
+                         name='timeline_user_author_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post}'
+
+
+class TrendingEntry(models.Model):
+    """Место поста в популярном: счёт считает posts.trending.
+
+    Хранит только посты за последние TRENDING_WINDOW, поэтому таблица
+    мала, а лента читается по индексу (-score, -post) без сортировки
+    всей таблицы постов.
+    """
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE,
+        primary_key=True, related_name='trending',
+        verbose_name='Публикация'
+    )
+    score = models.FloatField(verbose_name='Счёт')
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+    updated = models.DateTimeField(verbose_name='Учтены события до')
+
+    class Meta:
+        ordering = ['-score', '-post']
+        verbose_name = 'Запись популярного'
+        verbose_name_plural = 'Записи популярного'
+        indexes = [
+            models.Index(fields=['-score', '-post'],
+                         name='trending_score_idx'),
+            models.Index(fields=['pub_date'],
+                         name='trending_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} ({self.score:.2f})'
+
+
+class SearchPosting(models.Model):
+    """Вхождение основы слова в пост или комментарий к нему.
+
+    Используется поиском, только если база не поддерживает SQLite FTS5.
+    """
+    term = models.CharField(max_length=64, verbose_name='Основа слова')
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE,
+        related_name='+', verbose_name='Публикация'
+    )
+    comment = models.ForeignKey(
+        Comment, on_delete=models.CASCADE,
+        blank=True, null=True, related_name='+',
+        verbose_name='Комментарий'
+    )
+    weight = models.FloatField(verbose_name='Вес')
+
+    class Meta:
+        verbose_name = 'Вхождение в поисковый индекс'
+        verbose_name_plural = 'Поисковый индекс'
+        # varchar_pattern_ops нужен PostgreSQL, чтобы искать по индексу
+        # префиксы (term LIKE 'кот%') при любой локали базы. Остальные
+        # базы классы операторов пропускают.
+        indexes = [
+            models.Index(fields=['term', 'post'],
+                         name='search_term_post_idx',
+                         opclasses=['varchar_pattern_ops', '']),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class ThumbnailJob(models.Model):
+    """Задание на миниатюру загруженного изображения.
+
+    Пока задание не выполнено, в карточке поста выводится заглушка.
+    """
+    post = models.OneToOneField(
+        Post, on_delete=models.CASCADE,
+        related_name='thumbnail_job', verbose_name='Публикация'
+    )
+    image = models.CharField(max_length=255, verbose_name='Изображение')
+    created = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Попыток'
+    )
+    locked_until = models.DateTimeField(
+        blank=True, null=True, verbose_name='Занято обработчиком до'
+    )
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+
+    class Meta:
+        ordering = ['created']
+        verbose_name = 'Задание на миниатюру'
+        verbose_name_plural = 'Задания на миниатюры'
+
+    def __str__(self):
+        return self.image
+
+
+class MediaBlob(models.Model):
+    """Файл хранилища по адресу содержимого и число постов, его использующих.
+
+    Файлы с нулевым счётчиком удаляет manage.py collect_media.
+    """
+    name = models.CharField(max_length=255, primary_key=True,
+                            verbose_name='Файл')
+    ref_count = models.PositiveIntegerField(default=0,
+                                            verbose_name='Ссылок')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Файл хранилища'
+        verbose_name_plural = 'Файлы хранилища'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,213 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Ленты, страница поста и «об авторе» для всех гостей одинаковы, кроме
+пары мест: меню с входом и регистрацией, форма комментария с CSRF.
+Эти места в шаблонах отмечены тегом {% hole %}. При рендере для кэша
+вместо них выводится метка <!--hole:...-->, страница сохраняется
+с метками, а при каждой выдаче метки заменяются фрагментами,
+отрисованными для текущего запроса (HOLES).
+
+Запрос без cookie сессии обслуживается из кэша до вызова представления
+и без обращений к базе. Ключ страницы включает поколения её лент,
+которые сдвигают сигналы моделей (page_feeds), поэтому запись
+устаревает сама. Из строки запроса в ключ попадают только параметры,
+которые читают представления (PAGE_QUERY); запрос с любыми другими
+параметрами кэш обходит, иначе ими можно было бы забить кэш копиями
+одной страницы.
+"""
+import base64
+import hashlib
+import json
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe, urlencode
+from django.utils.safestring import mark_safe
+
+from .caching import CARDS, feed_key, feed_validators, last_modified
+from .forms import CommentForm
+from .models import Group, User
+from .pagination import decode_cursor
+
+PAGE_KEY = 'page:{}'
+HOLE = '<!--hole:{}:{}-->'
+HOLE_PATTERN = re.compile(r'<!--hole:(\w+):([\w=-]*)-->')
+REPLAYED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control')
+# Параметры страниц из PAGE_CACHE_VIEWS и проверка их значений.
+PAGE_QUERY = {
+    'cursor': lambda value: decode_cursor(value) is not None,
+    'page': str.isdigit,
+}
+
+
+def _render_nav(request):
+    return render_to_string('includes/nav.html', request=request)
+
+
+def _render_menu(request, index=False, follow=False, trending=False):
+    return render_to_string(
+        'includes/menu.html',
+        {'index': index, 'follow': follow, 'trending': trending},
+        request=request
+    )
+
+
+def _render_comment_form(request, username, post_id):
+    return render_to_string(
+        'includes/comment_form.html',
+        {'username': username, 'post_id': post_id, 'form': CommentForm()},
+        request=request
+    )
+
+
+HOLES = {
+    'nav': _render_nav,
+    'menu': _render_menu,
+    'comment_form': _render_comment_form,
+}
+
+
+def render_hole(request, name, **options):
+    """Фрагмент для запроса или метка, если страница пойдёт в кэш."""
+    if getattr(request, '_page_cache', False):
+        encoded = base64.urlsafe_b64encode(json.dumps(options).encode())
+        return mark_safe(HOLE.format(name, encoded.decode()))
+    return mark_safe(HOLES[name](request, **options))
+
+
+def fill_holes(request, content):
+    def fill(match):
+        options = json.loads(base64.urlsafe_b64decode(match.group(2)))
+        return HOLES[match.group(1)](request, **options)
+    return HOLE_PATTERN.sub(fill, content)
+
+
+def page_feeds(author_id, *group_ids):
+    """Ленты страниц автора и групп поста, кроме общей ленты index.
+
+    Страница ищется в кэше по адресу, а в адресе имя автора и slug
+    группы, поэтому ленты страниц названы по ним, а не по id.
+    """
+    username = User.objects.filter(pk=author_id).values_list(
+        'username', flat=True).first()
+    feeds = [feed_key('page-author', username)]
+    feeds.extend(
+        feed_key('page-group', slug) for slug in Group.objects.filter(
+            pk__in=[pk for pk in group_ids if pk is not None]
+        ).values_list('slug', flat=True)
+    )
+    return feeds
+
+
+def _page_feeds(match):
+    """Ленты, от которых зависит страница, по разобранному адресу."""
+    name, kwargs = match.view_name, match.kwargs
+    if name == 'posts:index':
+        return (feed_key('index'),)
+    if name == 'posts:trending':
+        return (feed_key('trending'), feed_key('index'))
+    if name == 'posts:groups':
+        return (feed_key('groups'), feed_key('index'))
+    if name == 'posts:group':
+        return (feed_key('page-group', kwargs['slug']),)
+    if name in ('posts:profile', 'posts:post', 'posts:comments'):
+        return (feed_key('page-author', kwargs['username']),)
+    return ()
+
+
+def last_change(request):
+    """Когда последний раз менялись ленты, из которых собрана страница.
+
+    Читается ReplicaMiddleware (settings.REPLICA_LAST_CHANGE): пока
+    с изменения не прошло REPLICATION_LAG секунд, реплика может его ещё
+    не содержать, а отрисовка с неё попала бы во фрагменты и ETag
+    под уже сдвинутым поколением.
+    """
+    match = request.resolver_match
+    feeds = [CARDS, *_page_feeds(match)]
+    if match.view_name == 'posts:follow_index':
+        feeds += [feed_key('index'), feed_key('follow', request.user.id)]
+    return last_modified(*feeds)
+
+
+def _page_query(request):
+    """Параметры страницы для ключа или None, если кэш надо обойти."""
+    query = {}
+    for name, values in request.GET.lists():
+        valid = PAGE_QUERY.get(name)
+        if valid is None or len(values) != 1 or not valid(values[0]):
+            return None
+        query[name] = values[0]
+    return urlencode(sorted(query.items()))
+
+
+def _cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if _page_query(request) is None:
+        return None
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    if match.view_name not in settings.PAGE_CACHE_VIEWS:
+        return None
+    return match
+
+
+def _page_key(request, match):
+    versions, _ = feed_validators(*_page_feeds(match))
+    return PAGE_KEY.format(hashlib.md5(
+        f'{settings.RELEASE}|{versions}|{request.path}?{_page_query(request)}'
+        .encode()
+    ).hexdigest())
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт гостям целые страницы из кэша, не вызывая представлений."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        match = _cacheable(request)
+        if match is None:
+            return self.get_response(request)
+        key = _page_key(request, match)
+        entry = cache.get(key)
+        if entry is None:
+            request._page_cache = True
+            response = self.get_response(request)
+            request._page_cache = False
+            if response.streaming:
+                return response
+            content = response.content.decode(response.charset)
+            # Страницы, ставящие cookie, и ошибки в кэш не попадают.
+            if response.status_code == 200 and not response.cookies:
+                cache.set(key, (content, {
+                    header: response[header] for header in REPLAYED_HEADERS
+                    if response.has_header(header)
+                }), settings.PAGE_CACHE_TIMEOUT)
+        else:
+            content, headers = entry
+            response = HttpResponse()
+            for header, value in headers.items():
+                response[header] = value
+            not_modified = get_conditional_response(
+                request, etag=headers.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    headers.get('Last-Modified', '')),
+                response=response
+            )
+            if not_modified is not response:
+                return not_modified
+        response.content = fill_holes(request, content)
+        patch_vary_headers(response, ('Cookie',))
+        return response
@@ -0,0 +1,157 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+def encode_cursor(direction, value, pk):
+    """Упаковывает позицию (значение ключа, id) в непрозрачный токен."""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{direction}|{value}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, значение, id) или None для битого токена."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, value, pk = raw.decode().split('|')
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS):
+        return None
+    return direction, value, pk
+
+
+def _unnumbered():
+    return None
+
+
+def cursor_page(object_list, number, paginator, previous_cursor=None,
+                next_cursor=None):
+    """Page, соседи которой задаются курсорами.
+
+    Тип остаётся Page: его ждут шаблоны. У страницы по курсору нет номера
+    (number is None), поэтому has_next/has_previous отвечают по курсорам,
+    а методы, которые считают номера и позиции, возвращают None.
+    """
+    page = Page(object_list, number, paginator)
+    page.previous_cursor = previous_cursor
+    page.next_cursor = next_cursor
+    if number is None:
+        page.has_next = lambda: page.next_cursor is not None
+        page.has_previous = lambda: page.previous_cursor is not None
+        page.next_page_number = page.previous_page_number = _unnumbered
+        page.start_index = page.end_index = _unnumbered
+    return page
+
+
+class CursorPaginator:
+    """Keyset-пагинация ленты по паре (field, tiebreak).
+
+    Страница выбирается условием WHERE по позиции курсора, поэтому
+    не нужны ни COUNT(*), ни OFFSET: тысячная страница стоит столько же,
+    сколько первая. Наличие следующей страницы проверяется выборкой
+    одной лишней записи. transform превращает выбранные строки в объекты
+    страницы, например записи ленты подписок в посты.
+    """
+
+    def __init__(self, object_list, per_page, field='pub_date',
+                 tiebreak='id', transform=None):
+        self.field = field
+        self.tiebreak = tiebreak
+        self.per_page = per_page
+        self.transform = transform
+        self.object_list = object_list.order_by(f'-{field}', f'-{tiebreak}')
+        self.paginator = Paginator(self.object_list, per_page)
+
+    def _key(self, item):
+        if isinstance(item, dict):
+            return item[self.field], item[self.tiebreak]
+        return getattr(item, self.field), getattr(item, self.tiebreak)
+
+    def _make_page(self, items, number, has_previous, has_next):
+        objects = self.transform(items) if self.transform else items
+        page = cursor_page(objects, number, self.paginator)
+        if items and has_previous:
+            page.previous_cursor = encode_cursor(
+                PREVIOUS, *self._key(items[0]))
+        if items and has_next:
+            page.next_cursor = encode_cursor(NEXT, *self._key(items[-1]))
+        return page
+
+    def _position(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return None
+        direction, value, pk = position
+        field = self.object_list.model._meta.get_field(self.field)
+        try:
+            value = field.to_python(value)
+        except ValidationError:
+            return None
+        return direction, value, pk
+
+    def _after(self, value, pk):
+        return self.object_list.filter(
+            Q(**{f'{self.field}__lt': value})
+            | Q(**{self.field: value, f'{self.tiebreak}__lt': pk})
+        )
+
+    def next_cursor(self, items):
+        """Курсор за последней из items или None, если дальше записей нет.
+
+        Для первой страницы, которую шаблон перебирает как QuerySet:
+        проверка идёт по самим данным, а не по счётчику, и только если
+        страница заполнена.
+        """
+        items = list(items)
+        if len(items) < self.per_page:
+            return None
+        value, pk = self._key(items[-1])
+        if not self._after(value, pk).exists():
+            return None
+        return encode_cursor(NEXT, value, pk)
+
+    def get_page(self, cursor=None):
+        """Страница, следующая за курсором (или предшествующая ему)."""
+        position = self._position(cursor)
+        if position is None:
+            items = list(self.object_list[:self.per_page + 1])
+            return self._make_page(items[:self.per_page], None,
+                                   False, len(items) > self.per_page)
+        direction, value, pk = position
+        if direction == NEXT:
+            items = list(self._after(value, pk)[:self.per_page + 1])
+            return self._make_page(items[:self.per_page], None,
+                                   True, len(items) > self.per_page)
+        items = list(self.object_list.filter(
+            Q(**{f'{self.field}__gt': value})
+            | Q(**{self.field: value, f'{self.tiebreak}__gt': pk})
+        ).order_by(self.field, self.tiebreak)[:self.per_page + 1])
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        return self._make_page(items, None, has_previous, True)
+
+    def get_numbered_page(self, number):
+        """Страница по номеру (?page=N) для старых ссылок: COUNT + OFFSET."""
+        page = self.paginator.get_page(number)
+        return self._make_page(list(page.object_list), page.number,
+                               page.has_previous(), page.has_next())
+
+
+def paginate(request, object_list, **options):
+    """Страница ленты по ?cursor=, либо по устаревшему ?page=."""
+    paginator = CursorPaginator(object_list, settings.PAGE_SIZE, **options)
+    cursor = request.GET.get('cursor')
+    if cursor is None and request.GET.get('page'):
+        return paginator.get_numbered_page(request.GET['page'])
+    return paginator.get_page(cursor)
@@ -0,0 +1,292 @@
+"""Полнотекстовый поиск по постам, комментариям и названиям групп.
+
+Индекс пополняется сигналами при каждой правке. Если SQLite собран
+с FTS5, документы лежат в виртуальной таблице posts_search; иначе
+используется обычная таблица SearchPosting с вхождениями термов.
+В оба индекса пишутся основы слов после русского стеммера Портера,
+поэтому «котики» находят пост про «котика».
+
+Документ — текст поста вместе с названием его группы или один
+комментарий. Пост находится, если все слова запроса встретились
+в одном его документе; релевантность поста — сумма по таким документам.
+"""
+import math
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+from django.apps import apps as global_apps
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from .models import Post, SearchPosting
+
+FTS_TABLE = 'posts_search'
+BATCH_SIZE = 500
+# Вес документа-комментария относительно текста самого поста.
+COMMENT_WEIGHT = 0.5
+# Вес совпадения в названии группы относительно текста.
+GROUP_WEIGHT = 2.0
+MAX_TERMS = 8
+# Число постов нужно только для IDF, поэтому точность до минут не важна.
+DOCUMENTS_KEY = 'search:documents'
+DOCUMENTS_TIMEOUT = 60 * 10
+
+_fts_databases = {}
+
+WORD = re.compile(r'\w+')
+PERFECTIVE_GERUND = re.compile(
+    r'((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$')
+REFLEXIVE = re.compile(r'(с[яь])$')
+ADJECTIVE = re.compile(
+    r'(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|'
+    r'их|ых|ую|юю|ая|яя|ою|ею)$')
+PARTICIPLE = re.compile(r'((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$')
+VERB = re.compile(
+    r'((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|'
+    r'ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|йте|'
+    r'ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$')
+NOUN = re.compile(
+    r'(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|'
+    r'ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$')
+RV = re.compile(r'^(.*?[аеиоуыэюя])(.*)$')
+DERIVATIONAL = re.compile(r'.*[^аеиоуыэюя]+[аеиоуыэюя].*ость?$')
+DERIVATIONAL_SUFFIX = re.compile(r'ость?$')
+SUPERLATIVE = re.compile(r'(ейше|ейш)$')
+
+
+@lru_cache(maxsize=2 ** 16)
+def stem(word):
+    """Основа русского слова по алгоритму Портера (Snowball).
+
+    Слова без русских гласных, в том числе латиница и числа, только
+    приводятся к нижнему регистру.
+    """
+    word = word.lower().replace('ё', 'е')
+    match = RV.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    trimmed = PERFECTIVE_GERUND.sub('', rv, 1)
+    if trimmed == rv:
+        rv = REFLEXIVE.sub('', rv, 1)
+        trimmed = ADJECTIVE.sub('', rv, 1)
+        if trimmed != rv:
+            rv = PARTICIPLE.sub('', trimmed, 1)
+        else:
+            trimmed = VERB.sub('', rv, 1)
+            rv = NOUN.sub('', rv, 1) if trimmed == rv else trimmed
+    else:
+        rv = trimmed
+    rv = re.sub(r'и$', '', rv)
+    if DERIVATIONAL.match(rv):
+        rv = DERIVATIONAL_SUFFIX.sub('', rv, 1)
+    if rv.endswith('ь'):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE.sub('', rv, 1)
+        rv = re.sub(r'нн$', 'н', rv)
+    return start + rv
+
+
+def tokenize(text):
+    return [stem(word) for word in WORD.findall(text or '')]
+
+
+def use_fts():
+    """FTS5-таблица создаётся миграцией, только если SQLite её умеет."""
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_databases:
+        _fts_databases[name] = (
+            FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_databases[name]
+
+
+def _post_documents(posts):
+    for post_id, text, group_title in posts.values_list(
+            'id', 'text', 'group__title').iterator(chunk_size=BATCH_SIZE):
+        yield post_id * 2, post_id, tokenize(text), tokenize(group_title), 1.0
+
+
+def _comment_documents(comments):
+    for comment_id, post_id, text in comments.values_list(
+            'id', 'post_id', 'text').iterator(chunk_size=BATCH_SIZE):
+        yield comment_id * 2 + 1, post_id, tokenize(text), [], COMMENT_WEIGHT
+
+
+def _write(documents, posting_model=SearchPosting):
+    """Записывает документы (rowid, пост, термы текста и группы, вес)."""
+    documents = list(documents)
+    if not documents:
+        return
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {FTS_TABLE} '
+                f'(rowid, body, grp, post_id, weight) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                [(rowid, ' '.join(body), ' '.join(group), post_id, weight)
+                 for rowid, post_id, body, group, weight in documents])
+        return
+    post_ids, comment_ids, postings = [], [], []
+    for rowid, post_id, body, group, weight in documents:
+        comment_id = (rowid - 1) // 2 if rowid % 2 else None
+        if comment_id is None:
+            post_ids.append(post_id)
+        else:
+            comment_ids.append(comment_id)
+        counts = defaultdict(float)
+        for term in body:
+            counts[term[:64]] += weight
+        for term in group:
+            counts[term[:64]] += weight * GROUP_WEIGHT
+        postings.extend(
+            posting_model(term=term, post_id=post_id, comment_id=comment_id,
+                          weight=term_weight)
+            for term, term_weight in counts.items())
+    for batch in _batches(post_ids):
+        posting_model.objects.filter(post_id__in=batch,
+                                     comment__isnull=True).delete()
+    for batch in _batches(comment_ids):
+        posting_model.objects.filter(comment_id__in=batch).delete()
+    posting_model.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+
+def _batches(ids):
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _delete(rowids):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                               [(rowid,) for rowid in rowids])
+    # Вхождения SearchPosting удаляются каскадом вместе с постом.
+
+
+def index_posts(posts):
+    _write(_post_documents(posts))
+
+
+def index_comments(comments):
+    _write(_comment_documents(comments))
+
+
+def unindex_post(post_id):
+    _delete([post_id * 2])
+
+
+def unindex_comment(comment_id):
+    _delete([comment_id * 2 + 1])
+
+
+@transaction.atomic
+def rebuild(apps=global_apps):
+    """Полная перестройка индекса: после миграции или массовой загрузки.
+
+    Одна транзакция на всё: иначе SQLite коммитит каждую строку executemany.
+    Миграция передаёт apps со своими историческими моделями.
+    """
+    posting_model = apps.get_model('posts', 'SearchPosting')
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    else:
+        posting_model.objects.all().delete()
+    _write(_post_documents(
+        apps.get_model('posts', 'Post').objects.order_by('pk')),
+        posting_model)
+    _write(_comment_documents(
+        apps.get_model('posts', 'Comment').objects.order_by('pk')),
+        posting_model)
+
+
+def _fts_ranked(terms, after, limit):
+    query = ' '.join(f'"{term}"*' for term in terms)
+    sql = (
+        f'SELECT post_id, -SUM(score) AS score FROM ('
+        f'SELECT post_id, bm25({FTS_TABLE}, 1.0, {GROUP_WEIGHT}) * weight '
+        f'AS score FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT -1) '
+        f'GROUP BY post_id'
+    )
+    params = [query]
+    if after is not None:
+        sql = (f'SELECT * FROM ({sql}) WHERE score < %s '
+               f'OR (score = %s AND post_id < %s)')
+        params += [after[0], after[0], after[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' ORDER BY score DESC, post_id DESC LIMIT %s',
+                       params + [limit])
+        return cursor.fetchall()
+
+
+def _like(term):
+    escaped = (term.replace('\\', '\\\\').replace('%', '\\%')
+               .replace('_', '\\_'))
+    return escaped + '%'
+
+
+def _document_frequencies(terms, patterns):
+    """Для каждого терма — число постов, где он встречается."""
+    matches = ' OR '.join(["term LIKE %s ESCAPE '\\'"] * len(terms))
+    counts = ', '.join(
+        ["COUNT(DISTINCT CASE WHEN term LIKE %s ESCAPE '\\' "
+         "THEN post_id END)"] * len(terms))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT {counts} FROM {SearchPosting._meta.db_table} '
+            f'WHERE {matches}', patterns + patterns)
+        return cursor.fetchone()
+
+
+def _postings_ranked(terms, after, limit):
+    """Ранжирование по SearchPosting целиком в SQL.
+
+    Вхождения выбираются по индексу (term, post) для каждого префикса,
+    группируются по документам, у которых есть все термы, и суммируются
+    по постам. Базе достаются ORDER BY и LIMIT после курсора.
+    """
+    total = cache.get_or_set(DOCUMENTS_KEY, Post.objects.count,
+                             DOCUMENTS_TIMEOUT) or 1
+    patterns = [_like(term) for term in terms]
+    idfs = [math.log(1 + total / (frequency or 1)) for frequency
+            in _document_frequencies(terms, patterns)]
+    when = "CASE WHEN term LIKE %s ESCAPE '\\' THEN {} ELSE 0 END"
+    score = ' + '.join([when.format('%s')] * len(terms))
+    has_all = ' AND '.join([f'SUM({when.format(1)}) > 0'] * len(terms))
+    matches = ' OR '.join(["term LIKE %s ESCAPE '\\'"] * len(terms))
+    sql = (
+        f'SELECT post_id, SUM(score) AS score FROM ('
+        f'SELECT post_id, SUM(weight * ({score})) AS score '
+        f'FROM {SearchPosting._meta.db_table} WHERE {matches} '
+        f'GROUP BY post_id, comment_id HAVING {has_all}'
+        f') documents GROUP BY post_id'
+    )
+    params = [value for pair in zip(patterns, idfs) for value in pair]
+    params += patterns + patterns
+    if after is not None:
+        sql = (f'SELECT * FROM ({sql}) ranked WHERE score < %s '
+               f'OR (score = %s AND post_id < %s)')
+        params += [after[0], after[0], after[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' ORDER BY score DESC, post_id DESC LIMIT %s',
+                       params + [limit])
+        return cursor.fetchall()
+
+
+def ranked(query, after=None, limit=10):
+    """Пары (id поста, релевантность) по убыванию релевантности.
+
+    after — позиция (релевантность, id) последнего результата прошлой
+    страницы: поиск продолжается строго после неё.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_TERMS]
+    if not terms:
+        return []
+    if use_fts():
+        return _fts_ranked(terms, after, limit)
+    return _postings_ranked(terms, after, limit)
@@ -0,0 +1,213 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .caching import CARDS, bump_feed_versions, feed_key, post_feeds
+from .media import release, retain
+from .models import (Comment, Follow, Group, GroupStats, Post, User,
+                     UserStats)
+from .page_cache import page_feeds
+from .search import (index_comments, index_posts, unindex_comment,
+                     unindex_post)
+from .stats import bump, bump_comments, bump_group
+from .thumbnails import discard, schedule
+from .timeline import backfill_follow, fan_out, prune
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, post_count=1)
+        fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, post_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, comment_count=1)
+        bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, comment_count=-1)
+    bump_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, follower_count=1)
+        bump(instance.user_id, following_count=1)
+        backfill_follow(instance)
+        bump_feed_versions(feed_key('follow', instance.user_id),
+                           *page_feeds(instance.author_id),
+                           *page_feeds(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, follower_count=-1)
+    bump(instance.user_id, following_count=-1)
+    prune(instance.user_id, instance.author_id)
+    bump_feed_versions(feed_key('follow', instance.user_id),
+                       *page_feeds(instance.author_id),
+                       *page_feeds(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.get_or_create(group=instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def group_post_counted(sender, instance, created, **kwargs):
+    if created:
+        bump_group(instance.group_id, 1, activity=instance.pub_date)
+    elif instance.group_id != instance._loaded_group_id:
+        bump_group(instance._loaded_group_id, -1)
+        bump_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def group_post_uncounted(sender, instance, **kwargs):
+    bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, **kwargs):
+    group_ids = (instance.group_id, instance._loaded_group_id)
+    bump_feed_versions(*post_feeds(instance.author_id, *group_ids),
+                       *page_feeds(instance.author_id, *group_ids))
+    instance._loaded_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id').first()
+    if post is not None:
+        bump_feed_versions(*post_feeds(post['author_id'], post['group_id']),
+                           *page_feeds(post['author_id'], post['group_id']))
+        if kwargs.get('created'):
+            bump_group(post['group_id'], activity=instance.created)
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._loaded_username = instance.username
+
+
+@receiver(post_save, sender=User)
+def username_changed(sender, instance, created, **kwargs):
+    if not created and instance.username != instance._loaded_username:
+        bump_feed_versions(CARDS)
+    instance._loaded_username = instance.username
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # Сдвиг groups сбрасывает и кэш сообществ по slug (posts/groups.py).
+    bump_feed_versions(CARDS, feed_key('groups'))
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, **kwargs):
+    index_posts(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_indexed(sender, instance, **kwargs):
+    index_comments(Comment.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_unindexed(sender, instance, **kwargs):
+    unindex_comment(instance.pk)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_title(sender, instance, **kwargs):
+    instance._loaded_title = instance.title
+
+
+@receiver(post_save, sender=Group)
+def group_reindexed(sender, instance, created, **kwargs):
+    # В индексе у постов только название группы. Переиндексация всех
+    # постов группы идёт после коммита, а не внутри сохраняющего запроса.
+    if not created and instance.title != instance._loaded_title:
+        posts = instance.posts.all()
+        transaction.on_commit(lambda: index_posts(posts))
+    instance._loaded_title = instance.title
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления у постов уже group=NULL, и связь с ними потеряна.
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def group_unindexed(sender, instance, **kwargs):
+    posts = Post.objects.filter(pk__in=instance._post_ids)
+    transaction.on_commit(lambda: index_posts(posts))
+
+
+@receiver(post_init, sender=Post)
+def remember_image(sender, instance, **kwargs):
+    instance._loaded_image = instance.image.name
+
+
+@receiver(pre_save, sender=Post)
+def reset_thumbnail(sender, instance, **kwargs):
+    loaded = instance._loaded_image
+    instance._image_changed = (instance._state.adding
+                               or instance.image.name != loaded)
+    if instance._image_changed:
+        instance.thumbnail = ''
+
+
+@receiver(post_save, sender=Post)
+def image_changed(sender, instance, created, **kwargs):
+    if instance._image_changed:
+        if not created:
+            # Обычное сохранение thumbnail не пишет (MAINTAINED_FIELDS).
+            Post.objects.filter(pk=instance.pk).update(thumbnail='')
+        retain(instance.image.name)
+        release(instance._loaded_image)
+        if instance.image:
+            schedule(instance)
+        else:
+            discard(instance)
+    instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def image_released(sender, instance, **kwargs):
+    release(instance.image.name)
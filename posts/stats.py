@@ -0,0 +1,150 @@
+from django.db import transaction
+from django.db.models import (Count, DateTimeField, F, IntegerField, Max,
+                              OuterRef, Subquery, Value)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import (Comment, Follow, Group, GroupStats, Post, User,
+                     UserStats)
+
+BATCH_SIZE = 1000
+
+USER_COUNTERS = {
+    'post_count': (Post, 'author'),
+    'comment_count': (Comment, 'author'),
+    'follower_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def count_subquery(model, field):
+    """Число строк model, у которых field указывает на внешний объект."""
+    rows = model.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def shifted(name, delta):
+    """F(name) + delta, но не меньше нуля.
+
+    Счётчики — PositiveIntegerField: если они разошлись с данными,
+    уменьшение ниже нуля нарушило бы CHECK и сорвало удаление.
+    """
+    if delta >= 0:
+        return F(name) + delta
+    return Greatest(F(name) + delta, 0)
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя на заданные величины.
+
+    Если строки статистики ещё нет (пользователь загружен в обход
+    сигналов), при увеличении она пересчитывается целиком.
+    """
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{name: shifted(name, delta) for name, delta in deltas.items()}
+    )
+    if not updated and all(delta > 0 for delta in deltas.values()):
+        rebuild_user_stats(User.objects.filter(pk=user_id))
+
+
+def user_stats(user):
+    """Счётчики пользователя для страниц профиля и поста.
+
+    Строки может не быть, если пользователь загружен в обход сигналов
+    (import_yatube --skip-finalize): тогда она пересчитывается.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_user_stats(User.objects.filter(pk=user.pk))
+        user.stats = UserStats.objects.get(user=user)
+        return user.stats
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=shifted('comment_count', delta)
+    )
+
+
+def _replace(batch):
+    UserStats.objects.filter(
+        user_id__in=[stats.user_id for stats in batch]
+    ).delete()
+    UserStats.objects.bulk_create(batch)
+
+
+def rebuild_user_stats(users=None):
+    """Пересчитывает счётчики пользователей пакетами по BATCH_SIZE."""
+    if users is None:
+        users = User.objects.all()
+    rows = users.order_by('pk').annotate(**{
+        name: count_subquery(model, field)
+        for name, (model, field) in USER_COUNTERS.items()
+    }).values_list('pk', *USER_COUNTERS)
+    with transaction.atomic():
+        batch = []
+        for pk, *counts in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(UserStats(user_id=pk,
+                                   **dict(zip(USER_COUNTERS, counts))))
+            if len(batch) >= BATCH_SIZE:
+                _replace(batch)
+                batch = []
+        if batch:
+            _replace(batch)
+
+
+def rebuild_post_counts():
+    """Пересчитывает Post.comment_count одним UPDATE."""
+    Post.objects.update(comment_count=count_subquery(Comment, 'post'))
+
+
+def bump_group(group_id, post_count=0, activity=None):
+    """Сдвигает счётчик постов сообщества и время его активности."""
+    if group_id is None:
+        return
+    stats = GroupStats.objects.filter(group_id=group_id)
+    if post_count:
+        updated = stats.update(
+            post_count=shifted('post_count', post_count))
+        if not updated:
+            # Строки нет — пересчёт сообщества после коммита, вне запроса.
+            groups = Group.objects.filter(pk=group_id)
+            transaction.on_commit(lambda: rebuild_group_stats(groups))
+            return
+    if activity is not None:
+        stats.filter(last_activity__lt=activity).update(
+            last_activity=activity)
+
+
+def rebuild_group_stats(groups=None):
+    """Пересчитывает счётчики сообществ, например после загрузки."""
+    if groups is None:
+        groups = Group.objects.all()
+    last_post = Post.objects.filter(group=OuterRef('pk')).order_by().values(
+        'group').annotate(last=Max('pub_date')).values('last')
+    last_comment = Comment.objects.filter(
+        post__group=OuterRef('pk')
+    ).order_by().values('post__group').annotate(
+        last=Max('created')).values('last')
+    field = DateTimeField()
+    last_post = Subquery(last_post, output_field=field)
+    last_comment = Subquery(last_comment, output_field=field)
+    # GREATEST в SQLite даёт NULL, если NULL хоть один аргумент.
+    rows = groups.order_by('pk').annotate(
+        post_count=count_subquery(Post, 'group'),
+        last_activity=Coalesce(
+            Greatest(last_post, last_comment, output_field=field),
+            last_post, last_comment, Value(timezone.now(), output_field=field),
+            output_field=field
+        )
+    ).values_list('pk', 'post_count', 'last_activity')
+    with transaction.atomic():
+        GroupStats.objects.filter(group__in=groups).delete()
+        GroupStats.objects.bulk_create(
+            (GroupStats(group_id=pk, post_count=count, last_activity=last)
+             for pk, count, last in rows.iterator(chunk_size=BATCH_SIZE)),
+            batch_size=BATCH_SIZE
+        )
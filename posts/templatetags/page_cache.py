@@ -0,0 +1,11 @@
+from django import template
+
+from posts.page_cache import render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **options):
+    """Часть страницы, своя у каждого посетителя: не кэшируется с ней."""
+    return render_hole(context['request'], name, **options)
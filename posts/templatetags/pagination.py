@@ -0,0 +1,21 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def cursor_url(context, cursor=None):
+    """Текущий адрес с другим курсором; остальные параметры остаются.
+
+    Без курсора — адрес первой страницы. Устаревший ?page= сбрасывается:
+    иначе он перебил бы курсор.
+    """
+    request = context['request']
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    query.pop('page', None)
+    if cursor:
+        query['cursor'] = cursor
+    if not query:
+        return request.path
+    return f'{request.path}?{query.urlencode()}'
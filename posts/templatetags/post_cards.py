@@ -0,0 +1,54 @@
+import hashlib
+
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TIMEOUT = 60 * 60 * 24
+
+
+def card_key(post, user):
+    """Ключ карточки: id поста и отпечаток всего, что в ней выводится.
+
+    Правка поста, смена имени автора, переименование группы или новый
+    комментарий меняют отпечаток, и старая карточка просто перестаёт
+    читаться.
+    """
+    group = post.group
+    dependencies = (
+        post.text, post.image.name or '', post.thumbnail,
+        post.pub_date.isoformat(), post.comment_count, post.author.username,
+        group and (group.id, group.slug, group.title),
+        post.author_id == getattr(user, 'id', None),
+    )
+    digest = hashlib.md5(repr(dependencies).encode()).hexdigest()
+    return f'post_card:{post.id}:{digest}'
+
+
+def render_cards(posts, user):
+    posts = list(posts)
+    keys = [card_key(post, user) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                'post_item.html', {'post': post, 'user': user}
+            )
+    if missing:
+        cache.set_many(missing, CARD_TIMEOUT)
+    return [(post, mark_safe(cards[key])) for post, key in zip(posts, keys)]
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Пары (пост, html карточки) для страницы одним cache.get_many."""
+    return render_cards(posts, context.get('user'))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    return render_cards([post], context.get('user'))[0][1]
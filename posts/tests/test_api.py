@@ -0,0 +1,107 @@
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class YatubeApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.reader = User.objects.create_user(username='ApiReader')
+        cls.group = Group.objects.create(title='API', slug='api-group',
+                                         description='JSON')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {number}',
+                                group=cls.group if number % 2 else None)
+            for number in range(15)
+        ]
+        cls.post = cls.posts[-1]
+        for number in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def get_json(self, client, name, kwargs=None, **params):
+        response = client.get(reverse(f'posts:{name}', kwargs=kwargs),
+                              params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_feeds_follow_cursors_without_repeats(self):
+        """Курсоры API проходят каждую ленту целиком без повторов"""
+        feeds = (
+            (self.guest_client, 'api_index', None, self.posts),
+            (self.guest_client, 'api_group', {'slug': 'api-group'},
+             self.posts[1::2]),
+            (self.guest_client, 'api_profile', {'username': 'ApiAuthor'},
+             self.posts),
+            (self.reader_client, 'api_follow', None, self.posts),
+        )
+        for client, name, kwargs, posts in feeds:
+            with self.subTest(feed=name):
+                seen, cursor = [], ''
+                while cursor is not None:
+                    response, data = self.get_json(
+                        client, name, kwargs, cursor=cursor, limit=4)
+                    self.assertEqual(response.status_code, 200)
+                    seen.extend(item['id'] for item in data['results'])
+                    cursor = data['next_cursor']
+                self.assertEqual(seen, [post.id for post in posts[::-1]])
+
+    def test_fields_selection(self):
+        """?fields= оставляет в ответе только перечисленные поля"""
+        _, data = self.get_json(self.guest_client, 'api_index',
+                                fields='text,author')
+        self.assertEqual(data['results'][0],
+                         {'text': 'Пост 14', 'author': 'ApiAuthor'})
+        _, data = self.get_json(self.guest_client, 'api_post',
+                                {'post_id': self.post.id})
+        self.assertEqual(data['group'], None)
+        self.assertEqual(data['comment_count'], 3)
+        self.assertEqual(data['image'], None)
+        response, data = self.get_json(self.guest_client, 'api_index',
+                                       fields='text,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_feed_page_costs_one_query(self):
+        """Страница ленты API — один запрос без COUNT и без моделей"""
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('posts:api_index'))
+
+    def test_comments_and_errors(self):
+        """Комментарии пагинируются курсором, ошибки отдаются JSON-ом"""
+        _, data = self.get_json(self.guest_client, 'api_comments',
+                                {'post_id': self.post.id}, limit=2)
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['Комментарий 2', 'Комментарий 1'])
+        _, data = self.get_json(self.guest_client, 'api_comments',
+                                {'post_id': self.post.id},
+                                cursor=data['next_cursor'])
+        self.assertEqual(data['results'][0]['author'], 'ApiReader')
+        self.assertIsNone(data['next_cursor'])
+        response, _ = self.get_json(self.guest_client, 'api_profile',
+                                    {'username': 'nobody'})
+        self.assertEqual(response.status_code, 404)
+        response, _ = self.get_json(self.guest_client, 'api_follow')
+        self.assertEqual(response.status_code, 403)
+        response = self.guest_client.post(reverse('posts:api_index'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_unchanged_feed_answers_304(self):
+        """Лента API поддерживает условные GET, как HTML-лента"""
+        url = reverse('posts:api_index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -2,7 +2,7 @@ from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
-from posts.models import Post, User
+from posts.models import Comment, Group, Post, User
 
 
 class YatubeCacheTests(TestCase):
@@ -10,18 +10,61 @@ class YatubeCacheTests(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='BaretskiyStas')
+        cls.group = Group.objects.create(
+            title='Кэш', slug='cache', description='Кэшируем'
+        )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
 
     def test_cache(self):
-        response_0 = self.authorized_client.get(reverse('posts:index'))
+        """Фрагмент главной переиспользуется, пока лента не изменилась"""
         post = Post.objects.create(author=self.user, text='text123')
+        response_0 = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.filter(id=post.id).update(text='changed in bulk')
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.filter(id=post.id).delete()
-        response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_1.content, response_2.content)
+        self.assertEqual(response_0.content, response_1.content)
         cache.clear()
-        response_3 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_0.content, response_3.content)
+        response_2 = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response_2, 'changed in bulk')
+
+    def test_new_and_deleted_posts_invalidate_feeds(self):
+        """Создание и удаление поста сразу видны на главной и в группе"""
+        urls = (reverse('posts:index'),
+                reverse('posts:group', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile',
+                        kwargs={'username': self.user.username}))
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.create(author=self.user, text='text123',
+                                   group=self.group)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.authorized_client.get(url),
+                                    'text123')
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.authorized_client.get(url),
+                                       'text123')
+
+    def test_comment_invalidates_feed(self):
+        """Новый комментарий обновляет счётчик в кэшированной ленте"""
+        post = Post.objects.create(author=self.user, text='text123')
+        self.authorized_client.get(reverse('posts:index'))
+        Comment.objects.create(post=post, author=self.user, text='Ком')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_pages_are_cached_separately(self):
+        """Разные страницы ленты не делят один фрагмент"""
+        for number in range(11):
+            Post.objects.create(author=self.user, text=f'Пост номер {number}')
+        first = self.authorized_client.get(reverse('posts:index'))
+        cursor = first.context.get('page').next_cursor
+        second = self.authorized_client.get(
+            reverse('posts:index') + f'?cursor={cursor}')
+        self.assertContains(second, 'Пост номер 0')
+        self.assertNotContains(second, 'Пост номер 10')
@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from yatube import cache as sqlite_cache
+from yatube.cache import SQLiteCache
+
+
+class YatubeSQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = f'{self.directory}/cache.sqlite3'
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются"""
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'value': [1, 2]})
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_incr_and_expiry(self):
+        """add не перезаписывает, incr атомарен, просроченное не читается"""
+        self.assertTrue(self.cache.add('counter', 1))
+        self.assertFalse(self.cache.add('counter', 5))
+        self.assertEqual(self.cache.incr('counter'), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        self.cache.set('short', 'value', timeout=1)
+        with mock.patch('time.time', return_value=time.time() + 5):
+            self.assertIsNone(self.cache.get('short'))
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому соединению сразу"""
+        other = self.make_cache()
+        self.cache.set('shared', 'value')
+        self.assertEqual(other.get('shared'), 'value')
+        other.delete('shared')
+        self.assertIsNone(self.cache.get('shared'))
+
+    def test_lru_eviction_by_entries_and_size(self):
+        """При переполнении вытесняются давно не читанные записи"""
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=0,
+                                MAX_SIZE=10 ** 9)
+        with mock.patch.object(sqlite_cache, 'CULL_EVERY', 1):
+            for number in range(10):
+                cache.set(f'key{number}', number)
+            with mock.patch('time.time', return_value=time.time() + 10):
+                cache.get('key0')
+                cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        cache = self.make_cache(MAX_SIZE=2000)
+        with mock.patch.object(sqlite_cache, 'CULL_EVERY', 1):
+            for number in range(10):
+                cache.set(f'big{number}', 'x' * 500)
+        total = cache._db.execute('SELECT SUM(size) FROM cache').fetchone()
+        self.assertLessEqual(total[0], 2000)
+        self.assertIsNotNone(cache.get('big9'))
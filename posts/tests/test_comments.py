@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+
+@override_settings(COMMENTS_PAGE_SIZE=5)
+class YatubeCommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Viral')
+        cls.readers = [User.objects.create_user(username=f'Reader{number}')
+                       for number in range(12)]
+        cls.post = Post.objects.create(author=cls.author, text='Горячий пост')
+        for number, reader in enumerate(cls.readers):
+            Comment.objects.create(post=cls.post, author=reader,
+                                   text=f'Комментарий {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.kwargs = {'username': 'Viral', 'post_id': self.post.id}
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_post_page_shows_first_comments_with_more_link(self):
+        """На странице поста первые комментарии и ссылка на остальные"""
+        response = self.client.get(reverse('posts:post', kwargs=self.kwargs))
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         [f'Комментарий {number}'
+                          for number in range(11, 6, -1)])
+        self.assertContains(response, 'data-comments-more')
+        self.assertContains(
+            response, reverse('posts:comments', kwargs=self.kwargs))
+
+    def test_more_link_does_not_trust_comment_counter(self):
+        """Ссылка на остальные комментарии не зависит от comment_count"""
+        more = reverse('posts:comments', kwargs=self.kwargs) + '?cursor='
+        Post.objects.filter(pk=self.post.pk).update(comment_count=1)
+        response = self.client.get(reverse('posts:post', kwargs=self.kwargs))
+        self.assertContains(response, more)
+        Comment.objects.filter(post=self.post).exclude(
+            pk__in=[comment.pk for comment
+                    in response.context['comments']]).delete()
+        Post.objects.filter(pk=self.post.pk).update(comment_count=99)
+        cache.clear()
+        response = self.client.get(reverse('posts:post', kwargs=self.kwargs))
+        self.assertNotContains(response, more)
+
+    def test_fragments_walk_the_whole_thread(self):
+        """Фрагменты по курсору выдают все комментарии без повторов"""
+        url = reverse('posts:comments', kwargs=self.kwargs)
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {'cursor': cursor} if cursor
+                                       else {})
+            self.assertNotContains(response, '<html')
+            seen.extend(comment.text
+                        for comment in response.context['comments'])
+            cursor = response.context['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f'Комментарий {number}'
+                                for number in range(11, -1, -1)])
+
+    def test_query_count_does_not_depend_on_comment_count(self):
+        """Число запросов страницы поста не растёт с числом комментариев"""
+        url = reverse('posts:post', kwargs=self.kwargs)
+        before = self.count_queries(url)
+        for reader in self.readers:
+            Comment.objects.create(post=self.post, author=reader,
+                                   text='Ещё один')
+        self.assertEqual(self.count_queries(url), before)
+        fragment = reverse('posts:comments', kwargs=self.kwargs)
+        self.assertLessEqual(self.count_queries(fragment), before)
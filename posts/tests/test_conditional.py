@@ -0,0 +1,103 @@
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class YatubeConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Etag')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Условные', slug='cond',
+                                         description='304')
+        cls.post = Post.objects.create(author=cls.author, text='Пост',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': 'cond'}),
+            reverse('posts:profile', kwargs={'username': 'Etag'}),
+            reverse('posts:post', kwargs={'username': 'Etag',
+                                          'post_id': self.post.id}),
+        )
+
+    def revalidate(self, client, url, **headers):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag, **headers)
+
+    def test_unchanged_pages_answer_304_without_queries(self):
+        """Повторный запрос неизменной ленты получает 304 без выборок"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(self.guest_client, url)
+                self.assertEqual(response.status_code, 304)
+        etag = self.guest_client.get(self.urls[0])['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.urls[0],
+                                             HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Новый комментарий, правка и подписка меняют ETag"""
+        etags = {url: self.reader_client.get(url)['ETag']
+                 for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Ком')
+        for url in (self.urls[0], self.urls[3]):
+            with self.subTest(url=url):
+                response = self.reader_client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+        etag = self.reader_client.get(self.urls[2])['ETag']
+        self.reader_client.get(reverse('posts:profile_follow',
+                                       kwargs={'username': 'Etag'}))
+        response = self.reader_client.get(self.urls[2],
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        follow_url = reverse('posts:follow_index')
+        response = self.revalidate(self.reader_client, follow_url)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_user(self):
+        """Чужой ETag не даёт 304: разметка у пользователей разная"""
+        etag = self.guest_client.get(self.urls[3])['ETag']
+        response = self.reader_client.get(self.urls[3],
+                                          HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+
+    def test_if_modified_since_for_guests(self):
+        """Аноним получает Last-Modified и 304 до правки поста"""
+        response = self.guest_client.get(self.urls[1])
+        modified = response['Last-Modified']
+        response = self.guest_client.get(self.urls[1],
+                                         HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        with mock.patch('posts.caching.time.time',
+                        return_value=time.time() + 10):
+            self.post.text = 'Правка'
+            self.post.save()
+        response = self.guest_client.get(self.urls[1],
+                                         HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_pages_are_404(self):
+        """Валидаторы не скрывают 404"""
+        for url in (reverse('posts:group', kwargs={'slug': 'nope'}),
+                    reverse('posts:profile', kwargs={'username': 'nope'}),
+                    reverse('posts:post', kwargs={'username': 'Etag',
+                                                  'post_id': 999})):
+            with self.subTest(url=url):
+                self.assertEqual(self.guest_client.get(url).status_code, 404)
@@ -0,0 +1,119 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserStats
+from posts.stats import bump
+
+
+class YatubeCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Counter')
+        cls.author = User.objects.create_user(username='Counted')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_new_post_and_delete_update_post_count(self):
+        """Создание и удаление поста меняют счётчик записей"""
+        self.authorized_client.post(reverse('posts:new_post'),
+                                    data={'text': 'Посчитай меня'})
+        self.assertEqual(self.stats(self.user).post_count, 1)
+        Post.objects.filter(author=self.user).delete()
+        self.assertEqual(self.stats(self.user).post_count, 0)
+
+    def test_comment_updates_counters(self):
+        """Комментарий меняет счётчики автора и поста"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.authorized_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'username': self.author.username,
+                            'post_id': post.id}),
+            data={'text': 'Комментарий'}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.user).comment_count, 1)
+        Comment.objects.filter(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.stats(self.user).comment_count, 0)
+
+    def test_saving_stale_post_keeps_comment_count(self):
+        """Сохранение поста, загруженного до комментария, не теряет счётчик"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text='Новый')
+        stale.text = 'Правка'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual((post.text, post.comment_count), ('Правка', 1))
+
+    def test_follow_and_unfollow_update_counters(self):
+        """Подписка и отписка меняют счётчики подписчиков и подписок"""
+        self.authorized_client.get(
+            reverse('posts:profile_follow',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_profile_runs_no_aggregate_queries(self):
+        """Страница профиля не выполняет COUNT-запросов"""
+        Post.objects.create(author=self.author, text='Пост')
+        Follow.objects.create(user=self.user, author=self.author)
+        url = reverse('posts:profile',
+                      kwargs={'username': self.author.username})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertContains(response, 'Подписчиков: 1')
+        self.assertContains(response, 'Записей: 1')
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+
+    def test_reconcile_counters_rebuilds_stats(self):
+        """Команда reconcile_counters восстанавливает счётчики"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.user, text='Ком')
+        UserStats.objects.all().delete()
+        Post.objects.update(comment_count=42)
+        call_command('reconcile_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.user).comment_count, 1)
+
+    def test_profile_of_user_without_stats_row(self):
+        """Профиль пользователя без строки статистики открывается"""
+        User.objects.bulk_create([User(username='Imported')])
+        imported = User.objects.get(username='Imported')
+        Post.objects.bulk_create([Post(author=imported, text='Загружен')])
+        self.assertFalse(UserStats.objects.filter(user=imported).exists())
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'Imported'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['post_count'], 1)
+        self.assertEqual(self.stats(imported).post_count, 1)
+
+    def test_counters_do_not_go_below_zero(self):
+        """Разошедшийся счётчик при уменьшении остаётся нулём"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(post_count=0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+        bump(self.author.id, follower_count=-3)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
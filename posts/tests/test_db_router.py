@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.db import connection, connections, router
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import resolve, reverse
+
+from posts.caching import MODIFIED_KEY, bump_feed_versions, feed_key
+from posts.models import Post, User
+from yatube import db_router
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class YatubeReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Routed')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.session = self.client.session
+
+    def route(self, path, method='get', view=None):
+        """Базы, куда уходят чтения Post и Session при обработке запроса."""
+        request = getattr(self.factory, method)(path)
+        request.user = self.user
+        request.session = self.session
+        request.resolver_match = resolve(path)
+        routed = []
+
+        def get_response(request):
+            middleware.process_view(request, None, (), {})
+            routed.append(router.db_for_read(Post))
+            routed.append(router.db_for_read(Session))
+            if view is not None:
+                view()
+                routed.append(router.db_for_read(Post))
+            return mock.Mock()
+
+        middleware = db_router.ReplicaMiddleware(get_response)
+        middleware(request)
+        return routed
+
+    def test_feed_reads_go_to_replica(self):
+        """Ленты читают посты с реплики, сессии — с основной базы"""
+        self.assertEqual(self.route(reverse('posts:index')),
+                         ['replica', 'default'])
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_other_views_and_methods_use_primary(self):
+        """Запись, поиск и POST обслуживает основная база"""
+        self.assertEqual(self.route(reverse('posts:search')),
+                         ['default', 'default'])
+        self.assertEqual(
+            self.route(reverse('posts:index'), method='post'),
+            ['default', 'default'])
+
+    def test_reads_after_write_are_sticky(self):
+        """После записи чтения идут в основную базу REPLICATION_LAG секунд"""
+        def write():
+            self.assertEqual(router.db_for_write(Post), 'default')
+
+        self.assertEqual(self.route(reverse('posts:index'), view=write),
+                         ['replica', 'default', 'default'])
+        self.assertEqual(self.route(reverse('posts:index')),
+                         ['default', 'default'])
+        self.session[db_router.STICKY_KEY] -= settings.REPLICATION_LAG + 1
+        self.assertEqual(self.route(reverse('posts:index')),
+                         ['replica', 'default'])
+
+    def test_freshly_changed_feeds_are_read_from_primary(self):
+        """Пока лента менялась недавно, её не читают с реплики и чужие"""
+        bump_feed_versions(feed_key('index'))
+        self.assertEqual(self.route(reverse('posts:index')),
+                         ['default', 'default'])
+        cache.set(MODIFIED_KEY.format(feed_key('index')),
+                  time.time() - settings.REPLICATION_LAG - 1)
+        self.assertEqual(self.route(reverse('posts:index')),
+                         ['replica', 'default'])
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'Реплики-файлы копируются только из SQLite')
+@override_settings(DATABASE_REPLICAS=['replica'])
+class YatubeReplicaFilesTest(TransactionTestCase):
+    """Основная база и реплика — разные базы SQLite."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='Writer')
+        self.reader = User.objects.create_user(username='Reader')
+        db_router.replicate()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def html(self, client):
+        return client.get(reverse('posts:index')).content.decode()
+
+    def test_new_post_reaches_every_reader(self):
+        """Свежий пост видят и автор, и другие читатели, и после репликации
+
+        Отрисовка с отставшей реплики не должна попасть во фрагменты
+        и ETag нового поколения ленты.
+        """
+        self.author_client.post(reverse('posts:new_post'),
+                                {'text': 'Только что'})
+        self.assertIn('Только что', self.html(self.author_client))
+        self.assertIn('Только что', self.html(self.reader_client))
+        db_router.replicate()
+        self.assertIn('Только что', self.html(self.reader_client))
+        self.assertIn('Только что', self.html(Client()))
+
+    def test_replica_serves_feeds_after_lag(self):
+        """Когда лента давно не менялась, читатель читает реплику"""
+        Post.objects.create(author=self.author, text='Старый пост')
+        db_router.replicate()
+        cache.clear()
+        Post.objects.filter(text='Старый пост').update(text='Без сигнала')
+        self.assertIn('Старый пост', self.html(self.reader_client))
@@ -0,0 +1,147 @@
+import json
+import shutil
+import tempfile
+import tracemalloc
+import zipfile
+from io import BytesIO, StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import exporting
+from posts.models import Comment, Follow, Post, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file():
+    buffer = BytesIO()
+    Image.new('RGB', (30, 20), (10, 20, 200)).save(buffer, 'png')
+    return SimpleUploadedFile('photo.png', buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class YatubeExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Exporter',
+                                            email='me@example.com')
+        cls.other = User.objects.create_user(username='Neighbour')
+        cls.post = Post.objects.create(author=cls.user, text='Мой пост',
+                                       image=image_file())
+        Post.objects.create(author=cls.user, text='С той же картинкой',
+                            image=cls.post.image.name)
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.other,
+                               text='Чужой комментарий')
+        Comment.objects.create(post=cls.post, author=cls.user,
+                               text='Мой комментарий')
+        Follow.objects.create(user=cls.other, author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_zip_contains_only_own_data_and_images(self):
+        """Архив содержит разделы пользователя и его изображения"""
+        response = self.client.get(reverse('posts:export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('attachment', response['Content-Disposition'])
+        archive = zipfile.ZipFile(BytesIO(b''.join(response)))
+        self.assertEqual(archive.namelist(), [
+            'profile.ndjson', 'posts.ndjson', 'comments.ndjson',
+            'followers.ndjson', 'following.ndjson',
+            f'images/{self.post.image.name}',
+        ])
+        posts = [json.loads(line) for line
+                 in archive.read('posts.ndjson').splitlines()]
+        self.assertEqual([post['text'] for post in posts],
+                         ['Мой пост', 'С той же картинкой'])
+        comments = archive.read('comments.ndjson').decode()
+        self.assertIn('Мой комментарий', comments)
+        self.assertNotIn('Чужой', comments)
+        profile = json.loads(archive.read('profile.ndjson'))
+        self.assertEqual(profile['email'], 'me@example.com')
+        self.assertNotIn('password', profile)
+        with self.post.image.open() as image:
+            self.assertEqual(
+                archive.read(f'images/{self.post.image.name}'),
+                image.read())
+
+    def test_ndjson_records_reference_others_by_id(self):
+        """Чужие строки в NDJSON-выгрузке представлены только id"""
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'ndjson'})
+        records = [json.loads(line)
+                   for line in b''.join(response).splitlines()]
+        self.assertEqual([record['type'] for record in records],
+                         ['user', 'post', 'post', 'comment', 'follow'])
+        self.assertEqual(records[-1], {'type': 'follow',
+                                       'user': self.other.id,
+                                       'author': self.user.id})
+
+    def test_ndjson_restores_deleted_posts_on_same_site(self):
+        """Выгрузка возвращает удалённые посты в базу, где есть ссылки"""
+        response = self.client.get(reverse('posts:export'),
+                                   {'format': 'ndjson'})
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = f'{directory}/export.jsonl'
+        with open(path, 'wb') as output:
+            output.write(b''.join(response))
+        expected = set(Post.objects.filter(author=self.user).values_list(
+            'id', 'text', 'pub_date'))
+        Post.objects.filter(author=self.user).delete()
+        call_command('import_yatube', path, stdout=StringIO(),
+                     stderr=StringIO())
+        self.assertEqual(
+            set(Post.objects.filter(author=self.user).values_list(
+                'id', 'text', 'pub_date')), expected)
+        self.assertTrue(Comment.objects.filter(
+            author=self.user, text='Мой комментарий').exists())
+
+    def test_export_needs_login(self):
+        """Аноним отправляется на страницу входа"""
+        response = Client().get(reverse('posts:export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_memory_does_not_grow_with_post_count(self):
+        """Пик памяти выгрузки не растёт вместе с числом постов"""
+        def peak(user):
+            tracemalloc.start()
+            for _ in exporting.archive(user):
+                pass
+            result = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return result
+
+        small = User.objects.create_user(username='Small')
+        large = User.objects.create_user(username='Large')
+        for author, count in ((small, 1000), (large, 4000)):
+            Post.objects.bulk_create(
+                Post(author=author, text='Текст ' * 50)
+                for _ in range(count))
+        # Первый проход платит за разовые импорты и кэши компилятора SQL.
+        peak(small)
+        self.assertLess(peak(large), peak(small) * 1.5)
+
+    def test_command_writes_archive(self):
+        """Команда export_user пишет тот же архив в файл"""
+        output = tempfile.NamedTemporaryFile(suffix='.zip')
+        with output:
+            call_command('export_user', 'Exporter', output=output.name,
+                         stdout=StringIO())
+            with zipfile.ZipFile(output.name) as archive:
+                self.assertIn('posts.ndjson', archive.namelist())
+                self.assertIsNone(archive.testzip())
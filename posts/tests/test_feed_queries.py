@@ -0,0 +1,76 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from yatube import settings
+
+
+class YatubeFeedQueriesTest(TestCase):
+    """Число SQL-запросов лент: страница по курсору без COUNT и OFFSET."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='QueryCounter')
+        cls.author = User.objects.create_user(username='QueryAuthor')
+        cls.group = Group.objects.create(
+            title='Запросы', slug='queries', description='Считаем запросы'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=self.author, group=self.group
+            )
+            Comment.objects.create(post=post, author=self.user,
+                                   text='Комментарий')
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт с числом постов на странице"""
+        urls = {
+            reverse('posts:index'): self.guest_client,
+            reverse('posts:group', kwargs={'slug': self.group.slug}):
+                self.guest_client,
+            reverse('posts:follow_index'): self.authorized_client,
+        }
+        self.create_posts(1)
+        single = {url: self.count_queries(client, url)
+                  for url, client in urls.items()}
+        self.create_posts(settings.PAGE_SIZE)
+        for url, client in urls.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(client, url), single[url])
+
+    def test_index_page_query_count(self):
+        """Главная страница гостя — один запрос окна постов без COUNT"""
+        self.create_posts(settings.PAGE_SIZE)
+        with self.assertNumQueries(1) as queries:
+            self.guest_client.get(reverse('posts:index'))
+        sql = queries.captured_queries[0]['sql'].upper()
+        self.assertIn(f'LIMIT {settings.PAGE_SIZE + 1}', sql)
+        self.assertNotIn('COUNT(', sql.split(' FROM ')[0])
+        self.assertNotIn('OFFSET', sql)
+
+    def test_feed_post_has_comment_count(self):
+        """Посты ленты содержат аннотацию comment_count"""
+        self.create_posts(1)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.context.get('page')[0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
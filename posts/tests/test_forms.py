@@ -63,13 +63,9 @@ class YatubeFormTests(TestCase):
         )
         self.assertRedirects(response, reverse('posts:index'))
         self.assertEqual(Post.objects.count(), posts_count + 1)
-        self.assertTrue(
-            Post.objects.filter(
-                group=self.group.id,
-                text='Раз, два и три.',
-                image='posts/small.gif'
-            ).exists()
-        )
+        post = Post.objects.get(group=self.group.id, text='Раз, два и три.')
+        self.assertRegex(post.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
         self.assertEqual(response.status_code, 200)
 
     def test_edit_post(self):
@@ -0,0 +1,95 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import groups
+from posts.models import Comment, Group, GroupStats, Post, User
+from posts.stats import rebuild_group_stats
+
+
+class YatubeGroupsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Member')
+        cls.admin = User.objects.create_superuser(
+            username='Moderator', email='admin@example.com',
+            password='secret')
+        cls.cats = Group.objects.create(title='Котики', slug='cats',
+                                        description='Про котиков')
+        cls.dogs = Group.objects.create(title='Собаки', slug='dogs',
+                                        description='Про собак')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def stats(self):
+        return dict(GroupStats.objects.values_list(
+            'group__slug', 'post_count'))
+
+    @override_settings(PAGE_SIZE=4)
+    def test_group_feed_pages_past_first_posts(self):
+        """Лента сообщества листается курсором дальше первых постов"""
+        for number in range(15):
+            Post.objects.create(author=self.author, group=self.cats,
+                                text=f'Пост {number}')
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(
+                reverse('posts:group', kwargs={'slug': 'cats'}),
+                {'cursor': cursor} if cursor else {})
+            page = response.context['page']
+            seen.extend(post.text for post in page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f'Пост {number}'
+                                for number in range(14, -1, -1)])
+
+    def test_slug_lookup_is_cached_until_admin_save(self):
+        """Сообщество по slug берётся из кэша до правки в админке"""
+        self.assertEqual(groups.get_by_slug('cats'), self.cats)
+        with self.assertNumQueries(0):
+            self.assertEqual(groups.get_by_slug('cats').title, 'Котики')
+        admin = Client()
+        admin.force_login(self.admin)
+        response = admin.post(
+            reverse('admin:posts_group_change', args=[self.cats.id]),
+            {'title': 'Кошки', 'slug': 'cats', 'description': 'Про кошек'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(groups.get_by_slug('cats').title, 'Кошки')
+        self.assertIsNone(groups.get_by_slug('missing'))
+        response = self.client.get(
+            reverse('posts:group', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_counters_follow_posts_and_comments(self):
+        """Счётчики каталога меняются вместе с постами и комментариями"""
+        post = Post.objects.create(author=self.author, group=self.cats,
+                                   text='Переедет')
+        Post.objects.create(author=self.author, group=self.cats, text='Один')
+        self.assertEqual(self.stats(), {'cats': 2, 'dogs': 0})
+        post.group = self.dogs
+        post.save()
+        self.assertEqual(self.stats(), {'cats': 1, 'dogs': 1})
+        comment = Comment.objects.create(post=post, author=self.author,
+                                         text='Гав')
+        activity = GroupStats.objects.get(group=self.dogs).last_activity
+        self.assertEqual(activity, comment.created)
+        post.delete()
+        self.assertEqual(self.stats(), {'cats': 1, 'dogs': 0})
+        rebuild_group_stats()
+        self.assertEqual(self.stats(), {'cats': 1, 'dogs': 0})
+
+    def test_directory_lists_groups_by_activity(self):
+        """Каталог /groups/ показывает сообщества по свежести активности"""
+        Post.objects.create(author=self.author, group=self.cats, text='Мяу')
+        response = Client().get(reverse('posts:groups'))
+        self.assertEqual([stats.group.slug
+                          for stats in response.context['page']],
+                         ['cats', 'dogs'])
+        self.assertContains(response, 'Записей: 1')
+        self.assertContains(response,
+                            reverse('posts:group', kwargs={'slug': 'dogs'}))
@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from posts import search
+from posts.caching import CARDS, feed_version
+from posts.importing import CHECKPOINT_SUFFIX
+from posts.models import (Comment, Follow, MediaBlob, Post, ThumbnailJob,
+                          TimelineEntry, User)
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+RECORDS = [
+    {'type': 'user', 'id': 501, 'username': 'legacy_author'},
+    {'type': 'user', 'id': 502, 'username': 'legacy_reader',
+     'date_joined': '2015-03-01T10:00:00'},
+    {'type': 'group', 'id': 601, 'title': 'Архив', 'slug': 'archive'},
+    {'type': 'post', 'id': 701, 'text': 'Старый котик', 'author': 501,
+     'group': 601, 'pub_date': '2016-05-04T12:30:00+00:00'},
+    {'type': 'post', 'id': 702, 'text': 'Без группы', 'author': 501,
+     'pub_date': '2016-05-05T08:00:00+00:00'},
+    {'type': 'comment', 'id': 801, 'post': 701, 'author': 502,
+     'text': 'Помню его', 'created': '2016-05-06T09:00:00+00:00'},
+    {'type': 'follow', 'user': 502, 'author': 501},
+]
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class YatubeImportTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def write_jsonl(self, records, name='dump.jsonl'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return path
+
+    def run_import(self, *paths, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_yatube', *paths, stdout=stdout, stderr=stderr,
+                     **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_jsonl_keeps_ids_dates_and_derived_data(self):
+        """Загрузка сохраняет id и даты и пересчитывает производные данные"""
+        self.run_import(self.write_jsonl(RECORDS), batch_size=2)
+        post = Post.objects.get(id=701)
+        self.assertEqual(post.pub_date,
+                         datetime(2016, 5, 4, 12, 30, tzinfo=timezone.utc))
+        self.assertEqual(post.group.slug, 'archive')
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Comment.objects.get(id=801).created.year, 2016)
+        self.assertEqual(User.objects.get(id=502).date_joined.year, 2015)
+        author = User.objects.get(id=501)
+        self.assertEqual(author.stats.post_count, 2)
+        self.assertEqual(author.stats.follower_count, 1)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(user_id=502).values_list(
+                'post_id', flat=True)), {701, 702})
+        self.assertIn(701, [post_id for post_id, _
+                            in search.ranked('котики')])
+        created = Post.objects.create(author=author, text='Новый')
+        self.assertGreater(created.id, 702)
+
+    def test_repeated_import_counts_only_new_rows(self):
+        """Повторная загрузка ничего не считает и не чистит чужой кэш"""
+        path = self.write_jsonl(RECORDS)
+        stdout, _ = self.run_import(path)
+        self.assertIn(f'Загружено записей: {len(RECORDS)}', stdout)
+        cache.set('unrelated', 'kept')
+        cards = feed_version(CARDS)
+        stdout, _ = self.run_import(path, no_resume=True)
+        self.assertIn('Загружено записей: 0', stdout)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(cache.get('unrelated'), 'kept')
+        self.assertNotEqual(feed_version(CARDS), cards)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertEqual(Post.objects.get(id=702).pub_date.year, 2016)
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        """Битые строки попадают в stderr, остальные загружаются"""
+        path = self.write_jsonl(RECORDS[:2] + [
+            {'type': 'post', 'id': 703, 'text': 'Нет автора'},
+            {'type': 'follow', 'user': 501, 'author': 501},
+            {'type': 'planet', 'id': 1},
+        ])
+        with open(path, 'a') as output:
+            output.write('{not json\n')
+        _, errors = self.run_import(path)
+        self.assertEqual(len(errors.strip().splitlines()), 4)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Follow.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        """Загрузка продолжается со строки из контрольной точки"""
+        path = self.write_jsonl(RECORDS)
+        with open(path + CHECKPOINT_SUFFIX, 'w') as output:
+            json.dump({'line': 4}, output)
+        self.run_import(self.write_jsonl(RECORDS[:3], 'first.jsonl'))
+        self.run_import(path)
+        self.assertEqual(list(Post.objects.values_list('id', flat=True)),
+                         [702])
+        self.assertFalse(os.path.exists(path + CHECKPOINT_SUFFIX))
+        self.run_import(path, no_resume=True)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_csv_with_images_in_worker_processes(self):
+        """CSV загружается, изображения обрабатываются в процессах"""
+        Image.new('RGB', (60, 30), (0, 120, 0)).save(
+            os.path.join(self.directory, 'photo.jpg'))
+        tables = {
+            'users.csv': [{'id': 501, 'username': 'legacy_author'}],
+            'posts.csv': [
+                {'id': 701 + number, 'text': f'Фото {number}',
+                 'author': 501, 'group': '', 'image': 'photo.jpg',
+                 'pub_date': '2016-05-04 12:30:00'}
+                for number in range(3)
+            ],
+        }
+        paths = []
+        for name, rows in tables.items():
+            paths.append(os.path.join(self.directory, name))
+            with open(paths[-1], 'w', newline='') as output:
+                writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+        self.run_import(*paths, images=self.directory, workers=2)
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertRegex(images.pop(),
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(MediaBlob.objects.get().ref_count, 3)
+        self.assertEqual(ThumbnailJob.objects.count(), 3)
@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.media import collect_garbage
+from posts.models import MediaBlob, Post, User
+from yatube.storage import serve
+
+
+def meme():
+    buffer = BytesIO()
+    Image.new('RGB', (400, 200), color=(0, 200, 0)).save(buffer, 'png')
+    return buffer.getvalue()
+
+
+class YatubeMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [User.objects.create_user(username=f'Memer{number}')
+                     for number in range(3)]
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def upload(self, user, name):
+        client = Client()
+        client.force_login(user)
+        client.post(reverse('posts:new_post'), {
+            'text': 'Мем', 'image': SimpleUploadedFile(name, meme())
+        })
+        return Post.objects.filter(author=user).latest('pk')
+
+    def test_duplicates_share_file_and_variants(self):
+        """Одинаковые загрузки хранятся и обрабатываются один раз"""
+        posts = [self.upload(user, f'meme{number}.png')
+                 for number, user in enumerate(self.users)]
+        names = {post.image.name for post in posts}
+        self.assertEqual(len(names), 1)
+        self.assertEqual(MediaBlob.objects.get(name=names.pop()).ref_count,
+                         3)
+        with mock.patch.object(thumbnails, 'render_variants',
+                               wraps=thumbnails.render_variants) as render:
+            self.assertEqual(thumbnails.process_pending(), 3)
+        render.assert_called_once()
+        manifests = {post.image_variants for post in
+                     Post.objects.filter(pk__in=[p.pk for p in posts])}
+        self.assertEqual(len(manifests), 1)
+
+    def test_garbage_collection_respects_references(self):
+        """Файл удаляется только когда на него не ссылается ни один пост"""
+        first = self.upload(self.users[0], 'a.png')
+        second = self.upload(self.users[1], 'b.png')
+        storage = first.image.storage
+        name = first.image.name
+        first.delete()
+        self.assertEqual(collect_garbage(grace=timedelta(0)), [])
+        self.assertTrue(storage.exists(name))
+        second.delete()
+        self.assertEqual(MediaBlob.objects.get(name=name).ref_count, 0)
+        self.assertEqual(collect_garbage(), [])
+        self.assertEqual(collect_garbage(grace=timedelta(0)), [name])
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_immutable_cache_headers(self):
+        """Файлы по адресу содержимого отдаются с вечным кэшированием"""
+        post = self.upload(self.users[0], 'c.png')
+        request = RequestFactory().get(post.image.url)
+        response = serve(request, post.image.name)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        legacy = FileSystemStorage().save('posts/legacy.png',
+                                          SimpleUploadedFile('x', b'x'))
+        response = serve(request, legacy)
+        self.assertNotIn('Cache-Control', response)
@@ -0,0 +1,92 @@
+import re
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.test_thumbnails import image_file
+from yatube import metrics
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class YatubeMetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Measured')
+        cls.staff = User.objects.create_user(username='Operator',
+                                             is_staff=True)
+        Post.objects.create(author=cls.author, text='Замеряемый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics.AGGREGATE.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_server_timing_reports_queries_templates_and_cache(self):
+        """Server-Timing содержит запросы, шаблоны и попадания в кэш"""
+        url = reverse('posts:profile', kwargs={'username': 'Measured'})
+        first = self.client.get(url)['Server-Timing']
+        second = self.client.get(url)['Server-Timing']
+        for header in (first, second):
+            self.assertRegex(header, r'db;dur=[\d.]+;desc="\d+ queries')
+            self.assertRegex(header, r'tpl;dur=[\d.]+')
+            self.assertRegex(header, r'total;dur=[\d.]+')
+        pattern = r'cache;desc="(\d+) hits, (\d+) misses"'
+        first_hits, first_misses = map(
+            int, re.search(pattern, first).groups())
+        second_hits, second_misses = map(
+            int, re.search(pattern, second).groups())
+        self.assertGreater(first_misses, 0)
+        self.assertGreater(second_hits, first_hits)
+        self.assertLess(second_misses, first_misses)
+
+    def test_duplicate_queries_are_counted(self):
+        """Повтор того же SQL с теми же параметрами считается дублем"""
+        with metrics.collect() as collector:
+            for _ in range(3):
+                list(Post.objects.filter(author=self.author))
+            list(Post.objects.filter(author=self.staff))
+        self.assertEqual(collector.queries, 4)
+        self.assertEqual(collector.duplicates, 2)
+        self.assertGreater(collector.db_time, 0)
+
+    def test_thumbnail_time_is_measured(self):
+        """Время подготовки миниатюры попадает в замеры"""
+        self.client.post(reverse('posts:new_post'),
+                         {'text': 'С картинкой', 'image': image_file()})
+        post = Post.objects.get(image__startswith='posts/')
+        with metrics.collect() as collector:
+            self.assertTrue(thumbnails.generate(post.id))
+        self.assertGreater(collector.thumbnail_time, 0)
+
+    def test_prometheus_export_is_staff_only(self):
+        """Счётчики по представлениям отдаются только сотрудникам"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        response = staff_client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_db_queries_total counter', body)
+        self.assertRegex(body,
+                         r'yatube_requests_total\{view="posts:index"\} 1')
+        self.assertRegex(body, r'yatube_cache_misses_total'
+                               r'\{view="posts:index"\} [1-9]')
+        self.assertIn('yatube_request_duration_seconds_bucket'
+                      '{view="posts:index",le="+Inf"} 1', body)
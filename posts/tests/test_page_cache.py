@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class YatubePageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Paged')
+        cls.reader = User.objects.create_user(username='PageReader')
+        cls.group = Group.objects.create(title='Страницы', slug='pages',
+                                         description='Кэш')
+        cls.post = Post.objects.create(author=cls.author, text='Первый',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post_url = reverse('posts:post', kwargs={
+            'username': 'Paged', 'post_id': self.post.id})
+
+    def test_guest_page_is_served_without_queries(self):
+        """Повторная страница для гостя отдаётся из кэша без запросов к базе"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': 'pages'}),
+            reverse('posts:profile', kwargs={'username': 'Paged'}),
+            self.post_url,
+            reverse('about:author'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                self.assertEqual(second.status_code, 200)
+                self.assertEqual(second.content, first.content)
+                self.assertEqual(second.get('ETag'), first.get('ETag'))
+                self.assertIn('Cookie', second['Vary'])
+
+    def test_holes_are_filled_per_request(self):
+        """В кэше лежат метки, а гость получает меню входа"""
+        response = self.guest_client.get(self.post_url)
+        self.assertNotContains(response, '<!--hole:')
+        self.assertContains(response, reverse('login'))
+        entries = [value for value in cache._cache.values()
+                   if b'<!--hole:nav:' in value]
+        self.assertEqual(len(entries), 1)
+
+    def test_logged_in_pages_are_not_shared(self):
+        """Страницы пользователя не кэшируются и не попадают гостям"""
+        response = self.reader_client.get(self.post_url)
+        self.assertContains(response, 'Добавить комментарий')
+        self.assertContains(response, 'PageReader')
+        response = self.guest_client.get(self.post_url)
+        self.assertNotContains(response, 'Добавить комментарий')
+        self.assertNotContains(response, 'PageReader')
+        self.reader_client.get(self.post_url)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.post_url)
+        response = self.reader_client.get(self.post_url)
+        self.assertIsNotNone(response.context)
+
+    def test_changes_invalidate_cached_pages(self):
+        """Новый пост, комментарий и подписка сбрасывают страницы гостей"""
+        profile_url = reverse('posts:profile', kwargs={'username': 'Paged'})
+        group_url = reverse('posts:group', kwargs={'slug': 'pages'})
+        for url in (profile_url, group_url, self.post_url):
+            self.guest_client.get(url)
+        Post.objects.create(author=self.author, text='Второй',
+                            group=self.group)
+        self.assertContains(self.guest_client.get(profile_url), 'Второй')
+        self.assertContains(self.guest_client.get(group_url), 'Второй')
+        Comment.objects.create(post=self.post, author=self.reader,
+                               text='Отклик')
+        self.assertContains(self.guest_client.get(self.post_url), 'Отклик')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.guest_client.get(profile_url),
+                            'Подписчиков: 1')
+
+    def test_unknown_query_parameters_bypass_cache(self):
+        """Посторонние параметры адреса не порождают копий в кэше"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        # Дырки рендерят свои шаблоны, но страницу строит только
+        # представление.
+        self.assertNotIn('page', self.guest_client.get(url).context)
+        for query in ('?x=1', '?cursor=broken', '?page=1&page=2'):
+            with self.subTest(query=query):
+                self.guest_client.get(url + query)
+                self.assertIn('page',
+                              self.guest_client.get(url + query).context)
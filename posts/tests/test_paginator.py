@@ -1,4 +1,7 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from posts.models import Group, Post, User
@@ -24,6 +27,7 @@ class YatubePaginatorTest(TestCase):
             )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_first_page_containse_ten_records(self):
@@ -38,3 +42,67 @@ class YatubePaginatorTest(TestCase):
         response = self.client.get(reverse('posts:index') + '?page=23')
         self.assertEqual(response.status_code, 200)
         self.assertEqual(len(response.context.get('page').object_list), 8)
+
+    def test_cursor_pages_cover_all_posts(self):
+        """Переход по курсорам проходит все посты без повторов"""
+        seen = []
+        url = reverse('posts:index')
+        while url:
+            response = self.guest_client.get(url)
+            page = response.context.get('page')
+            seen.extend(post.id for post in page)
+            url = (reverse('posts:index') + f'?cursor={page.next_cursor}'
+                   if page.next_cursor else None)
+        self.assertEqual(len(seen), Post.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+
+    def test_cursor_page_skips_count(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET"""
+        first = self.guest_client.get(reverse('posts:index'))
+        cursor = first.context.get('page').next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(
+                reverse('posts:index') + f'?cursor={cursor}')
+        self.assertEqual(len(response.context.get('page')), settings.PAGE_SIZE)
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу"""
+        first = self.guest_client.get(reverse('posts:index'))
+        first_ids = [post.id for post in first.context.get('page')]
+        second = self.guest_client.get(
+            reverse('posts:index')
+            + f'?cursor={first.context.get("page").next_cursor}')
+        previous = self.guest_client.get(
+            reverse('posts:index')
+            + f'?cursor={second.context.get("page").previous_cursor}')
+        self.assertEqual([post.id for post in previous.context.get('page')],
+                         first_ids)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Битый курсор открывает первую страницу"""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=lol_kek')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context.get('page').previous_cursor)
+
+    def test_cursor_page_answers_page_methods(self):
+        """Страница по курсору отвечает на has_next и номера без ошибок"""
+        page = self.guest_client.get(reverse('posts:index')).context['page']
+        self.assertTrue(page.has_next())
+        self.assertFalse(page.has_previous())
+        self.assertTrue(page.has_other_pages())
+        self.assertIsNone(page.next_page_number())
+        self.assertIsNone(page.start_index())
+
+    def test_cursor_links_keep_other_parameters(self):
+        """Ссылки на соседние страницы сохраняют прочие параметры адреса"""
+        self.guest_client.force_login(self.user)
+        response = self.guest_client.get(reverse('posts:index'),
+                                         {'view': 'compact', 'page': '2'})
+        page = response.context['page']
+        self.assertContains(
+            response, f'href="/?view=compact&amp;cursor={page.next_cursor}"')
+        self.assertContains(response, 'href="/?view=compact"')
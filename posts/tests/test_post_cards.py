@@ -0,0 +1,65 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.caching import bump_feed_versions, feed_key
+from posts.models import Comment, Group, Post, User
+from yatube import settings
+
+
+class YatubePostCardsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='CardOwner')
+        cls.group = Group.objects.create(
+            title='Карточки', slug='cards', description='Кэш карточек'
+        )
+        cls.post = Post.objects.create(author=cls.user, text='Карточка',
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_page_fetches_cards_with_one_get_many(self):
+        """Страница ленты получает все карточки одним get_many"""
+        for number in range(settings.PAGE_SIZE):
+            Post.objects.create(author=self.user, text=f'Пост {number}')
+        self.guest_client.get(reverse('posts:index'))
+        bump_feed_versions(feed_key('index'))
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch('posts.templatetags.post_cards.render_to_string'
+                           ) as render:
+            self.guest_client.get(reverse('posts:index'))
+        card_calls = [call for call in get_many.call_args_list
+                      if str(list(call[0][0])[0]).startswith('post_card:')]
+        self.assertEqual(len(card_calls), 1)
+        render.assert_not_called()
+
+    def test_card_changes_with_its_dependencies(self):
+        """Карточка обновляется при смене автора, группы и комментариев"""
+        url = reverse('posts:post', kwargs={'username': 'CardOwner',
+                                            'post_id': self.post.id})
+        self.guest_client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, text='Ком')
+        self.assertContains(self.guest_client.get(url), 'Комментариев: 1')
+        self.group.title = 'Новая группа'
+        self.group.save()
+        self.assertContains(self.guest_client.get(url), '#Новая группа')
+        self.user.username = 'CardRenamed'
+        self.user.save()
+        url = reverse('posts:post', kwargs={'username': 'CardRenamed',
+                                            'post_id': self.post.id})
+        self.assertContains(self.guest_client.get(url), '@CardRenamed')
+
+    def test_edit_button_is_not_shared_between_users(self):
+        """Кнопка редактирования не попадает в карточку чужого поста"""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Редактировать')
@@ -0,0 +1,37 @@
+import unittest
+
+from django.db import connection
+from django.test import TestCase
+
+from posts import search
+from posts.models import Post, User
+from yatube import settings
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'Профиль PostgreSQL: YATUBE_DB=postgresql')
+class YatubePostgreSQLProfileTest(TestCase):
+    def setting(self, name):
+        """Значение параметра сервера в базовых единицах (мс)."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT setting FROM pg_settings WHERE name = %s',
+                           [name])
+            return int(cursor.fetchone()[0])
+
+    @unittest.skipIf(settings.PGBOUNCER,
+                     'За PgBouncer тайм-ауты задаются роли')
+    def test_connection_timeouts(self):
+        """Соединение открывается с тайм-аутами запроса и транзакции"""
+        self.assertEqual(self.setting('statement_timeout'),
+                         settings.STATEMENT_TIMEOUT)
+        self.assertEqual(self.setting('idle_in_transaction_session_timeout'),
+                         settings.STATEMENT_TIMEOUT * 2)
+
+    def test_search_works_without_fts(self):
+        """Поиск без FTS5 идёт по таблице постингов"""
+        self.assertFalse(search.use_fts())
+        post = Post.objects.create(
+            author=User.objects.create_user(username='Pg'),
+            text='Котик на сервере')
+        self.assertEqual([post_id for post_id, _ in search.ranked('котик')],
+                         [post.id])
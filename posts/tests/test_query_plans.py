@@ -0,0 +1,91 @@
+import re
+import unittest
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import trending
+from posts.models import Comment, Follow, Group, Post, User
+
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(posts_\w+)\b(?! USING)')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'EXPLAIN QUERY PLAN есть только в SQLite')
+class YatubeQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='PlanReader')
+        cls.author = User.objects.create_user(username='PlanWriter')
+        # Планировщик выбирает план по статистике ANALYZE, поэтому данные
+        # похожи на живой сайт: несколько авторов и сообществ, посты
+        # разбросаны по ним, часть постов вне сообществ.
+        groups = [Group.objects.create(title=f'Планы {number}',
+                                       slug=f'plans{number}',
+                                       description='Планы запросов')
+                  for number in range(10)]
+        cls.group = groups[0]
+        authors = [cls.author] + [
+            User.objects.create_user(username=f'PlanAuthor{number}')
+            for number in range(4)]
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(20):
+            reader = User.objects.create_user(username=f'Reader{number}')
+            Follow.objects.create(user=reader, author=cls.author)
+            Follow.objects.create(user=reader, author=cls.user)
+        for number in range(200):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=authors[number % len(authors)],
+                group=groups[number % 11] if number % 11 < 10 else None
+            )
+            Comment.objects.create(post=post, author=cls.user,
+                                   text=f'Комментарий {number}')
+        cls.post = Post.objects.filter(author=cls.author).latest('pub_date')
+        trending.update(now=post.pub_date + trending.SETTLE)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def full_scans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    match = FULL_SCAN.search(row[-1])
+                    if match:
+                        scans.append(f'{match.group(1)}: {query["sql"]}')
+        return scans
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент и страницы поста не сканируют таблицы целиком"""
+        first_page = self.authorized_client.get(reverse('posts:index'))
+        cursor = first_page.context.get('page').next_cursor
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + f'?cursor={cursor}',
+            reverse('posts:group', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:follow_index'),
+            reverse('posts:post', kwargs={'username': self.author.username,
+                                          'post_id': self.post.id}),
+            reverse('posts:comments',
+                    kwargs={'username': self.author.username,
+                            'post_id': self.post.id}),
+            reverse('posts:trending'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.full_scans(url), [])
@@ -0,0 +1,192 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Group, Post, User
+from yatube import settings
+
+
+class YatubeSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Поездки'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def found(self, query):
+        return [post_id for post_id, _ in search.ranked(query, limit=100)]
+
+    def test_stemming(self):
+        """Поиск находит другие формы слова"""
+        self.assertEqual(search.stem('котики'), search.stem('котика'))
+        post = Post.objects.create(author=self.user, text='Мой котик спит')
+        Post.objects.create(author=self.user, text='Про собак')
+        self.assertEqual(self.found('котиками'), [post.id])
+
+    def test_comments_and_group_titles_are_searched(self):
+        """Совпадение в комментарии или названии группы находит пост"""
+        commented = Post.objects.create(author=self.user, text='Фото')
+        Comment.objects.create(post=commented, author=self.user,
+                               text='Отличный закат')
+        grouped = Post.objects.create(author=self.user, text='Альбом',
+                                      group=self.group)
+        self.assertEqual(self.found('закаты'), [commented.id])
+        self.assertEqual(self.found('путешествие'), [grouped.id])
+
+    def test_edits_and_deletes_update_index(self):
+        """Правка и удаление поста сразу отражаются в поиске"""
+        post = Post.objects.create(author=self.user, text='Старый текст')
+        post.text = 'Новая заметка'
+        post.save()
+        self.assertEqual(self.found('старый'), [])
+        self.assertEqual(self.found('заметки'), [post.id])
+        post.delete()
+        self.assertEqual(self.found('заметки'), [])
+
+    def test_ranking(self):
+        """Пост с частым совпадением в тексте выше упоминания в комментарии"""
+        weak = Post.objects.create(author=self.user, text='Обзор')
+        Comment.objects.create(post=weak, author=self.user, text='Про чай')
+        strong = Post.objects.create(author=self.user,
+                                     text='Чай, чай и ещё раз чай')
+        self.assertEqual(self.found('чай'), [strong.id, weak.id])
+
+    def test_fallback_without_fts(self):
+        """Без FTS5 поиск работает по таблице вхождений"""
+        with mock.patch.object(search, 'use_fts', return_value=False):
+            post = Post.objects.create(author=self.user,
+                                       text='Котики и чай')
+            Post.objects.create(author=self.user, text='Только чай')
+            self.assertEqual(self.found('котиков чаю'), [post.id])
+            search.rebuild()
+            self.assertEqual(self.found('котики'), [post.id])
+
+    def test_all_terms_in_one_document_on_both_indexes(self):
+        """Слова запроса ищутся в одном документе: посте или комментарии"""
+        for fts in sorted({search.use_fts(), False}):
+            with self.subTest(fts=fts), mock.patch.object(
+                    search, 'use_fts', return_value=fts):
+                spread = Post.objects.create(author=self.user, text='Лодка')
+                Comment.objects.create(post=spread, author=self.user,
+                                       text='Весло')
+                together = Post.objects.create(author=self.user, text='Фото')
+                Comment.objects.create(post=together, author=self.user,
+                                       text='Лодка и весло')
+                self.assertEqual(self.found('лодки весла'), [together.id])
+                spread.delete()
+                together.delete()
+
+    def test_fallback_pages_with_cursor(self):
+        """Без FTS5 страницы результатов идут по курсору без повторов"""
+        with mock.patch.object(search, 'use_fts', return_value=False):
+            posts = [Post.objects.create(author=self.user,
+                                         text='Сад ' * (number % 3 + 1))
+                     for number in range(7)]
+            first = search.ranked('сады', limit=4)
+            rest = search.ranked('сады', after=(first[-1][1], first[-1][0]),
+                                 limit=4)
+        found = [post_id for post_id, _ in first + rest]
+        self.assertEqual(sorted(found), [post.id for post in posts])
+        scores = [score for _, score in first + rest]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_search_view_pages_with_cursor(self):
+        """Страница поиска листается курсором без повторов"""
+        for number in range(settings.PAGE_SIZE + 3):
+            Post.objects.create(author=self.user,
+                                text=f'Рецепт номер {number}')
+        url = reverse('posts:search')
+        first = self.client.get(url, {'q': 'рецепты'})
+        self.assertEqual(len(first.context['results']), settings.PAGE_SIZE)
+        cursor = first.context['next_cursor']
+        self.assertIsNotNone(cursor)
+        second = self.client.get(url, {'q': 'рецепты', 'cursor': cursor})
+        self.assertEqual(len(second.context['results']), 3)
+        self.assertIsNone(second.context['next_cursor'])
+        seen = {post.id for post in first.context['results']}
+        self.assertFalse(
+            seen & {post.id for post in second.context['results']})
+        self.assertContains(self.client.get(url, {'q': 'бегемот'}),
+                            'Ничего не найдено')
+
+
+class YatubeSearchGroupTest(TransactionTestCase):
+    """Посты группы переиндексируются после коммита её изменения."""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='GroupSearcher')
+        self.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Поездки')
+        self.post = Post.objects.create(author=user, text='Альбом',
+                                        group=self.group)
+
+    def found(self, query):
+        cache.clear()
+        return [post_id for post_id, _ in search.ranked(query, limit=100)]
+
+    def test_renamed_group_is_reindexed_after_commit(self):
+        """Новое название группы ищется, когда транзакция закоммичена"""
+        with transaction.atomic():
+            self.group.title = 'Поездки'
+            self.group.save()
+            self.assertEqual(self.found('поездка'), [])
+        self.assertEqual(self.found('путешествие'), [])
+        self.assertEqual(self.found('поездка'), [self.post.id])
+
+    def test_unchanged_title_is_not_reindexed(self):
+        """Сохранение группы без нового названия не трогает индекс"""
+        self.group.description = 'Про дороги'
+        with mock.patch('posts.signals.index_posts') as index_posts:
+            self.group.save()
+        index_posts.assert_not_called()
+
+    def test_deleted_group_is_unindexed(self):
+        """После удаления группы её название больше не находит пост"""
+        self.group.delete()
+        self.assertEqual(self.found('путешествие'), [])
+
+
+class YatubeSearchMigrationTest(TransactionTestCase):
+    """Миграция индекса находит посты, написанные до неё."""
+
+    before = [('posts', '0016_search_pattern_index')]
+    after = [('posts', '0017_fill_search_index')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_existing_posts_are_indexed(self):
+        """После migrate старые посты и комментарии ищутся сразу"""
+        apps = self.migrate(self.before)
+        author = apps.get_model('auth', 'User').objects.create(
+            username='Old')
+        post = apps.get_model('posts', 'Post').objects.create(
+            author=author, text='Давний котик')
+        apps.get_model('posts', 'Comment').objects.create(
+            post=post, author=author, text='Старинный закат')
+        self.assertEqual(search.ranked('котик'), [])
+        self.migrate(self.after)
+        cache.clear()
+        self.assertEqual([post_id for post_id, _ in search.ranked('котик')],
+                         [post.id])
+        self.assertEqual([post_id for post_id, _ in search.ranked('закат')],
+                         [post.id])
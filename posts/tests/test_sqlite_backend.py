@@ -0,0 +1,48 @@
+import unittest
+
+from django.db import connection, transaction
+from django.test import Client, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post, User
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite',
+                     'Профиль SQLite проверяется только на SQLite')
+class YatubeSQLiteProfileTest(TransactionTestCase):
+    def test_connection_pragmas(self):
+        """Соединение открывается с synchronous=NORMAL"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_transactions_take_write_lock_upfront(self):
+        """Транзакция сразу берёт блокировку записи: BEGIN IMMEDIATE"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                Post.objects.exists()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    # Сессия в cookie: её сохранение не добавляет свою транзакцию.
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_write_lock_is_held_only_around_save(self):
+        """Форма и её проверка не открывают транзакцию, запись — одну"""
+        client = Client()
+        client.force_login(User.objects.create_user(username='Writer'))
+        url = reverse('posts:new_post')
+
+        def begins(method, *args):
+            with CaptureQueriesContext(connection) as queries:
+                response = method(url, *args)
+            return response, [query['sql'] for query in queries
+                              if query['sql'].startswith('BEGIN')]
+
+        self.assertEqual(begins(client.get)[1], [])
+        response, found = begins(client.post, {'text': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(found, [])
+        response, found = begins(client.post, {'text': 'Пост'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(found, ['BEGIN IMMEDIATE'])
@@ -1,8 +1,10 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 
 
 class YatubeStaticURLTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_about_url_exists_at_desired_location(self):
@@ -1,9 +1,11 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
 
 class YatubeStaticViewsTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_about_page_accessible_by_name(self):
@@ -0,0 +1,130 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.media import collect_garbage
+from posts.models import Post, ThumbnailJob, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(name='photo.png', size=(40, 20)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color=(200, 0, 0)).save(buffer, 'png')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class YatubeThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_page_shows_placeholder_until_thumbnail_is_ready(self):
+        """Страница не ждёт обработки изображения и выводит заглушку"""
+        self.client.post(reverse('posts:new_post'),
+                         {'text': 'С картинкой', 'image': image_file()})
+        post = Post.objects.get()
+        self.assertEqual(post.thumbnail, '')
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+        with mock.patch.object(thumbnails, 'render_variants') as render:
+            response = self.client.get(reverse('posts:index'))
+        render.assert_not_called()
+        self.assertContains(response, 'Изображение обрабатывается')
+        self.assertEqual(thumbnails.process_pending(), 1)
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.thumbnail_url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_stale_save_keeps_ready_thumbnail(self):
+        """Правка поста, загруженного до обработки, не стирает миниатюру"""
+        self.client.post(reverse('posts:new_post'),
+                         {'text': 'С картинкой', 'image': image_file()})
+        stale = Post.objects.get()
+        thumbnails.process_pending()
+        stale.text = 'Правка'
+        stale.save()
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Правка')
+        self.assertTrue(post.thumbnail)
+        self.assertTrue(post.variants)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_new_image_replaces_thumbnail(self):
+        """Замена изображения сбрасывает миниатюру и ставит задание"""
+        post = Post.objects.create(author=self.user, text='Текст',
+                                   image=image_file('first.png'))
+        thumbnails.process_pending()
+        post.refresh_from_db()
+        post.text = 'Только текст поменялся'
+        post.save()
+        self.assertFalse(ThumbnailJob.objects.exists())
+        post.image = image_file('second.png')
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail, '')
+        self.assertEqual(ThumbnailJob.objects.get().image, post.image.name)
+
+    def test_failed_job_is_retried_limited_times(self):
+        """Сломанное изображение не обрабатывается бесконечно"""
+        Post.objects.create(author=self.user, text='Битая',
+                            image=image_file())
+        with mock.patch.object(thumbnails, 'render_variants',
+                               side_effect=OSError('broken')):
+            for _ in range(thumbnails.MAX_ATTEMPTS + 1):
+                self.assertEqual(thumbnails.process_pending(), 0)
+        job = ThumbnailJob.objects.get()
+        self.assertEqual(job.attempts, thumbnails.MAX_ATTEMPTS)
+        self.assertIn('broken', job.error)
+
+    def test_width_variants_and_srcset(self):
+        """Из картинки делаются WebP и JPEG нескольких ширин для srcset"""
+        post = Post.objects.create(author=self.user, text='Большая',
+                                   image=image_file(size=(1600, 900)))
+        thumbnails.process_pending()
+        post.refresh_from_db()
+        for name in ('webp', 'jpeg'):
+            with self.subTest(format=name):
+                variants = post.variants[name]
+                self.assertEqual([width for width, _ in variants],
+                                 list(thumbnails.VARIANT_WIDTHS))
+                for _, file in variants:
+                    self.assertTrue(default_storage.exists(file))
+        self.assertEqual(post.thumbnail, post.variants['jpeg'][-1][1])
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, post.srcsets['webp'])
+        old_files = [file for _, file in post.variants['webp']]
+        post.image = image_file('small.png', size=(400, 200))
+        post.save()
+        thumbnails.process_pending()
+        post.refresh_from_db()
+        self.assertEqual([width for width, _ in post.variants['webp']],
+                         [320])
+        collect_garbage(grace=timedelta(0))
+        for file in old_files:
+            self.assertFalse(default_storage.exists(file))
@@ -0,0 +1,78 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry, User
+
+
+class YatubeTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TimelineReader')
+        cls.author = User.objects.create_user(username='TimelineAuthor')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def timeline_posts(self):
+        return list(TimelineEntry.objects.filter(
+            user=self.reader).values_list('post_id', flat=True))
+
+    def follow_page(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context.get('page')]
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленты подписчиков при создании"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Разложи меня')
+        self.assertEqual(self.timeline_posts(), [post.id])
+        self.assertEqual(self.follow_page(), [post.id])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дописывает старые посты, отписка их убирает"""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        self.reader_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertEqual(self.timeline_posts(), [old_post.id])
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertEqual(self.timeline_posts(), [])
+        self.assertEqual(self.follow_page(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Посты популярного автора подтягиваются при чтении ленты"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Для миллионов')
+        self.assertEqual(self.timeline_posts(), [])
+        self.assertEqual(self.follow_page(), [post.id])
+        self.assertEqual(self.timeline_posts(), [post.id])
+
+    @override_settings(PAGE_SIZE=2)
+    def test_follow_backfills_one_window_and_pages_fill_on_read(self):
+        """Подписка дописывает одно окно, старые посты приходят при чтении"""
+        other = User.objects.create_user(username='TimelineOther')
+        posts = []
+        for number in range(5):
+            for author in (self.author, other):
+                posts.append(Post.objects.create(
+                    author=author, text=f'Пост {number}'))
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        self.assertEqual(len(self.timeline_posts()), 2 * 3)
+
+        seen = []
+        params = {}
+        while True:
+            response = self.reader_client.get(
+                reverse('posts:follow_index'), params)
+            page = response.context['page']
+            seen.extend(post.id for post in page)
+            if not page.next_cursor:
+                break
+            params = {'cursor': page.next_cursor}
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
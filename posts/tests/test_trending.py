@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Post, TrendingEntry, User
+
+
+@override_settings(PAGE_SIZE=2)
+class YatubeTrendingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.now = timezone.now()
+        cls.author = User.objects.create_user(username='Popular')
+        cls.reader = User.objects.create_user(username='Commenter')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def create_post(self, text, age, comments=0):
+        post = Post.objects.create(author=self.author, text=text)
+        Post.objects.filter(pk=post.pk).update(pub_date=self.now - age)
+        for _ in range(comments):
+            self.comment(post, age)
+        return post
+
+    def comment(self, post, age):
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Обсуждаем')
+        Comment.objects.filter(pk=comment.pk).update(
+            created=self.now - age)
+
+    def ranked(self):
+        return list(TrendingEntry.objects.values_list('post__text',
+                                                      flat=True))
+
+    def test_score_decays_with_age(self):
+        """Комментарии поднимают пост, но старое вытесняется новым"""
+        self.create_post('Вчерашний обсуждаемый', timedelta(days=1), 2)
+        self.create_post('Свежий тихий', timedelta(hours=1))
+        self.create_post('Свежий обсуждаемый', timedelta(hours=2), 1)
+        self.create_post('Позавчерашний тихий', timedelta(days=2))
+        self.create_post('Слишком старый', timedelta(days=30), 50)
+        trending.update(now=self.now)
+        self.assertEqual(self.ranked(), [
+            'Свежий обсуждаемый', 'Свежий тихий',
+            'Вчерашний обсуждаемый', 'Позавчерашний тихий',
+        ])
+
+    def test_incremental_update_matches_full_rescore(self):
+        """Проход по новым событиям даёт тот же счёт, что пересчёт заново"""
+        post = self.create_post('Первый', timedelta(hours=5), 2)
+        trending.update(now=self.now - timedelta(hours=3))
+        self.comment(post, timedelta(hours=2))
+        self.create_post('Второй', timedelta(hours=1), 1)
+        self.assertEqual(trending.update(now=self.now), 2)
+        incremental = dict(TrendingEntry.objects.values_list('post_id',
+                                                             'score'))
+        trending.update(now=self.now, full=True)
+        full = dict(TrendingEntry.objects.values_list('post_id', 'score'))
+        self.assertEqual(incremental.keys(), full.keys())
+        for post_id, score in full.items():
+            self.assertAlmostEqual(incremental[post_id], score)
+        self.assertEqual(trending.update(now=self.now), 0)
+
+    def test_feed_pages_by_cursor(self):
+        """Лента популярного листается курсором по счёту"""
+        for hours in range(5):
+            self.create_post(f'Пост {hours}', timedelta(hours=hours + 1))
+        call_command('score_trending')
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(reverse('posts:trending'),
+                                       {'cursor': cursor} if cursor else {})
+            page = response.context['page']
+            seen.extend(post.text for post in page)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f'Пост {hours}' for hours in range(5)])
@@ -0,0 +1,192 @@
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import textwrap
+import tracemalloc
+import zlib
+from io import BytesIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.files.uploadedfile import (SimpleUploadedFile,
+                                            TemporaryUploadedFile)
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post, User
+from posts.uploads import ImageUploadHandler
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg(size, noise=False, exif=None):
+    if noise:
+        image = Image.effect_noise(size, 80).convert('RGB')
+    else:
+        image = Image.new('RGB', size, color=(10, 120, 200))
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', quality=95, exif=exif or b'')
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """PNG с честным заголовком огромной картинки и пустыми данными."""
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data)))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height,
+                                         8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(b''))
+            + chunk(b'IEND', b''))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class YatubeUploadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name, content):
+        return self.client.post(reverse('posts:new_post'), {
+            'text': 'Загрузка',
+            'image': SimpleUploadedFile(name, content)
+        })
+
+    def test_rejected_before_decoding(self):
+        """Чужая сигнатура, бомба и лишний размер отвергаются сразу"""
+        cases = (
+            ('fake.jpg', b'<?php echo 1; ?>' * 10, 'поврежден'),
+            ('bomb.png', png_header(60000, 60000), 'мегапикселей'),
+            ('wide.png', png_header(5000, 5000), 'мегапикселей'),
+            ('big.jpg', jpeg((1000, 1000), noise=True), 'Файл больше'),
+        )
+        with override_settings(IMAGE_UPLOAD_MAX_SIZE=100 * 1024):
+            for name, content, error in cases:
+                with self.subTest(name=name):
+                    response = self.upload(name, content)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertIn(error, response.context['form'].errors[
+                        'image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный JPEG с целым заголовком отвергается без ошибки 500"""
+        content = jpeg((400, 300), noise=True)
+        response = self.upload('truncated.jpg', content[:len(content) // 2])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('поврежден', response.context['form'].errors['image'][0])
+        self.assertFalse(Post.objects.exists())
+
+    def test_handler_is_limited_to_post_forms(self):
+        """Другие загрузки не проверяются как изображения, CSRF на месте"""
+        request = RequestFactory().post('/other/', {
+            'document': SimpleUploadedFile('notes.txt', b'plain text')
+        })
+        self.assertEqual(request.FILES['document'].read(), b'plain text')
+        response = Client(enforce_csrf_checks=True).post(
+            reverse('posts:new_post'), {'text': 'Без токена'})
+        self.assertEqual(response.status_code, 302)
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.user)
+        response = client.post(reverse('posts:new_post'),
+                               {'text': 'Без токена'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_exif_is_stripped_and_orientation_applied(self):
+        """EXIF не сохраняется, а поворот из него применяется"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'Secret camera'
+        self.upload('photo.jpg', jpeg((200, 100), exif=exif.tobytes()))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 200))
+            self.assertFalse(image.getexif())
+            self.assertNotIn(b'Secret camera', open(post.image.path,
+                                                    'rb').read())
+
+    @override_settings(IMAGE_MAX_SIDE=500)
+    def test_large_image_is_downscaled(self):
+        """Сохраняемый оригинал не длиннее IMAGE_MAX_SIDE"""
+        self.upload('large.jpg', jpeg((2000, 1200)))
+        with Image.open(Post.objects.get().image.path) as image:
+            self.assertEqual(image.size, (500, 300))
+
+    def test_upload_streams_to_disk(self):
+        """Разбор загрузки держит в памяти только текущую часть файла"""
+        content = jpeg((1500, 1500), noise=True)
+        self.assertGreater(len(content), 2 * 2 ** 20)
+        request = RequestFactory().post('/new/', {
+            'image': SimpleUploadedFile('noise.jpg', content)
+        })
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        tracemalloc.start()
+        upload = request.FILES['image']
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.assertIsInstance(upload, TemporaryUploadedFile)
+        self.assertEqual(upload.size, len(content))
+        self.assertLess(peak, 2 ** 20)
+
+    @skipUnless(os.path.exists('/proc/self/status'), 'нужен procfs')
+    def test_reencoding_memory_is_bounded(self):
+        """Перекодирование большого JPEG не декодирует его в полный размер"""
+        path = os.path.join(MEDIA_ROOT, 'huge.jpg')
+        os.makedirs(MEDIA_ROOT, exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(jpeg((4000, 3000)))
+        script = textwrap.dedent(f'''
+            import sys
+            import django
+            django.setup()
+            from django.conf import settings
+            from django.core.files import File
+            from PIL import Image
+            from posts.uploads import sanitize
+            settings.IMAGE_MAX_SIDE = 1000
+
+            def peak():
+                # VmHWM, в отличие от ru_maxrss, не наследует пик
+                # родительского процесса.
+                with open('/proc/self/status') as status:
+                    for line in status:
+                        if line.startswith('VmHWM:'):
+                            return int(line.split()[1])
+
+            before = peak()
+            with open({path!r}, 'rb') as file:
+                if sys.argv[1] == 'full':
+                    Image.open(file).load()
+                else:
+                    upload = File(file, name='huge.jpg')
+                    upload.size = None
+                    sanitize(upload)
+            print(peak() - before)
+        ''')
+
+        def grown(mode):
+            result = subprocess.run(
+                [sys.executable, '-c', script, mode], check=True,
+                capture_output=True, text=True, cwd=settings.BASE_DIR,
+                env={**os.environ,
+                     'DJANGO_SETTINGS_MODULE': 'yatube.settings'})
+            return int(result.stdout)
+
+        full, sanitized = grown('full'), grown('sanitize')
+        self.assertGreater(full, 0)
+        self.assertLess(sanitized, full / 2)
@@ -0,0 +1,204 @@
+"""Фоновая подготовка миниатюр загруженных изображений.
+
+Сохранение поста с новым изображением ставит ThumbnailJob. Очередь
+разбирает команда process_thumbnails; если THUMBNAIL_WORKERS больше
+нуля, задание после коммита транзакции ещё и сразу передаётся пулу
+потоков процесса, а команда подбирает то, что пул не успел выполнить
+(перезапуск, падение).
+
+Изображение декодируется один раз, обрезается до пропорций карточки
+и ужимается до каждой ширины из VARIANT_WIDTHS в WebP и JPEG. Список
+файлов сохраняется в Post.image_variants, самый широкий JPEG — в
+Post.thumbnail для браузеров без srcset. Варианты файла, уже
+обработанного для другого поста, берутся готовыми. Шаблон только
+читает эти поля и никогда не обрабатывает изображение сам.
+"""
+import hashlib
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from yatube import metrics
+
+from .caching import bump_feed_versions, post_feeds
+from .models import Post, ThumbnailJob
+from .page_cache import page_feeds
+
+logger = logging.getLogger(__name__)
+
+# Пропорции и наибольший размер карточки в ленте.
+CARD_SIZE = (960, 339)
+VARIANT_WIDTHS = (320, 640, 960)
+# Формат, параметры Pillow и расширение файла; первым идёт предпочтительный.
+FORMATS = (
+    ('webp', 'WEBP', {'quality': 75, 'method': 4}, 'webp'),
+    ('jpeg', 'JPEG', {'quality': 80, 'optimize': True,
+                      'progressive': True}, 'jpg'),
+)
+# Столько времени задание считается занятым взявшим его обработчиком.
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 3
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def schedule(post):
+    """Ставит миниатюру текущего изображения поста в очередь."""
+    ThumbnailJob.objects.update_or_create(
+        post=post,
+        defaults={'image': post.image.name, 'attempts': 0,
+                  'locked_until': None, 'error': ''}
+    )
+    if settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _pool().submit(_run, post.pk))
+
+
+def _run(post_id):
+    # Задания пула идут вне запроса: их замеры копятся отдельно.
+    with metrics.collect() as collector:
+        try:
+            generate(post_id)
+        except Exception:
+            logger.exception('Thumbnail for post %s failed', post_id)
+        finally:
+            # У потока пула своё соединение с базой.
+            connection.close()
+    metrics.AGGREGATE.record('thumbnails', collector)
+
+
+def _claim(post_id):
+    now = timezone.now()
+    return ThumbnailJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        post_id=post_id, attempts__lt=MAX_ATTEMPTS
+    ).update(locked_until=now + LEASE, attempts=F('attempts') + 1)
+
+
+def _crop_to_card(image):
+    width, height = image.size
+    ratio = CARD_SIZE[0] / CARD_SIZE[1]
+    if width / height > ratio:
+        crop = round(height * ratio)
+        left = (width - crop) // 2
+        return image.crop((left, 0, left + crop, height))
+    crop = round(width / ratio)
+    top = (height - crop) // 2
+    return image.crop((0, top, width, top + crop))
+
+
+def render_variants(source, prefix):
+    """Сохраняет варианты изображения; возвращает манифест.
+
+    Манифест — {формат: [[ширина, имя файла], ...]} по возрастанию
+    ширины. Шире исходника делается только самый узкий вариант, чтобы
+    у маленьких картинок всё же была миниатюра.
+    """
+    with Image.open(source) as image:
+        # JPEG декодируется сразу в уменьшенном масштабе: большой
+        # фотографии для карточки не нужен полный размер.
+        image.draft('RGB', (CARD_SIZE[0] * 2, CARD_SIZE[1] * 2))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+    image = _crop_to_card(image)
+    widths = [width for width in VARIANT_WIDTHS
+              if width <= image.width] or VARIANT_WIDTHS[:1]
+    manifest = {name: [] for name, *_ in FORMATS}
+    for width in reversed(widths):
+        height = round(width * CARD_SIZE[1] / CARD_SIZE[0])
+        # Каждый следующий вариант ужимается из предыдущего, а не
+        # из исходника: так дешевле.
+        image = image.resize((width, height), Image.LANCZOS)
+        for name, pil_format, options, extension in FORMATS:
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+            saved = default_storage.save(
+                f'{prefix}-{width}.{extension}', ContentFile(buffer.getvalue())
+            )
+            manifest[name].insert(0, [width, saved])
+    return manifest
+
+
+def _shared_manifest(image, post_id):
+    """Готовые варианты другого поста с тем же файлом изображения.
+
+    Одинаковые загрузки лежат в хранилище одним файлом, поэтому
+    и варианты для них делаются один раз.
+    """
+    manifest = Post.objects.filter(image=image).exclude(pk=post_id).exclude(
+        thumbnail=''
+    ).exclude(image_variants='').values_list(
+        'image_variants', flat=True
+    ).first()
+    return json.loads(manifest) if manifest else None
+
+
+def generate(post_id):
+    """Готовит варианты изображения; True, если они записаны в пост."""
+    if not _claim(post_id):
+        return False
+    job = ThumbnailJob.objects.select_related('post').get(post_id=post_id)
+    post = job.post
+    manifest = _shared_manifest(job.image, post_id)
+    if manifest is None:
+        digest = hashlib.md5(job.image.encode()).hexdigest()[:16]
+        try:
+            with post.image.open('rb') as source, \
+                    metrics.timing('thumbnail_time'):
+                manifest = render_variants(source, f'variants/{digest}')
+        except Exception as error:
+            ThumbnailJob.objects.filter(pk=job.pk).update(
+                error=repr(error), locked_until=None
+            )
+            raise
+    # Если изображение успели заменить, эти варианты уже не нужны:
+    # их уберёт collect_media, а новое задание сделает свои.
+    updated = Post.objects.filter(pk=post_id, image=job.image).update(
+        thumbnail=manifest['jpeg'][-1][1],
+        image_variants=json.dumps(manifest)
+    )
+    ThumbnailJob.objects.filter(pk=job.pk, image=job.image).delete()
+    if updated:
+        bump_feed_versions(*post_feeds(post.author_id, post.group_id),
+                           *page_feeds(post.author_id, post.group_id))
+    return bool(updated)
+
+
+def discard(post):
+    """Убирает задание и манифест поста, у которого больше нет картинки."""
+    ThumbnailJob.objects.filter(post=post).delete()
+    Post.objects.filter(pk=post.pk).update(image_variants='')
+    post.image_variants = ''
+
+
+def process_pending(limit=None):
+    """Выполняет ожидающие задания по порядку; возвращает число готовых."""
+    jobs = ThumbnailJob.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=timezone.now()),
+        attempts__lt=MAX_ATTEMPTS
+    ).values_list('post_id', flat=True)[:limit]
+    done = 0
+    for post_id in list(jobs):
+        try:
+            done += generate(post_id)
+        except Exception:
+            logger.exception('Thumbnail for post %s failed', post_id)
+    return done
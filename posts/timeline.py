@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .pagination import decode_cursor
+
+BATCH_SIZE = 1000
+
+
+def _bulk_insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def is_celebrity(author_id):
+    """Автор с таким числом подписчиков не раскладывает посты при записи."""
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'follower_count', flat=True
+    ).first()
+    return (followers or 0) > settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.id,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers.iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill(user_id, author_id, since=None):
+    """Дописывает в ленту читателя посты автора (новее since)."""
+    posts = Post.objects.filter(author_id=author_id)
+    if since is not None:
+        posts = posts.filter(pub_date__gt=since)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.order_by().values_list(
+            'id', 'pub_date'
+        ).iterator(chunk_size=BATCH_SIZE)
+    )
+
+
+def backfill_window(user_id, author_id, floor=None):
+    """Дописывает в ленту читателя одно окно постов автора старше floor.
+
+    Окно — страница ленты и ещё одна запись, по которой видно, есть ли
+    следующая. Возвращает новую границу: дату самого старого дописанного
+    поста или None, если в ленте теперь вся история автора.
+    """
+    window = settings.PAGE_SIZE + 1
+    posts = Post.objects.filter(author_id=author_id)
+    if floor is not None:
+        # Посты с той же датой, что и граница, могли не войти в прошлое окно.
+        posts = posts.filter(pub_date__lte=floor).exclude(
+            id__in=TimelineEntry.objects.filter(
+                user_id=user_id, author_id=author_id, pub_date=floor
+            ).values('post_id'))
+    rows = list(posts.order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date')[:window + 1])
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in rows[:window]
+    )
+    return rows[window - 1][1] if len(rows) > window else None
+
+
+def backfill_follow(follow):
+    """Новая подписка получает в ленту только последнее окно постов.
+
+    Стоимость подписки не зависит от числа постов автора: более старые
+    дописывает filled_page, когда читатель до них долистает.
+    """
+    floor = backfill_window(follow.user_id, follow.author_id)
+    if floor is not None:
+        Follow.objects.filter(pk=follow.pk).update(timeline_floor=floor)
+        follow.timeline_floor = floor
+
+
+def filled_page(user_id, get_page):
+    """Страница ленты подписок без пропусков на границах окон.
+
+    get_page() выбирает страницу заново. Если страница доходит до границы
+    (timeline_floor) какой-то подписки, старые посты этого автора могли бы
+    стоять на ней, но их ещё нет в ленте: дописываем следующее окно
+    и выбираем страницу ещё раз.
+    """
+    while True:
+        page = get_page()
+        follows = Follow.objects.filter(user_id=user_id,
+                                        timeline_floor__isnull=False)
+        position = page.next_cursor and decode_cursor(page.next_cursor)
+        if position:
+            follows = follows.filter(
+                timeline_floor__gte=parse_datetime(position[1]))
+        stale = list(follows.values_list('pk', 'author_id', 'timeline_floor'))
+        if not stale:
+            return page
+        for pk, author_id, floor in stale:
+            Follow.objects.filter(pk=pk).update(
+                timeline_floor=backfill_window(user_id, author_id, floor))
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты читателя."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull_celebrities(user_id):
+    """Fan-out-on-read для авторов, не раскладывающих посты при записи.
+
+    Таких подписок у читателя единицы, и для каждой дописываются только
+    посты новее последнего уже лежащего в ленте.
+    """
+    authors = Follow.objects.filter(
+        user_id=user_id,
+        author__stats__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True)
+    for author_id in authors:
+        latest = TimelineEntry.objects.filter(
+            user_id=user_id, author_id=author_id
+        ).aggregate(latest=Max('pub_date'))['latest']
+        backfill(user_id, author_id, since=latest)
+
+
+def timeline(user_id):
+    """Записи ленты подписок читателя вместе с постами."""
+    pull_celebrities(user_id)
+    return TimelineEntry.objects.filter(user_id=user_id).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def entry_posts(entries):
+    return [entry.post for entry in entries]
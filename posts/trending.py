@@ -0,0 +1,134 @@
+"""Популярное: посты по затухающему со временем счёту.
+
+Счёт поста — сумма весов событий, каждый из которых вдвое теряет
+вес за TRENDING_HALF_LIFE: публикация поста (тем тяжелее, чем больше
+подписчиков у автора) и каждый комментарий к нему. Чтобы не пересчитывать
+затухание у всех постов при каждом проходе, хранится
+
+    log2(Σ вес · 2 ** ((время события − EPOCH) / TRENDING_HALF_LIFE)).
+
+Затухание к текущему моменту у всех постов одинаково, поэтому порядок
+по хранимому числу совпадает с порядком по текущему счёту, а новое
+событие просто прибавляется к сумме (_add). Логарифм не даёт числу
+переполниться.
+
+update() учитывает только события после прошлого прохода: новые посты
+и комментарии. Его вызывает команда score_trending — раз или в цикле.
+В TrendingEntry лежат только посты за TRENDING_WINDOW; лента читает её
+по индексу, не сортируя таблицу постов.
+
+Подписки в модели не датированы, поэтому подписчики автора входят в вес
+публикации на момент первого расчёта поста, а не отдельными событиями.
+"""
+import math
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone as django_timezone
+
+from .caching import bump_feed_versions, feed_key
+from .models import Comment, Post, TrendingEntry
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+COMMENT_WEIGHT = 1.0
+# Вклад каждого удвоения числа подписчиков автора в вес публикации.
+FOLLOWER_WEIGHT = 0.5
+# События новее этого ещё могут быть не закоммичены: их учтёт
+# следующий проход.
+SETTLE = timedelta(seconds=5)
+BATCH_SIZE = 500
+
+
+def _term(weight, moment):
+    return math.log2(weight) + (
+        (moment - EPOCH) / settings.TRENDING_HALF_LIFE)
+
+
+def _add(score, term):
+    """log2(2 ** score + 2 ** term) без переполнения."""
+    high, low = max(score, term), min(score, term)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def publication_weight(followers):
+    return 1 + FOLLOWER_WEIGHT * math.log2(1 + (followers or 0))
+
+
+def _batches(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _comment_terms(comments):
+    terms = {}
+    for post_id, created in comments.values_list('post_id', 'created'):
+        terms.setdefault(post_id, []).append(_term(COMMENT_WEIGHT, created))
+    return terms
+
+
+def _fresh_entries(post_ids, until):
+    """Записи для постов, которых ещё нет в таблице: счёт с нуля."""
+    entries = []
+    for batch in _batches(post_ids):
+        terms = _comment_terms(Comment.objects.filter(
+            post_id__in=batch, created__lte=until))
+        posts = Post.objects.filter(id__in=batch).values_list(
+            'id', 'pub_date', 'author__stats__follower_count')
+        for post_id, pub_date, followers in posts:
+            score = _term(publication_weight(followers), pub_date)
+            for term in terms.get(post_id, ()):
+                score = _add(score, term)
+            entries.append(TrendingEntry(post_id=post_id, score=score,
+                                         pub_date=pub_date, updated=until))
+    return entries
+
+
+def _updated_entries(terms, until):
+    """Существующие записи с прибавленными новыми комментариями."""
+    entries = []
+    for batch in _batches(terms):
+        for entry in TrendingEntry.objects.filter(post_id__in=batch):
+            for term in terms[entry.post_id]:
+                entry.score = _add(entry.score, term)
+            entry.updated = until
+            entries.append(entry)
+    return entries
+
+
+@transaction.atomic
+def update(now=None, full=False):
+    """Учитывает события с прошлого прохода; возвращает число постов."""
+    now = now or django_timezone.now()
+    until = now - SETTLE
+    start = now - settings.TRENDING_WINDOW
+    stale = TrendingEntry.objects.all()
+    if not full:
+        stale = stale.filter(pub_date__lt=start)
+    stale.delete()
+    since = TrendingEntry.objects.aggregate(
+        since=Max('updated'))['since'] or start
+    window = {'pub_date__gte': start, 'pub_date__lte': until}
+    touched = set(Post.objects.filter(
+        pub_date__gt=since, **window).values_list('id', flat=True))
+    terms = _comment_terms(Comment.objects.filter(
+        created__gt=since, created__lte=until,
+        **{f'post__{lookup}': value for lookup, value in window.items()}))
+    touched.update(terms)
+    if not touched:
+        return 0
+    updated = _updated_entries(terms, until)
+    known = {entry.post_id for entry in updated}
+    TrendingEntry.objects.bulk_update(updated, ['score', 'updated'],
+                                      batch_size=BATCH_SIZE)
+    TrendingEntry.objects.bulk_create(_fresh_entries(touched - known, until),
+                                      batch_size=BATCH_SIZE)
+    transaction.on_commit(lambda: bump_feed_versions(feed_key('trending')))
+    return len(touched)
+
+
+def feed():
+    """Записи популярного вместе с постами, по убыванию счёта."""
+    return TrendingEntry.objects.select_related('post__author', 'post__group')
@@ -0,0 +1,216 @@
+"""Приём загружаемых изображений без лишних затрат памяти и времени.
+
+ImageUploadHandler (его подключает к представлению image_uploads) пишет
+файл на диск по частям и перестаёт сохранять его, как только видно,
+что это не изображение или что файл больше IMAGE_UPLOAD_MAX_SIZE.
+Размеры картинки читаются из заголовка до декодирования:
+декомпрессионная бомба отбрасывается, не заняв памяти.
+
+sanitize перекодирует принятое изображение без EXIF (координаты,
+модель камеры) и ужимает его до IMAGE_MAX_SIDE. JPEG при этом сразу
+декодируется в уменьшенном масштабе, поэтому память ограничена
+размером результата, а не исходника.
+"""
+import os
+from functools import wraps
+from tempfile import SpooledTemporaryFile
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from PIL import Image, ImageOps
+
+SIGNATURES = (
+    (b'\xff\xd8\xff', 'JPEG'),
+    (b'\x89PNG\r\n\x1a\n', 'PNG'),
+    (b'GIF87a', 'GIF'),
+    (b'GIF89a', 'GIF'),
+)
+HEAD_SIZE = 16
+# Форматы, которые Pillow умеет декодировать сразу в уменьшенном масштабе.
+DRAFT_FORMATS = {'JPEG'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'WEBP': {'quality': 90},
+    'PNG': {},
+    'GIF': {},
+}
+ORIENTATION = 0x0112
+# Результат перекодирования крупнее этого уходит из памяти на диск.
+SPOOL_SIZE = 2 ** 20
+
+INVALID_IMAGE = forms.ImageField.default_error_messages['invalid_image']
+
+
+def sniff(head):
+    """Формат по первым байтам файла или None."""
+    for signature, image_format in SIGNATURES:
+        if head.startswith(signature):
+            return image_format
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'WEBP'
+    return None
+
+
+def _megabytes(size):
+    return f'{size / 2 ** 20:.0f} МБ'
+
+
+def inspect(file):
+    """Проверяет файл по сигнатуре и заголовку, не декодируя пикселей.
+
+    Возвращает (формат, (ширина, высота)) или бросает ValidationError.
+    """
+    if file.size is not None and file.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            f'Файл больше {_megabytes(settings.IMAGE_UPLOAD_MAX_SIZE)}',
+            code='file_too_large'
+        )
+    file.seek(0)
+    image_format = sniff(file.read(HEAD_SIZE))
+    file.seek(0)
+    if image_format is None:
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    try:
+        with Image.open(file) as image:
+            header_format, size = image.format, image.size
+    except Image.DecompressionBombError:
+        header_format, size = image_format, None
+    except Exception:
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    finally:
+        file.seek(0)
+    if header_format != image_format:
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    limit = settings.IMAGE_MAX_PIXELS
+    if image_format not in DRAFT_FORMATS:
+        limit = min(limit, settings.IMAGE_MAX_DECODED_PIXELS)
+    if size is None or size[0] * size[1] > limit:
+        raise ValidationError(
+            f'Изображение больше {limit / 10 ** 6:.0f} мегапикселей',
+            code='too_many_pixels'
+        )
+    return image_format, size
+
+
+class RejectedUpload(UploadedFile):
+    """Пустая замена файла, который обработчик загрузки не стал принимать."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(SpooledTemporaryFile(), name, content_type, 0)
+        self.error = error
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Потоковая запись загрузки на диск с ранним отказом.
+
+    Содержимое никогда не собирается в памяти целиком: части пишутся
+    во временный файл. Первые байты сверяются с сигнатурами форматов,
+    размер — с IMAGE_UPLOAD_MAX_SIZE; после отказа остаток запроса
+    читается, но никуда не пишется.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.head = b''
+        self.received = 0
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error is not None:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.error = ValidationError(
+                f'Файл больше '
+                f'{_megabytes(settings.IMAGE_UPLOAD_MAX_SIZE)}',
+                code='file_too_large'
+            )
+            return None
+        if len(self.head) < HEAD_SIZE:
+            self.head += raw_data[:HEAD_SIZE - len(self.head)]
+            if len(self.head) == HEAD_SIZE and sniff(self.head) is None:
+                self.error = ValidationError(INVALID_IMAGE,
+                                             code='invalid_image')
+                return None
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if self.error is None:
+            try:
+                inspect(upload)
+            except ValidationError as error:
+                self.error = error
+        if self.error is None:
+            return upload
+        upload.close()
+        return RejectedUpload(self.file_name, self.content_type, self.error)
+
+
+def image_uploads(view):
+    """Принимает файлы запросов к view через ImageUploadHandler.
+
+    Обработчики загрузки можно сменить, только пока тело запроса
+    не разобрано, а CsrfViewMiddleware разбирает его до представления.
+    Поэтому проверка CSRF переносится внутрь, после замены обработчиков.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        request.upload_handlers.insert(0, ImageUploadHandler(request))
+        return protected(request, *args, **kwargs)
+    return wrapped
+
+
+def _decode(upload, image_format):
+    side = settings.IMAGE_MAX_SIDE
+    with Image.open(upload) as image:
+        scale = min(1, side / max(image.size))
+        if image_format in DRAFT_FORMATS:
+            # Декодер выбирает масштаб так, чтобы результат был не меньше
+            # запрошенного по обеим сторонам.
+            image.draft(image.mode, (round(image.width * scale),
+                                     round(image.height * scale)))
+        image.thumbnail((side, side), Image.LANCZOS)
+        image.load()
+    if image.getexif().get(ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    return image
+
+
+def _encode(image, image_format, output):
+    info = {key: image.info[key] for key in ('transparency', 'icc_profile')
+            if key in image.info}
+    image.save(output, image_format, exif=b'',
+               **info, **SAVE_OPTIONS[image_format])
+
+
+def sanitize(upload):
+    """Перекодирует изображение без метаданных; возвращает File.
+
+    Ориентация из EXIF применяется к пикселям до того, как EXIF
+    отбрасывается. Прозрачность и цветовой профиль сохраняются.
+    """
+    image_format, _ = inspect(upload)
+    output = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    try:
+        _encode(_decode(upload, image_format), image_format, output)
+    except (OSError, Image.DecompressionBombError):
+        # Заголовок цел, а данные обрезаны или испорчены: это выясняется
+        # только при декодировании.
+        output.close()
+        upload.seek(0)
+        raise ValidationError(INVALID_IMAGE, code='invalid_image')
+    output.seek(0)
+    upload.seek(0)
+    return File(output, name=os.path.basename(upload.name))
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -10,12 +10,27 @@ urlpatterns = [
     path('500/', views.server_error, name='500'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('trending/', views.trending, name='trending'),
+    path('groups/', views.groups, name='groups'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export, name='export'),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path('api/v1/posts/<int:post_id>/', api.post_view, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments/', api.comments,
+         name='api_comments'),
+    path('api/v1/groups/<slug:slug>/posts/', api.group_posts,
+         name='api_group'),
+    path('api/v1/users/<str:username>/posts/', api.profile,
+         name='api_profile'),
+    path('api/v1/follow/', api.follow_index, name='api_follow'),
     path('<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
          name='profile_unfollow'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
+    path('<str:username>/<int:post_id>/comments/', views.comments,
+         name='comments'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit, name='post_edit'),
     path('<str:username>/<int:post_id>/comment/',
@@ -1,57 +1,132 @@
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control
 
-from yatube import settings
-
+from . import conditional, exporting, groups as group_cache
+from . import trending as trending_feed
+from . import search as full_text
+from .caching import feed_key, feed_version
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import Follow, GroupStats, Post, User
+from .pagination import (NEXT, CursorPaginator, decode_cursor, encode_cursor,
+                         paginate)
+from .stats import user_stats
+from .timeline import entry_posts, filled_page, timeline
+from .uploads import image_uploads
 
 
+@conditional.conditional(conditional.index)
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = paginate(request, post_list)
     return render(
         request,
         'index.html',
-        {'page': page, 'paginator': paginator}
+        {'page': page,
+         'paginator': page.paginator,
+         'feed_version': feed_version(feed_key('index'))}
     )
 
 
+@conditional.conditional(conditional.trending)
+def trending(request):
+    page = paginate(request, trending_feed.feed(), field='score',
+                    tiebreak='post_id', transform=entry_posts)
+    return render(request, 'posts/trending.html', {
+        'page': page,
+        'paginator': page.paginator
+    })
+
+
+@conditional.conditional(conditional.group_posts)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()[:11]
-    paginator = Paginator(posts, settings.PAGE_SIZE)
-    page_number = request.GET.get("page")
-    page = paginator.get_page(page_number)
+    group = group_cache.get_or_404(slug)
+    page = paginate(request, group.posts.for_feed())
     return render(request, 'group.html', {
         'group': group,
-        'posts': posts,
+        'posts': page.object_list,
         'page': page,
-        'paginator': paginator
+        'paginator': page.paginator,
+        'feed_version': feed_version(feed_key('group', group.id))
+    })
+
+
+@conditional.conditional(conditional.groups)
+def groups(request):
+    page = paginate(request, GroupStats.objects.select_related('group'),
+                    field='last_activity', tiebreak='group_id')
+    return render(request, 'posts/groups.html', {
+        'page': page,
+        'paginator': page.paginator
+    })
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    after = None
+    cursor = decode_cursor(request.GET.get('cursor', ''))
+    if cursor is not None and cursor[0] == NEXT:
+        try:
+            after = (float(cursor[1]), int(cursor[2]))
+        except ValueError:
+            after = None
+    found = full_text.ranked(query, after, settings.PAGE_SIZE + 1)
+    posts = Post.objects.for_feed().in_bulk(
+        [post_id for post_id, _ in found[:settings.PAGE_SIZE]])
+    results = [posts[post_id] for post_id, _ in found[:settings.PAGE_SIZE]
+               if post_id in posts]
+    next_cursor = None
+    if len(found) > settings.PAGE_SIZE:
+        post_id, score = found[settings.PAGE_SIZE - 1]
+        next_cursor = encode_cursor(NEXT, score, post_id)
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'results': results,
+        'next_cursor': next_cursor
     })
 
 
 @login_required
+def export(request):
+    if request.GET.get('format') == 'ndjson':
+        response = StreamingHttpResponse(exporting.ndjson(request.user),
+                                         content_type='application/x-ndjson')
+        extension = 'ndjson'
+    else:
+        response = StreamingHttpResponse(exporting.archive(request.user),
+                                         content_type='application/zip')
+        extension = 'zip'
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.pk}.{extension}"'
+    )
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@login_required
+@image_uploads
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
+    # Проверка формы и перекодирование картинки идут вне транзакции:
+    # BEGIN IMMEDIATE держит блокировку записи всей базы до COMMIT.
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        with transaction.atomic():
+            new_post.save()
         return redirect('posts:index')
     return render(request, 'new.html', {'form': form})
 
 
+@conditional.conditional(conditional.profile)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts_latest = author.posts.all()
-    post_count = author.posts.count()
-    paginator = Paginator(posts_latest, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    post_count = user_stats(author).post_count
+    page = paginate(request, author.posts.for_feed())
     if (request.user.id is not None
             and Follow.objects.filter(
                 author__following__user=request.user).exists()):
@@ -60,28 +135,55 @@ def profile(request, username):
         following = False
     context = {
         'page': page,
-        'paginator': paginator,
+        'paginator': page.paginator,
         'post_count': post_count,
         'author': author,
-        'following': following
+        'following': following,
+        'feed_version': feed_version(feed_key('profile', author.id))
     }
     return render(request, 'posts/profile.html', context)
 
 
+@conditional.conditional(conditional.post_view)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__stats'),
+        id=post_id, author__username=username
+    )
+    user_stats(post.author)
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    # Первые комментарии выводятся сразу, остальные подгружает
+    # фрагмент comments тем же CursorPaginator по курсору последнего.
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_PAGE_SIZE, field='created')
+    comments = paginator.object_list[:settings.COMMENTS_PAGE_SIZE]
+    next_cursor = paginator.next_cursor(comments)
     context = {
         'author': post.author,
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': comments,
+        'next_cursor': next_cursor
     }
     return render(request, 'posts/post.html', context)
 
 
+@conditional.conditional(conditional.post_view)
+def comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    paginator = CursorPaginator(post.comments.select_related('author'),
+                                settings.COMMENTS_PAGE_SIZE, field='created')
+    page = paginator.get_page(request.GET.get('cursor'))
+    return render(request, 'includes/comment_list.html', {
+        'post': post,
+        'comments': page.object_list,
+        'next_cursor': page.next_cursor
+    })
+
+
 @login_required
+@image_uploads
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
     if post.author.id != request.user.id:
@@ -89,7 +191,8 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect('posts:post', username, post_id)
     return render(request, 'posts/post_edit.html',
                   {'post': post, 'form': form}
@@ -117,22 +220,22 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post', username, post_id)
 
 
 @login_required
+@conditional.conditional(conditional.follow_index)
 def follow_index(request):
-    user = get_object_or_404(User, username=request.user.username)
-    post_list = Post.objects.filter(author__following__user=user)
-    paginator = Paginator(post_list, settings.PAGE_SIZE)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = filled_page(request.user.id, lambda: paginate(
+        request, timeline(request.user.id),
+        tiebreak='post_id', transform=entry_posts))
     return render(
         request,
         'posts/follow.html',
         {'page': page,
-         'paginator': paginator}
+         'paginator': page.paginator}
     )
 
 
@@ -140,9 +243,10 @@ def follow_index(request):
 def profile_follow(request, username):
     user = get_object_or_404(User, username=username)
     follow = Follow.objects.filter(author=user, user=request.user)
-    if follow.exists() or request.user == user:
-        return redirect('posts:profile', username=username)
-    Follow.objects.create(author=user, user=request.user)
+    if request.user != user:
+        with transaction.atomic():
+            if not follow.exists():
+                Follow.objects.create(author=user, user=request.user)
     return redirect('posts:profile', username=username)
 
 
@@ -151,5 +255,6 @@ def profile_unfollow(request, username):
     user = get_object_or_404(User, username=username)
     follow = Follow.objects.filter(author=user, user=request.user)
     if follow.exists():
-        follow.delete()
+        with transaction.atomic():
+            follow.delete()
     return redirect('posts:profile', username=username)
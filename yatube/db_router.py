@@ -0,0 +1,104 @@
+"""Чтение лент с реплик и запись в основную базу.
+
+Реплики — псевдонимы из DATABASE_REPLICAS. ReplicaMiddleware выбирает
+одну из них, только если запрос GET или HEAD и обращён к одному
+из представлений REPLICA_VIEWS (ленты, профиль, страница поста). Все
+остальные запросы и всё, что происходит вне запросов (команды, пул
+миниатюр), читают основную базу.
+
+Чтобы пользователь видел свои записи, несмотря на отставание реплик:
+
+- первая запись в запросе переключает его оставшиеся чтения
+  на основную базу (follow_index, например, дописывает ленту и сразу
+  её читает);
+- после запроса с записью сессия REPLICATION_LAG секунд читает
+  только основную базу.
+
+Чтобы отставшая реплика не попала в общие кэши, чужие читатели тоже
+идут в основную базу, пока ленты страницы менялись меньше
+REPLICATION_LAG секунд назад: отрисовка с реплики сохранилась бы
+во фрагментах и ETag под уже сдвинутым поколением ленты и держалась
+бы там до истечения фрагмента. Время изменения страницы даёт функция
+из settings.REPLICA_LAST_CHANGE.
+
+Сессии всегда читаются из основной базы: только что созданной сессии
+на реплике может ещё не быть.
+
+Для разработки вместо настоящей репликации есть replicate(): копия
+основной SQLite-базы в файлы реплик (manage.py replicate_sqlite).
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.module_loading import import_string
+
+STICKY_KEY = '_primary_until'
+# Приложения, данные которых можно читать с реплик.
+REPLICATED_APPS = {'posts', 'auth'}
+
+_state = threading.local()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if replica is not None and model._meta.app_label in REPLICATED_APPS:
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.replica = None
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же строки, что в основной базе.
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in aliases and obj2._state.db in aliases
+
+
+class ReplicaMiddleware:
+    """Направляет чтения представлений REPLICA_VIEWS на реплику."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _state.replica = None
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.replica = None
+            _state.wrote = False
+        if wrote and hasattr(request, 'session'):
+            request.session[STICKY_KEY] = (time.time()
+                                           + settings.REPLICATION_LAG)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (settings.DATABASE_REPLICAS
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name
+                in settings.REPLICA_VIEWS
+                and request.session.get(STICKY_KEY, 0) < time.time()
+                and self.last_change(request)
+                + settings.REPLICATION_LAG < time.time()):
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+    def last_change(self, request):
+        return import_string(settings.REPLICA_LAST_CHANGE)(request)
+
+
+def replicate(aliases=None):
+    """Копирует основную SQLite-базу в реплики целиком."""
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    for alias in aliases or settings.DATABASE_REPLICAS:
+        target = connections[alias]
+        target.ensure_connection()
+        source.connection.backup(target.connection)
@@ -0,0 +1,323 @@
+"""Замеры каждого запроса по представлениям и выгрузка для Prometheus.
+
+MetricsMiddleware стоит первым в MIDDLEWARE и на время запроса заводит
+Collector. Он считает:
+
+- запросы к базе, повторы одного и того же SQL с теми же параметрами
+  и время в базе — через connection.execute_wrapper на всех
+  соединениях;
+- время рендера шаблонов — бэкенд DjangoTemplates из этого модуля
+  засекает внешний рендер, вложенные render_to_string не
+  складываются дважды;
+- попадания и промахи кэша — бэкенды LocMemCache и SQLiteCache
+  из этого модуля;
+- время подготовки миниатюр (timing('thumbnail_time')).
+
+Время в базе входит и во время шаблонов, если запрос выполнился
+при рендере: ленивые QuerySet вычисляются в шаблоне. Запросы
+потокового ответа после выхода из представления не считаются.
+
+Итоги запроса уходят в заголовок Server-Timing и в AGGREGATE —
+счётчики процесса с его запуска по имени маршрута (posts:index,
+posts:profile...). Их в текстовом формате Prometheus отдаёт
+представление export только сотрудникам. У каждого воркера свои
+счётчики: скорости и суммы считает сам Prometheus.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache.backends import locmem
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends import django as django_backend
+from django.urls import Resolver404, resolve
+
+from yatube import cache as sqlite_cache
+
+# Границы корзин гистограммы длительности запроса, в секундах.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+UNKNOWN_VIEW = 'unknown'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_local = threading.local()
+
+
+class Collector:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.queries = 0
+        self.statements = set()
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.thumbnail_time = 0.0
+        # Глубина вложенных вызовов: считается только внешний.
+        self.rendering = 0
+        self.caching = 0
+
+    @property
+    def duplicates(self):
+        return self.queries - len(self.statements)
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+            self.statements.add((sql, repr(params)))
+
+    def server_timing(self):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.queries} queries, {self.duplicates} duplicate"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+            f'thumb;dur={self.thumbnail_time * 1000:.1f}',
+            f'total;dur={self.duration * 1000:.1f}',
+        ))
+
+
+def current():
+    """Collector текущего запроса в этом потоке или None."""
+    return getattr(_local, 'collector', None)
+
+
+@contextmanager
+def collect():
+    """Собирает замеры всего, что выполняется внутри блока."""
+    collector = Collector()
+    previous = current()
+    _local.collector = collector
+    try:
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(collector.execute))
+            yield collector
+    finally:
+        collector.duration = time.perf_counter() - collector.started
+        _local.collector = previous
+
+
+@contextmanager
+def timing(name):
+    """Прибавляет время блока к полю name текущего Collector."""
+    collector = current()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if collector is not None:
+            setattr(collector, name, getattr(collector, name)
+                    + time.perf_counter() - started)
+
+
+class Aggregate:
+    """Счётчики по представлениям с запуска процесса."""
+
+    FIELDS = ('queries', 'duplicates', 'db_time', 'template_time',
+              'cache_hits', 'cache_misses', 'thumbnail_time')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, collector):
+        with self._lock:
+            totals = self._views.get(view)
+            if totals is None:
+                totals = self._views[view] = {
+                    'requests': 0, 'duration': 0.0,
+                    'buckets': [0] * len(BUCKETS),
+                    **dict.fromkeys(self.FIELDS, 0),
+                }
+            totals['requests'] += 1
+            totals['duration'] += collector.duration
+            for index, bound in enumerate(BUCKETS):
+                if collector.duration <= bound:
+                    totals['buckets'][index] += 1
+            for field in self.FIELDS:
+                totals[field] += getattr(collector, field)
+
+    def snapshot(self):
+        with self._lock:
+            return {view: {**totals, 'buckets': list(totals['buckets'])}
+                    for view, totals in self._views.items()}
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+
+
+AGGREGATE = Aggregate()
+
+# Имя метрики, поле счётчиков и описание.
+COUNTERS = (
+    ('yatube_requests_total', 'requests', 'Запросы'),
+    ('yatube_db_queries_total', 'queries', 'Запросы к базе'),
+    ('yatube_db_duplicate_queries_total', 'duplicates',
+     'Повторные запросы к базе с теми же параметрами'),
+    ('yatube_db_seconds_total', 'db_time', 'Время в базе'),
+    ('yatube_template_seconds_total', 'template_time',
+     'Время рендера шаблонов'),
+    ('yatube_cache_hits_total', 'cache_hits', 'Попадания в кэш'),
+    ('yatube_cache_misses_total', 'cache_misses', 'Промахи кэша'),
+    ('yatube_thumbnail_seconds_total', 'thumbnail_time',
+     'Время подготовки миниатюр'),
+)
+HISTOGRAM = 'yatube_request_duration_seconds'
+
+
+def _label(view):
+    escaped = (view.replace('\\', '\\\\').replace('"', '\\"')
+               .replace('\n', '\\n'))
+    return f'{{view="{escaped}"}}'
+
+
+def _histogram(view, totals):
+    label = _label(view)[1:-1]
+    for bound, count in zip(BUCKETS, totals['buckets']):
+        yield f'{HISTOGRAM}_bucket{{{label},le="{bound}"}} {count}'
+    yield f'{HISTOGRAM}_bucket{{{label},le="+Inf"}} {totals["requests"]}'
+    yield f'{HISTOGRAM}_sum{{{label}}} {totals["duration"]}'
+    yield f'{HISTOGRAM}_count{{{label}}} {totals["requests"]}'
+
+
+def prometheus(aggregate=AGGREGATE):
+    """Счётчики в текстовом формате Prometheus."""
+    views = sorted(aggregate.snapshot().items())
+    lines = []
+    for name, field, description in COUNTERS:
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        lines.extend(f'{name}{_label(view)} {totals[field]}'
+                     for view, totals in views)
+    lines.append(f'# HELP {HISTOGRAM} Длительность запроса')
+    lines.append(f'# TYPE {HISTOGRAM} histogram')
+    for view, totals in views:
+        lines.extend(_histogram(view, totals))
+    return '\n'.join(lines) + '\n'
+
+
+@staff_member_required
+def export(request):
+    return HttpResponse(prometheus(), content_type=CONTENT_TYPE)
+
+
+def _view_name(request):
+    # Страницы из кэша гостей отдаются до разбора адреса.
+    match = request.resolver_match
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return UNKNOWN_VIEW
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и пишет итоги в Server-Timing и AGGREGATE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect() as collector:
+            response = self.get_response(request)
+        response['Server-Timing'] = collector.server_timing()
+        AGGREGATE.record(_view_name(request), collector)
+        return response
+
+
+class Template:
+    """Шаблон бэкенда, засекающий время рендера."""
+
+    def __init__(self, template):
+        self.template = template
+        self.origin = template.origin
+        self.backend = template.backend
+
+    def render(self, context=None, request=None):
+        collector = current()
+        if collector is None or collector.rendering:
+            return self.template.render(context, request)
+        collector.rendering += 1
+        try:
+            with timing('template_time'):
+                return self.template.render(context, request)
+        finally:
+            collector.rendering -= 1
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name))
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи чтений кэша текущего запроса."""
+
+    _missing = object()
+
+    @contextmanager
+    def _counting(self):
+        collector = current()
+        outer = collector is not None and not collector.caching
+        if outer:
+            collector.caching += 1
+        try:
+            yield collector if outer else None
+        finally:
+            if outer:
+                collector.caching -= 1
+
+    @staticmethod
+    def _count(collector, hits, misses):
+        if collector is not None:
+            collector.cache_hits += hits
+            collector.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        with self._counting() as collector:
+            value = super().get(key, self._missing, version)
+        found = value is not self._missing
+        self._count(collector, found, not found)
+        return value if found else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with self._counting() as collector:
+            found = super().get_many(keys, version)
+        self._count(collector, len(found), len(keys) - len(found))
+        return found
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT,
+                   version=None):
+        with self._counting() as collector:
+            value = super().get(key, self._missing, version)
+            found = value is not self._missing
+            if not found:
+                value = super().get_or_set(key, default, timeout, version)
+        self._count(collector, found, not found)
+        return value
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class SQLiteCache(CacheMetricsMixin, sqlite_cache.SQLiteCache):
+    pass
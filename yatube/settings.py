@@ -1,4 +1,6 @@
 import os
+import sys
+from datetime import timedelta
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -31,13 +33,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: замеряет и всё, что делают остальные слои.
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.db_router.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'posts.page_cache.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -46,10 +52,12 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 INCLUDES_DIR = os.path.join(BASE_DIR, 'templates/includes')
 
 PAGE_SIZE = 10
+# Комментарии на странице поста; остальные подгружаются фрагментами.
+COMMENTS_PAGE_SIZE = 20
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR, INCLUDES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -67,13 +75,97 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# Профиль базы: YATUBE_DB=sqlite (по умолчанию) или postgresql.
+# ATOMIC_REQUESTS не включён: пишущие представления открывают
+# транзакцию только вокруг самой записи, после проверки формы, так что
+# блокировку записи не держат ни отрисовка шаблона, ни разбор картинки.
+DATABASE_PROFILE = os.environ.get('YATUBE_DB', 'sqlite')
+# Соединения к PostgreSQL идут через PgBouncer в режиме transaction.
+PGBOUNCER = os.environ.get('YATUBE_PGBOUNCER', '') == '1'
+STATEMENT_TIMEOUT = int(os.environ.get('YATUBE_DB_STATEMENT_TIMEOUT', 5000))
+
+DATABASE_PROFILES = {
+    # Один сервер без отдельной СУБД (yatube/sqlite3/base.py). В WAL
+    # читатели не ждут писателя, synchronous=NORMAL не синхронизирует
+    # диск на каждом коммите, а писатели ждут друг друга до timeout
+    # секунд (busy_timeout) вместо ошибки «database is locked».
+    'sqlite': {
+        'ENGINE': 'yatube.sqlite3',
+        'NAME': os.environ.get('YATUBE_DB_NAME',
+                               os.path.join(BASE_DIR, 'db.sqlite3')),
+        'OPTIONS': {
+            'timeout': 20,
+            'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Нужен psycopg2 (psycopg2-binary в requirements.txt). Профиль
+    # проверяется тем же набором тестов на своём сервере:
+    #     YATUBE_DB=postgresql YATUBE_DB_HOST=localhost \
+    #         python manage.py test posts
+    # Тесты только для SQLite при этом пропускаются, а test_postgresql
+    # проверяет тайм-ауты соединения. Замер записи под нагрузкой —
+    # benchmarks/bench_writes.py --profiles postgresql.
+    # Соединение живёт CONN_MAX_AGE секунд и переживает
+    # запросы своего воркера. Общий пул на все воркеры — PgBouncer:
+    # серверных курсоров он в режиме transaction не переносит, а
+    # параметр options не пропускает, поэтому тайм-ауты тогда задаются
+    # роли: ALTER ROLE yatube SET statement_timeout = '5s'.
+    'postgresql': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('YATUBE_DB_NAME', 'yatube'),
+        'USER': os.environ.get('YATUBE_DB_USER', 'yatube'),
+        'PASSWORD': os.environ.get('YATUBE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('YATUBE_DB_HOST', ''),
+        'PORT': os.environ.get('YATUBE_DB_PORT', ''),
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_DB_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': PGBOUNCER,
+        'OPTIONS': {'connect_timeout': 5} if PGBOUNCER else {
+            'connect_timeout': 5,
+            'options': (f'-c statement_timeout={STATEMENT_TIMEOUT} '
+                        f'-c idle_in_transaction_session_timeout='
+                        f'{STATEMENT_TIMEOUT * 2}'),
+        },
+    },
+}
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': DATABASE_PROFILES[DATABASE_PROFILE],
 }
 
+# Реплики только для чтения (yatube/db_router.py) через запятую: файлы
+# SQLite, например YATUBE_DB_REPLICAS=/srv/replica1.sqlite3, или адреса
+# реплик PostgreSQL. Файлы SQLite наполняет manage.py replicate_sqlite.
+# Тесты запускаются без реплик: маршрутизацию проверяет test_db_router
+# на собственной временной реплике.
+for number, location in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(',')),
+        start=1):
+    if DATABASE_PROFILE == 'sqlite':
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'NAME': location,
+            'TEST': {'NAME': f'{location}.test'},
+        }
+    else:
+        DATABASES[f'replica{number}'] = {
+            **DATABASES['default'],
+            'HOST': location,
+            'TEST': {'MIRROR': 'default'},
+        }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['yatube.db_router.ReplicaRouter']
+# Представления, которые читают с реплик.
+REPLICA_VIEWS = (
+    'posts:index', 'posts:group', 'posts:profile', 'posts:post',
+    'posts:follow_index',
+)
+# Сколько секунд после записи сессия читает только основную базу.
+# Столько же после изменения лент страницы её не читают с реплик
+# и остальные посетители.
+REPLICATION_LAG = 5
+REPLICA_LAST_CHANGE = 'posts.page_cache.last_change'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -108,12 +200,70 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'yatube.metrics.LocMemCache',
+    },
+    # Общий для всех воркеров на одном сервере, без внешних сервисов.
+    'sqlite': {
+        'BACKEND': 'yatube.metrics.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
+    },
+}
+
+# Поколения лент сбрасываются в том воркере, который принял запись,
+# поэтому по умолчанию кэш общий для всех процессов сервера. LocMemCache
+# берут тесты (manage.py test, pytest): каждому прогону свой пустой кэш.
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': CACHE_BACKENDS[os.environ.get(
+        'YATUBE_CACHE', 'locmem' if TESTING else 'sqlite')],
 }
 
 LOGIN_URL = "/auth/login/"
 LOGIN_REDIRECT_URL = "posts:index"
 EMAIL_BACKEND = 'django.core.mail.backends.XXX'
+
+# Авторы, у которых подписчиков больше этого числа, не раскладывают
+# новые посты по лентам подписчиков: читатели подтягивают их сами.
+TIMELINE_FANOUT_LIMIT = 5000
+
+# Потоки, готовящие миниатюры в процессе веб-сервера сразу после
+# сохранения поста. По умолчанию 0: очередь разбирает отдельный
+# обработчик manage.py process_thumbnails --loop, а веб-процесс
+# и тесты не пишут в базу и media/ из фоновых потоков.
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 0))
+
+# Загрузки изображений к постам пишутся на диск по частям и отбрасываются,
+# как только видно, что это не изображение или оно слишком велико
+# (posts/uploads.py, image_uploads). Остальные загрузки принимают
+# стандартные FILE_UPLOAD_HANDLERS.
+IMAGE_UPLOAD_MAX_SIZE = 10 * 2 ** 20
+# Предел по заголовку изображения. JPEG декодируется в уменьшенном
+# масштабе, остальные форматы — целиком, поэтому для них предел ниже.
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+IMAGE_MAX_DECODED_PIXELS = 16 * 10 ** 6
+# Длинная сторона сохраняемого оригинала.
+IMAGE_MAX_SIDE = 2560
+
+# Входит в ETag страниц: после выкладки новой версии шаблонов браузеры
+# не получат 304 на старую разметку.
+RELEASE = os.environ.get('YATUBE_RELEASE', '')
+
+# Популярное (posts/trending.py): за сколько вес события падает вдвое
+# и за какой срок посты попадают в ленту.
+TRENDING_HALF_LIFE = timedelta(hours=12)
+TRENDING_WINDOW = timedelta(days=3)
+
+# Страницы, которые гости без сессии получают целиком из кэша
+# (posts/page_cache.py), и срок хранения такой страницы.
+PAGE_CACHE_VIEWS = (
+    'posts:index', 'posts:group', 'posts:profile', 'posts:post',
+    'posts:comments', 'posts:trending', 'posts:groups', 'about:author',
+    'about:tech',
+)
+PAGE_CACHE_TIMEOUT = 60 * 10
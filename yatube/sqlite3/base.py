@@ -0,0 +1,37 @@
+"""SQLite для нескольких процессов-писателей на одном сервере.
+
+Поверх стандартного бэкенда понимает два ключа OPTIONS:
+
+- pragmas — PRAGMA, которые выполняются на каждом новом соединении,
+  например {'journal_mode': 'WAL', 'synchronous': 'NORMAL'};
+- transaction_mode — чем открывать транзакции: 'IMMEDIATE' берёт
+  блокировку записи сразу в BEGIN.
+
+Со стандартным BEGIN транзакция, которая сначала читает, а потом пишет
+(все пишущие представления), поднимает блокировку до записи посреди
+транзакции. Если за это время базу изменил другой процесс, SQLite
+отвечает «database is locked» сразу, не дожидаясь busy_timeout.
+BEGIN IMMEDIATE ждёт своей очереди в busy_timeout (OPTIONS['timeout'],
+в секундах) ещё до первого чтения.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop('pragmas', {})
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
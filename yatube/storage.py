@@ -0,0 +1,79 @@
+"""Хранилище файлов по адресу содержимого.
+
+Файл сохраняется под SHA-256 своего содержимого: posts/ab/abcdef….jpg.
+Хэш считается по ходу записи во временный файл, так что загрузка
+читается один раз. Одинаковые загрузки ложатся в один файл, а раз имя
+однозначно определяется содержимым, файл по нему никогда не меняется и
+его можно отдавать с вечным кэшированием:
+
+    location ~ "^/media/.*[0-9a-f]{16}" {
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+Хранилище само ничего не удаляет: на файл могут ссылаться несколько
+постов. Сиротские файлы убирает manage.py collect_media.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.views import static
+
+IMMUTABLE_NAME = re.compile(r'[0-9a-f]{16}')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Имя всё равно заменяется хэшем в _save.
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        handle, temporary = tempfile.mkstemp(dir=full_directory,
+                                             prefix='.upload-')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    output.write(chunk)
+            digest = digest.hexdigest()
+            name = posixpath.join(directory, digest[:2], digest + extension)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                try:
+                    file_move_safe(temporary, path)
+                except FileExistsError:
+                    # Тот же файл только что сохранил другой процесс.
+                    os.remove(temporary)
+                    return name
+                # mkstemp создаёт файл с правами 0600, а его должен
+                # читать и веб-сервер.
+                os.chmod(path, self.file_permissions_mode or 0o644)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+def serve(request, path):
+    """Отдача MEDIA_ROOT при DEBUG с заголовками, как у nginx выше."""
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    if IMMUTABLE_NAME.search(posixpath.basename(path)):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response